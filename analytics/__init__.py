@@ -0,0 +1,104 @@
+from analytics.scope import FilterSpec
+from analytics.ipa import (
+    IMPORTANCE_METHODS,
+    IPA_ITEMS,
+    ITEM_LABELS,
+    MISSING_MODES,
+    QUADRANTS,
+    batched_importance,
+    bootstrap_importance,
+    bootstrap_quadrants,
+    bootstrap_table,
+    classify_factor_dynamic,
+    classify_quadrants,
+    compute_group_importance,
+    compute_importance,
+    correlation_moments,
+    covariance_to_correlation,
+    grouped_correlations,
+    importance_from_correlation,
+    improve_summary,
+    ipa_items,
+    ipa_quadrants,
+    ipa_result_table,
+    with_item_labels,
+)
+from analytics.participation import (
+    PARTICIPATION_COLUMNS,
+    DailyResponses,
+    daily_counts,
+    eta_to_target,
+    participation_by_value,
+    participation_counts,
+    response_curve,
+    scoped_participation,
+    yearly_participation,
+)
+from analytics.mood import (
+    MOOD_LEVELS,
+    MOOD_MAP,
+    mood_by_column,
+    mood_by_year,
+    mood_distribution,
+)
+from analytics.categorization import (
+    NPS_LEVELS,
+    SATISFACTION_LEVELS,
+    category_breakdown,
+    category_codes,
+    category_matrix,
+    combined_codes,
+    combined_labels,
+    nps_codes,
+    satisfaction_codes,
+)
+from analytics.satisfaction import (
+    DIMENSION_PREFIXES,
+    SATISFACTION_COLUMNS,
+    SATISFACTION_ITEMS,
+    SATISFACTION_LABELS,
+    demography_comparison,
+    satisfaction_years,
+    score_distribution,
+    summarize_by_demography,
+    top_box_percentage,
+    with_average_sat,
+    year_comparison,
+)
+from analytics.nps import (
+    nps_breakdown,
+    nps_by_year,
+    nps_comparison,
+    nps_summary,
+)
+from analytics.gallup import (
+    ENGAGEMENT_LEVELS,
+    GALLUP_BENCHMARKS,
+    GALLUP_ITEMS,
+    INDONESIA_BENCHMARK,
+    engaged_comparison,
+    engaged_percentage,
+    engaged_row,
+    engagement_categories,
+    engagement_distribution,
+    gallup_scores,
+    overall_comparison,
+    with_engagement,
+)
+from analytics.executor import (
+    AnalyticsExecutor,
+    request_key,
+)
+from analytics.stats import (
+    check_normality,
+    cohen_d,
+    correlation_tests,
+    group_summary,
+    independent_test,
+    interpret_effect_size,
+    kruskal_eta_sq,
+    multi_group_test,
+    paired_samples,
+    paired_test,
+    rank_biserial_r,
+)
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+# Urutan kategori = urutan kode (0, 1, 2) dan urutan baris/kolom heatmap
+SATISFACTION_LEVELS = ['High', 'Medium', 'Low']
+NPS_LEVELS = ['Promoter', 'Passive', 'Detractor']
+
+
+def satisfaction_codes(values):
+    """0/1/2 for High (>= 4) / Medium / Low (<= 2); missing answers count as Medium."""
+    v = np.asarray(values, dtype=float)
+    return np.where(v >= 4, 0, np.where(v <= 2, 2, 1)).astype(np.int8)
+
+
+def nps_codes(values):
+    """0/1/2 for Promoter (>= 9) / Passive / Detractor (<= 6); missing answers count as Passive."""
+    v = np.asarray(values, dtype=float)
+    return np.where(v >= 9, 0, np.where(v <= 6, 2, 1)).astype(np.int8)
+
+
+def combined_codes(sat_codes, other_codes):
+    """Satisfaction x (Likelihood to Stay | NPS) as one code, sat * 3 + other (0..8)."""
+    return sat_codes.astype(np.intp) * 3 + other_codes
+
+
+def combined_labels(combine_with_nps):
+    """Labels of the 9 combined codes, e.g. 'High Satisfaction - Promoter'."""
+    if combine_with_nps:
+        return [f"{s} Satisfaction - {o}" for s in SATISFACTION_LEVELS for o in NPS_LEVELS]
+    return [f"{s} Satisfaction - {o} Likelihood to Stay" for s in SATISFACTION_LEVELS for o in SATISFACTION_LEVELS]
+
+
+def category_matrix(codes, combine_with_nps):
+    """3x3 respondent counts (satisfaction rows x KE1/NPS columns) via one np.bincount."""
+    counts = np.bincount(codes, minlength=9).reshape(3, 3)
+    other_levels = NPS_LEVELS if combine_with_nps else SATISFACTION_LEVELS
+    return pd.DataFrame(
+        counts,
+        index=pd.Index(SATISFACTION_LEVELS, name='category_sat'),
+        columns=pd.Index(other_levels, name='category_nps' if combine_with_nps else 'category_ke1')
+    )
+
+
+def category_codes(df, combine_with_nps):
+    """Combined code (0..8) per row of df: SAT x KE1 (Likelihood to Stay) or SAT x NPS."""
+    other = nps_codes(df['NPS']) if combine_with_nps else satisfaction_codes(df['KE1'])
+    return combined_codes(satisfaction_codes(df['SAT']), other)
+
+
+def category_breakdown(df, mask, column):
+    """Respondents per value of column among the masked rows of df.
+
+    Values with N = 1 are removed (confidentiality); percentage is of the
+    remaining total. Returns (table: column, count, percentage; total before
+    removal; number of values removed).
+    """
+    counts = df.loc[mask, column].value_counts().reset_index()
+    counts.columns = [column, 'count']
+    total = counts['count'].sum()
+    original_size = counts.shape[0]
+    counts = counts[counts['count'] > 1]
+    counts['percentage'] = (counts['count'] / counts['count'].sum()) * 100
+    return counts, total, original_size - counts.shape[0]
@@ -0,0 +1,182 @@
+import hashlib
+import multiprocessing
+import pickle
+import sys
+import threading
+import types
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+import pandas as pd
+
+# ==============================
+# ANALYTICS EXECUTOR
+# ==============================
+# CPU-heavy computations run in a process pool instead of the script thread.
+# Jobs are keyed by a hash of (function, arguments): a request that is
+# already running or finished (in any session) is shared, not recomputed.
+# While a caller waits, run() calls its on_wait callback every POLL_SECONDS
+# (result_cache.run_job touches a placeholder there, so a widget change
+# interrupts the wait with Streamlit's rerun); the job is then cancelled if no
+# other caller is waiting for it. A job that a worker process has already
+# picked up cannot be stopped; it finishes and its result is cached.
+#
+# All worker processes are started when a pool is created, so the process-wide
+# __main__ swap they need (see _plain_main) happens once per pool, not per job.
+# A pool whose worker died (e.g. OOM-killed) is replaced and the job retried once.
+#
+# The process-wide executor is result_cache.analytics_executor;
+# ES_ANALYTICS_WORKERS sets its pool size, 0 runs jobs inline.
+
+RESULT_CACHE_SIZE = 64
+POLL_SECONDS = 0.25
+
+
+def request_key(fn, args):
+    """Stable hash of fn and its arguments (DataFrames and arrays hashed by content)."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f'{fn.__module__}.{fn.__qualname__}'.encode())
+    for arg in args:
+        if isinstance(arg, (pd.DataFrame, pd.Series)):
+            h.update(pickle.dumps(list(arg.columns) if isinstance(arg, pd.DataFrame) else arg.name))
+            h.update(pd.util.hash_pandas_object(arg, index=True).to_numpy().tobytes())
+        elif isinstance(arg, np.ndarray):
+            h.update(f'{arg.dtype.str}{arg.shape}'.encode())
+            h.update(np.ascontiguousarray(arg).tobytes())
+        else:
+            h.update(pickle.dumps(arg))
+    return h.hexdigest()
+
+
+_pool_lock = threading.Lock()
+
+
+@contextmanager
+def _plain_main():
+    """Spawned workers re-import __main__, which under Streamlit is the page script.
+
+    Hide it while the pool starts processes so workers only import the job's module.
+    Streamlit installs its own __main__ for every script run, so the original is
+    only put back if nobody replaced the placeholder meanwhile.
+    """
+    main = sys.modules['__main__']
+    placeholder = types.ModuleType('__main__')
+    sys.modules['__main__'] = placeholder
+    try:
+        yield
+    finally:
+        if sys.modules.get('__main__') is placeholder:
+            sys.modules['__main__'] = main
+
+
+def _start_pool(max_workers):
+    """ProcessPoolExecutor with all its workers already started."""
+    with _pool_lock, _plain_main():
+        # spawn: forking the multi-threaded Streamlit server is not safe
+        pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+        # Each submit starts a worker while none is idle; later jobs reuse them
+        for _ in range(max_workers):
+            pool.submit(int)
+    return pool
+
+
+class AnalyticsExecutor:
+    """Process pool with request-hash deduplication and a small LRU of results."""
+
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self.pool = _start_pool(max_workers) if max_workers > 0 else None
+        self.lock = threading.Lock()
+        self.jobs = {}  # key -> [future, number of waiting sessions]
+        self.results = OrderedDict()
+        self.hits = 0  # served from results or joined a running job
+        self.misses = 0
+        self.restarts = 0
+
+    def _submit(self, fn, args):
+        try:
+            return self.pool.submit(fn, *args)
+        except BrokenProcessPool:
+            # A worker died: every job of this pool has failed, start a new one
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = _start_pool(self.max_workers)
+            self.restarts += 1
+            return self.pool.submit(fn, *args)
+
+    def acquire(self, key, fn, args, keep_result=True):
+        """Future for the request; joins a running job or a cached result if there is one.
+
+        keep_result=False leaves the result out of the LRU (the caller caches it).
+        """
+        with self.lock:
+            if key in self.results:
+                self.hits += 1
+                self.results.move_to_end(key)
+                future = Future()
+                future.set_result(self.results[key])
+                return future
+            job = self.jobs.get(key)
+            if job is not None and not job[0].cancelled() and not (job[0].done() and job[0].exception() is not None):
+                self.hits += 1
+                job[1] += 1
+                return job[0]
+            self.misses += 1
+            # Inline jobs are registered here and run below, outside the lock
+            future = Future() if self.pool is None else self._submit(fn, args)
+            self.jobs[key] = [future, 1]
+        future.add_done_callback(lambda f: self._finish(key, f, keep_result))
+        if self.pool is None and future.set_running_or_notify_cancel():
+            try:
+                future.set_result(fn(*args))
+            except Exception as exc:
+                future.set_exception(exc)
+        return future
+
+    def _finish(self, key, future, keep_result):
+        with self.lock:
+            if self.jobs.get(key, [None])[0] is future:
+                del self.jobs[key]
+            if keep_result and not future.cancelled() and future.exception() is None:
+                self.results[key] = future.result()
+                self.results.move_to_end(key)
+                while len(self.results) > RESULT_CACHE_SIZE:
+                    self.results.popitem(last=False)
+
+    def release(self, key):
+        """Stop waiting for key; cancel the job if nobody else waits for it."""
+        with self.lock:
+            job = self.jobs.get(key)
+            if job is None:
+                return
+            job[1] -= 1
+            if job[1] <= 0 and job[0].cancel():
+                del self.jobs[key]
+
+    def run(self, fn, args, on_wait=None, keep_result=True):
+        """fn(*args) through the pool; blocks until the result is ready.
+
+        on_wait() is called every POLL_SECONDS while the job runs. A job whose
+        worker died is retried once.
+        """
+        key = request_key(fn, args)
+        for attempt in range(2):
+            future = self.acquire(key, fn, args, keep_result)
+            try:
+                while not wait([future], timeout=POLL_SECONDS).done:
+                    if on_wait is not None:
+                        on_wait()
+                return future.result()
+            except BrokenProcessPool:
+                # The worker died mid-job; the retry's submit replaces the pool
+                if attempt:
+                    raise
+            finally:
+                self.release(key)
+
+    def stats(self):
+        """Hit/miss counters, cached results and running jobs."""
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'entries': len(self.results), 'running': len(self.jobs), 'restarts': self.restarts}
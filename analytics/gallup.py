@@ -0,0 +1,153 @@
+import numpy as np
+import pandas as pd
+
+GALLUP_ITEMS = [
+    "KD1", "KD2", "KI1", "KI2", "KI4", "KI5",
+    "KR2", "KR3", "KR4", "KR5", "PR1", "PR2"
+]
+
+ENGAGEMENT_LEVELS = ["Actively Disengaged", "Not Engaged", "Actively Engaged"]
+
+# Gallup State of the Global Workplace, % per category
+GALLUP_BENCHMARKS = {
+    2023: {
+        "Global":  {"Actively Disengaged": 18, "Not Engaged": 59, "Actively Engaged": 23},
+        "SEA":     {"Actively Disengaged": 6, "Not Engaged": 68, "Actively Engaged": 26}
+    },
+    2024: {
+        "Global":  {"Actively Disengaged": 15, "Not Engaged": 62, "Actively Engaged": 23},
+        "SEA":     {"Actively Disengaged": 8, "Not Engaged": 67, "Actively Engaged": 26}
+    },
+    2025: {
+        "Global":  {"Actively Disengaged": 17, "Not Engaged": 62, "Actively Engaged": 21},
+        "SEA":     {"Actively Disengaged": 8, "Not Engaged": 67, "Actively Engaged": 26}
+    },
+}
+
+# Actively Engaged (%) in Indonesia
+INDONESIA_BENCHMARK = {2023: 24, 2024: 26, 2025: 27}
+
+
+def gallup_scores(df, items):
+    """Mean of the Gallup items per respondent (missing answers skipped)."""
+    return df[items].mean(axis=1, skipna=True)
+
+
+def engagement_categories(scores):
+    """Actively Disengaged (<= 2.75) / Not Engaged (<= 4.24) / Actively Engaged, NaN without a score."""
+    s = np.asarray(scores, dtype=float)
+    categories = np.full(len(s), np.nan, dtype=object)
+    categories[~np.isnan(s)] = "Actively Engaged"
+    categories[s <= 4.24] = "Not Engaged"
+    categories[s <= 2.75] = "Actively Disengaged"
+    return categories
+
+
+def with_engagement(df, items):
+    """Copy of df with 'Gallup_Avg' and 'Engagement Category' columns."""
+    df = df.copy()
+    df['Gallup_Avg'] = gallup_scores(df, items)
+    df['Engagement Category'] = engagement_categories(df['Gallup_Avg'])
+    return df
+
+
+def engagement_distribution(df, group_col):
+    """% and count per engagement category within each value of group_col (long table: Group, Engagement Category, Percent, Count)."""
+    if not group_col or group_col not in df.columns:
+        return pd.DataFrame()
+    group_counts = df.groupby([group_col, "Engagement Category"]).size().unstack(fill_value=0)
+    group_perc = group_counts.div(group_counts.sum(axis=1), axis=0) * 100
+    group_perc = group_perc.reindex(columns=ENGAGEMENT_LEVELS, fill_value=0)
+    group_counts = group_counts.reindex(columns=ENGAGEMENT_LEVELS, fill_value=0)
+    group_perc.reset_index(inplace=True)
+    group_counts.reset_index(inplace=True)
+    merged = group_perc.melt(id_vars=[group_col], var_name="Engagement Category", value_name="Percent").merge(
+        group_counts.melt(id_vars=[group_col], var_name="Engagement Category", value_name="Count"),
+        on=[group_col, "Engagement Category"]
+    )
+    merged.rename(columns={group_col: "Group"}, inplace=True)
+    return merged
+
+
+def overall_comparison(df_all, df_selected, year):
+    """Global / Southeast Asia benchmarks, the whole company (KG) and each unit, per engagement category.
+
+    df_all is the user's unfiltered year (the KG bars and units), df_selected
+    the filtered one (which units are listed). Both need 'Engagement Category'.
+    Group is an ordered categorical: benchmarks, KG, then units.
+    """
+    kg_dist = (
+        df_all['Engagement Category']
+        .value_counts(normalize=True)
+        .reindex(ENGAGEMENT_LEVELS, fill_value=0)
+        * 100
+    )
+    kg_counts = df_all['Engagement Category'].value_counts().reindex(ENGAGEMENT_LEVELS, fill_value=0)
+
+    rows = []
+    for group, key in ((f"Global Gallup {year}", "Global"), (f"Southeast Asia {year}", "SEA")):
+        for cat in ENGAGEMENT_LEVELS:
+            rows.append({"Group": group, "Engagement Category": cat,
+                         "Percent": GALLUP_BENCHMARKS[year][key][cat], "Count": np.nan})
+    for cat in ENGAGEMENT_LEVELS:
+        rows.append({"Group": "KG", "Engagement Category": cat,
+                     "Percent": kg_dist[cat], "Count": int(kg_counts.get(cat, 0))})
+
+    units = engagement_distribution(df_all, "unit") if "unit" in df_all.columns else pd.DataFrame()
+    comparison = pd.concat([pd.DataFrame(rows), units], ignore_index=True)
+
+    order = [f"Global Gallup {year}", f"Southeast Asia {year}", "KG"]
+    if "unit" in df_selected.columns:
+        order += sorted(df_selected["unit"].dropna().unique().tolist())
+    comparison["Group"] = pd.Categorical(comparison["Group"], categories=order, ordered=True)
+    return comparison
+
+
+def engaged_percentage(df, items):
+    """Actively Engaged (%) of df; NaN for an empty frame."""
+    if df.empty:
+        return np.nan
+    categories = engagement_categories(gallup_scores(df, items))
+    valid = pd.notna(categories).sum()
+    return (categories == "Actively Engaged").sum() / valid * 100 if valid else 0.0
+
+
+def _engaged_by(df, group_col, groups, items):
+    # One pass over df: engaged and categorized counts per group; NaN for groups df lacks
+    categories = engagement_categories(gallup_scores(df, items))
+    counts = pd.DataFrame({
+        'group': df[group_col].to_numpy(dtype=object),
+        'valid': pd.notna(categories),
+        'engaged': categories == "Actively Engaged",
+    }).groupby('group', sort=False)[['valid', 'engaged']].sum().reindex(groups)
+    share = counts['engaged'] / counts['valid'] * 100
+    return share.where(counts['valid'] != 0, 0.0).where(counts['valid'].notna())
+
+
+def engaged_comparison(current, previous, group_col, items, benchmark):
+    """Actively Engaged (%) per value of group_col vs the Indonesia benchmark and last year.
+
+    previous is last year's frame (empty for the first survey year).
+    Δ vs Last Year is "—" where last year has no rows for the value.
+    """
+    groups = sorted(current[group_col].dropna().unique())
+    curr = _engaged_by(current, group_col, groups, items)
+    if not previous.empty:
+        prev = _engaged_by(previous, group_col, groups, items)
+    else:
+        prev = pd.Series(np.nan, index=curr.index)
+    return pd.DataFrame([
+        engaged_row(grp, curr.iloc[i], prev.iloc[i], benchmark)
+        for i, grp in enumerate(groups)
+    ], columns=["Group", "Actively Engaged (%)", "Indonesia Benchmark (%)", "Δ vs Last Year", "Status"])
+
+
+def engaged_row(group, engaged, previous, benchmark):
+    """One row of an engaged_comparison table."""
+    return {
+        "Group": group,
+        "Actively Engaged (%)": engaged,
+        "Indonesia Benchmark (%)": benchmark,
+        "Δ vs Last Year": round(engaged - previous, 1) if not np.isnan(previous) else "—",
+        "Status": "✅ Above ID" if engaged >= benchmark else "❌ Below ID"
+    }
@@ -0,0 +1,436 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+
+# ==============================
+# ITEMS
+# ==============================
+IPA_ITEMS = [
+    'KD0', 'KD1', 'KD2', 'KD3', 'KE0', 'KE1', 'KE2', 'KE3',
+    'KI0', 'KI1', 'KI2', 'KI3', 'KI4', 'KI5',
+    'KR0', 'KR1', 'KR2', 'KR3', 'KR4', 'KR5',
+    'PR0', 'PR1', 'PR2',
+    'TU0', 'TU1', 'TU2', 'TU3'
+]
+
+
+def ipa_items(year):
+    """IPA items asked in the given survey year (TU3 only exists from 2025)."""
+    if str(year) in ["2024", "2023"]:
+        return [c for c in IPA_ITEMS if c != 'TU3']
+    return list(IPA_ITEMS)
+
+
+# ==============================
+# IMPORTANCE METHODS
+# ==============================
+IMPORTANCE_METHODS = {
+    'ols': 'Standardized Beta (OLS)',
+    'ridge': 'Ridge Beta (standardized)',
+    'relative_weights': 'Relative Weights (Johnson)',
+}
+
+
+MISSING_MODES = {
+    'pairwise': 'Pairwise (semua data tersedia)',
+    'listwise': 'Listwise (hanya responden lengkap)',
+}
+
+
+def covariance_to_correlation(cov):
+    """Correlation matrices from a stack of covariance matrices (constant columns give zeros)."""
+    std = np.sqrt(np.clip(np.diagonal(cov, axis1=-2, axis2=-1), 0, None)).copy()
+    # Same convention as StandardScaler: constant columns are left unscaled (all zeros)
+    std[std == 0] = 1.0
+    return cov / (std[..., :, None] * std[..., None, :])
+
+
+def correlation_moments(values, weights=None):
+    """Pearson correlation, column means and pairwise N of a 2D array that may contain NaN.
+
+    Each pair of columns uses the rows where both are observed, all in a few
+    matmuls over the observed-mask. weights are optional row frequency weights
+    (used by the bootstrap). Without NaN this is the plain complete-data
+    correlation.
+    """
+    observed = ~np.isnan(values)
+    w = np.ones(values.shape[0]) if weights is None else np.asarray(weights, dtype=float)
+    weighted_mask = observed * w[:, None]
+    n_obs = weighted_mask.sum(axis=0)
+    means = np.where(observed, values, 0.0).T @ w / np.where(n_obs > 0, n_obs, 1)
+    means[n_obs == 0] = np.nan
+    centered = np.where(observed, values - means, 0.0)
+
+    if observed.all():
+        n_pair = np.full((values.shape[1], values.shape[1]), w.sum())
+        cov = centered.T @ (centered * w[:, None]) / w.sum()
+        return covariance_to_correlation(cov), means, n_pair
+
+    n_pair = observed.T.astype(float) @ weighted_mask
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # sums[i, j]: sum of column i over the rows where column j is observed
+        sums = centered.T @ weighted_mask
+        squares = (centered ** 2).T @ weighted_mask
+        pair_mean = sums / n_pair
+        cov = centered.T @ (centered * w[:, None]) / n_pair - pair_mean * pair_mean.T
+        var = squares / n_pair - pair_mean ** 2
+        var = np.where(var > 1e-12 * squares / n_pair, var, 0)
+        denom = np.sqrt(var * var.T)
+        corr = np.where((denom > 0) & (n_pair >= 2), cov / denom, 0.0)
+    np.fill_diagonal(corr, (np.diagonal(var) > 0).astype(float))
+    return corr, means, n_pair
+
+
+def _solve(a, b):
+    """Batched solve of a @ x = b, falling back to the pseudo-inverse if singular."""
+    try:
+        return np.linalg.solve(a, b[..., None])[..., 0]
+    except np.linalg.LinAlgError:
+        # Minimum-norm solution, same as LinearRegression on rank-deficient items
+        return (np.linalg.pinv(a) @ b[..., None])[..., 0]
+
+
+def batched_importance(corr, method='ols', alpha=1.0):
+    """Importance of the first p-1 variables for the last one, for a stack of correlation matrices.
+
+    corr has shape (..., p, p) with the target in the last row/column; the
+    result has shape (..., p-1).
+    """
+    r_xx = corr[..., :-1, :-1]
+    r_xy = corr[..., :-1, -1]
+    k = r_xx.shape[-1]
+
+    if method == 'ols':
+        # Normal equations on standardized data: R_xx @ beta = r_xy
+        return _solve(r_xx, r_xy)
+    if method == 'ridge':
+        return _solve(r_xx + alpha * np.eye(k), r_xy)
+    if method == 'relative_weights':
+        # Johnson (2000): regress on the orthogonal counterpart of the items,
+        # then map the squared weights back; the weights sum to R².
+        eigvals, eigvecs = np.linalg.eigh(r_xx)
+        eigvals = np.clip(eigvals, 0, None)
+        eigvecs_t = np.swapaxes(eigvecs, -1, -2)
+        sqrt_vals = np.sqrt(eigvals)
+        # Pseudo-inverse square root: drop directions of (numerically) zero variance
+        tol = eigvals.max(axis=-1, keepdims=True) * k * np.finfo(float).eps * 1e3
+        inv_sqrt = np.where(eigvals > tol, 1 / np.where(sqrt_vals > 0, sqrt_vals, 1), 0)
+        lam = (eigvecs * sqrt_vals[..., None, :]) @ eigvecs_t
+        beta_z = ((eigvecs * inv_sqrt[..., None, :]) @ eigvecs_t @ r_xy[..., None])[..., 0]
+        return ((lam ** 2) @ (beta_z ** 2)[..., None])[..., 0]
+    raise ValueError(f"Unknown importance method: {method}")
+
+
+def importance_from_correlation(corr, items, target, method='ols', alpha=1.0):
+    """Solve the standardized regression of target on items from a correlation matrix."""
+    columns = list(items) + [target]
+    coef = batched_importance(corr.loc[columns, columns].to_numpy(), method=method, alpha=alpha)
+    return pd.Series(coef, index=items)
+
+
+# ==============================
+# QUADRANTS
+# ==============================
+QUADRANTS = ['Leverage', 'Improve', 'Nice to have', 'Low priority']
+
+
+def classify_factor_dynamic(importance, performance, imp_mid, perf_mid):
+    if importance > imp_mid and performance > perf_mid:
+        return 'Leverage'
+    elif importance > imp_mid and performance <= perf_mid:
+        return 'Improve'
+    elif importance <= imp_mid and performance > perf_mid:
+        return 'Nice to have'
+    else:
+        return 'Low priority'
+
+
+def classify_quadrants(importance, performance):
+    """Vectorized classify_factor_dynamic with min/max midpoints along the last axis.
+
+    Returns integer codes into QUADRANTS with the same shape as the inputs.
+    """
+    imp_mid = (importance.max(axis=-1, keepdims=True) + importance.min(axis=-1, keepdims=True)) / 2
+    perf_mid = (performance.max(axis=-1, keepdims=True) + performance.min(axis=-1, keepdims=True)) / 2
+    high_imp = importance > imp_mid
+    high_perf = performance > perf_mid
+    return np.where(high_imp, np.where(high_perf, 0, 1), np.where(high_perf, 2, 3))
+
+
+def ipa_quadrants(table):
+    """Copy of an importance table with a 'Category' column, plus the midpoints.
+
+    Midpoints sit halfway between the min and max Importance / Performance.
+    Returns (table, importance_midpoint, performance_midpoint).
+    """
+    importance_midpoint = (table['Importance'].max() + table['Importance'].min()) / 2
+    performance_midpoint = (table['Performance'].max() + table['Performance'].min()) / 2
+    table = table.copy()
+    table['Category'] = [
+        classify_factor_dynamic(imp, perf, importance_midpoint, performance_midpoint)
+        for imp, perf in zip(table['Importance'], table['Performance'])
+    ]
+    return table, importance_midpoint, performance_midpoint
+
+
+# ==============================
+# RESULT TABLES
+# ==============================
+ITEM_LABELS = {
+    'KD1': 'Kejelasan ekspektasi kerja (KD1)',
+    'KD2': 'Dukungan kebutuhan kerja (KD2)',
+    'KD3': 'Komitmen kesejahteraan (KD3)',
+    'KD0': 'Pemenuhan kebutuhan dasar (KD0)',
+    'KE1': 'Keinginan bertahan (KE1)',
+    'KE2': 'Motivasi menjaga perusahaan (KE2)',
+    'KE3': 'Rasa bangga (KE3)',
+    'KE0': 'Keterlekatan emosional (KE0)',
+    'KI1': 'Kesempatan menunjukkan kemampuan (KI1)',
+    'KI2': 'Pengakuan hasil kerja (KI2)',
+    'KI3': 'Otonomi dalam bekerja (KI3)',
+    'KI4': 'Rasa dihargai (KI4)',
+    'KI5': 'Dukungan untuk berkembang (KI5)',
+    'KI0': 'Fasilitasi kontribusi individu (KI0)',
+    'PR1': 'Bimbingan untuk bertumbuh (PR1)',
+    'PR2': 'Kesempatan pengembangan karir (PR2)',
+    'PR0': 'Tempat bertumbuh ideal (PR0)',
+    'KR1': 'Rasa keadilan (KR1)',
+    'KR2': 'Penghargaan atas pendapat (KR2)',
+    'KR3': 'Rasa berharga pekerjaannya (KR3)',
+    'KR4': 'Komitmen rekan kerja (KR4)',
+    'KR5': 'Hubungan pertemanan (KR5)',
+    'KR0': 'Kolaborasi yang baik (KR0)',
+    'TU1': 'Keselarasan tujuan (TU1)',
+    'TU2': 'Keterikatan dengan tujuan perusahaan (TU2)',
+    'TU3': 'Penerapan nilai perusahaan (TU3)',
+    'TU0': 'Menemukan tujuan hidup (TU0)',
+}
+
+
+def with_item_labels(table):
+    """Copy of table with item codes in 'Factor' replaced by their labels."""
+    table = table.copy()
+    table['Factor'] = table['Factor'].replace(ITEM_LABELS)
+    return table
+
+
+def ipa_result_table(table, importance_midpoint, performance_midpoint):
+    """Labelled IPA table with a closing 'Midpoint' row."""
+    midpoint_row = pd.DataFrame({
+        'Factor': ['Midpoint'],
+        'Importance': [round(importance_midpoint, 3)],
+        'Performance': [round(performance_midpoint, 3)],
+        'Category': ['-']
+    })
+    return pd.concat([with_item_labels(table), midpoint_row], ignore_index=True)
+
+
+def improve_summary(group_df):
+    """Items in the 'Improve' quadrant per group table: how many groups and which ones."""
+    summary = (
+        group_df[group_df['Category'] == 'Improve']
+        .groupby('Factor')['Group']
+        .agg(['count', lambda g: ', '.join(g)])
+        .reset_index()
+    )
+    summary.columns = ['Factor', 'Jumlah Kelompok (Improve)', 'Kelompok']
+    summary = summary.sort_values('Jumlah Kelompok (Improve)', ascending=False)
+    return with_item_labels(summary)
+
+
+# ==============================
+# CACHED ENGINE
+# ==============================
+def _ipa_values(df, columns, missing):
+    """Items + target (last) as a float array of respondents who answered the target.
+
+    listwise also drops respondents with any missing item.
+    """
+    frame = df[list(columns)]
+    if missing == 'listwise':
+        frame = frame.dropna()
+    elif missing == 'pairwise':
+        frame = frame[frame[columns[-1]].notna()]
+    else:
+        raise ValueError(f"Unknown missing-data mode: {missing}")
+    return frame.to_numpy(dtype=float)
+
+
+def _moment_stats(df, columns, missing):
+    """Correlation matrix, item means and pairwise N."""
+    values = _ipa_values(df, columns, missing)
+    if values.shape[0] == 0:
+        return None, None, None
+    corr, means, n_pair = correlation_moments(values)
+    return (
+        pd.DataFrame(corr, index=columns, columns=columns),
+        pd.Series(means, index=columns),
+        pd.DataFrame(n_pair, index=columns, columns=columns),
+    )
+
+
+def compute_importance(df, year, target, items, method='ols', alpha=1.0, missing='pairwise'):
+    """Importance (per method), Performance (item mean) and effective N for each item.
+
+    With missing='pairwise' every correlation uses all respondents who answered
+    both questions, and N is the number who answered the item and the target;
+    'listwise' keeps only respondents who answered everything. Not cached here:
+    pages call it through result_cache.shared_result.
+    """
+    items = list(items)
+    columns = tuple(items) + (target,)
+    corr, means, n_pair = _moment_stats(df, columns, missing)
+    n = 0 if n_pair is None else int(n_pair.loc[target, target])
+    if n == 0:
+        return pd.DataFrame(columns=['Factor', 'Importance', 'Performance', 'N']), 0
+
+    importance = importance_from_correlation(corr, items, target, method=method, alpha=float(alpha))
+    result = pd.DataFrame({
+        'Factor': items,
+        'Importance': importance.values.round(3),
+        'Performance': means.loc[items].values.round(3),
+        'N': n_pair.loc[items, target].values.astype(int)
+    })
+    return result, n
+
+
+# ==============================
+# BOOTSTRAP STABILITY
+# ==============================
+def _bootstrap_moments(values, seed_seq, n_reps):
+    """Correlation matrices and means of values for n_reps bootstrap resamples."""
+    rng = np.random.default_rng(seed_seq)
+    n, p = values.shape
+    # Resampling with replacement == integer weights drawn from a multinomial
+    idx = rng.integers(0, n, size=(n_reps, n))
+    counts = np.bincount((idx + np.arange(n_reps)[:, None] * n).ravel(), minlength=n_reps * n)
+    counts = counts.reshape(n_reps, n).astype(float)
+
+    means = np.empty((n_reps, p))
+    corr = np.empty((n_reps, p, p))
+    for b in range(n_reps):
+        corr[b], means[b], _ = correlation_moments(values, weights=counts[b])
+    return means, corr
+
+
+def bootstrap_importance(values, method='ols', alpha=1.0, n_boot=200, seed=0, chunk_size=25, max_workers=None):
+    """Importance and Performance for n_boot bootstrap resamples of values.
+
+    values is an (n, p) array with the target in the last column; NaN entries
+    are handled pairwise. Resample moments are computed in chunks on a thread
+    pool (NumPy releases the GIL in matmul) and all n_boot regressions are
+    then solved in one batched call. Returns two (n_boot, p-1) arrays.
+    """
+    sizes = [min(chunk_size, n_boot - start) for start in range(0, n_boot, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    workers = max_workers or min(len(sizes), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        parts = list(executor.map(lambda args: _bootstrap_moments(values, *args), zip(seeds, sizes)))
+
+    means = np.concatenate([m for m, _ in parts])
+    corr = np.concatenate([c for _, c in parts])
+    importance = batched_importance(corr, method=method, alpha=alpha)
+    return importance, means[:, :-1]
+
+
+def bootstrap_table(values, items, method='ols', alpha=1.0, n_boot=200, seed=0):
+    """Quadrant probabilities and importance CI per item from the value matrix (target last)."""
+    columns = ['Factor', 'Importance CI Low', 'Importance CI High'] + [f'P({q})' for q in QUADRANTS] + ['Most Likely']
+    if values.shape[0] < 2:
+        return pd.DataFrame(columns=columns)
+
+    importance, performance = bootstrap_importance(values, method=method, alpha=alpha, n_boot=n_boot, seed=seed)
+    codes = classify_quadrants(importance, performance)
+    probs = (codes[:, :, None] == np.arange(len(QUADRANTS))).mean(axis=0)
+    ci_low, ci_high = np.percentile(importance, [2.5, 97.5], axis=0)
+
+    result = pd.DataFrame({
+        'Factor': list(items),
+        'Importance CI Low': ci_low.round(3),
+        'Importance CI High': ci_high.round(3),
+    })
+    for i, quadrant in enumerate(QUADRANTS):
+        result[f'P({quadrant})'] = probs[:, i].round(3)
+    result['Most Likely'] = np.array(QUADRANTS)[probs.argmax(axis=1)]
+    return result[columns]
+
+
+def bootstrap_quadrants(df, year, target, items, method='ols', alpha=1.0, missing='pairwise', n_boot=200, seed=0,
+                        run=None):
+    """Per-item quadrant probabilities and 95% importance CI from n_boot bootstrap refits.
+
+    run(fn, *args) runs the refits, e.g. result_cache.run_job on the analytics
+    process pool; without it they run in this thread.
+    """
+    values = _ipa_values(df, tuple(items) + (target,), missing)
+    args = (values, tuple(items), method, float(alpha), int(n_boot), int(seed))
+    return run(bootstrap_table, *args) if run is not None else bootstrap_table(*args)
+
+
+# ==============================
+# BATCH IPA PER GROUP
+# ==============================
+def grouped_correlations(values, codes, n_groups):
+    """Per-group row counts, means, correlation matrices and pairwise N of values.
+
+    codes are integer group codes in [0, n_groups); rows are sorted by group
+    once so that each group's moments come from a contiguous block.
+    """
+    order = np.argsort(codes, kind='stable')
+    sorted_values = values[order]
+    counts = np.bincount(codes, minlength=n_groups)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+    p = values.shape[1]
+    means = np.full((n_groups, p), np.nan)
+    corr = np.zeros((n_groups, p, p))
+    n_pair = np.zeros((n_groups, p, p))
+    for g in np.flatnonzero(counts):
+        block = sorted_values[starts[g]:starts[g] + counts[g]]
+        corr[g], means[g], n_pair[g] = correlation_moments(block)
+    return counts, means, corr, n_pair
+
+
+def compute_group_importance(df, year, target, items, group_col='subunit', method='ols', alpha=1.0,
+                             missing='pairwise', min_n=None):
+    """IPA for every value of group_col at once, as a long table.
+
+    Groups with fewer than min_n responses with a target answer (default: one
+    more than the number of items) are skipped and returned in the second
+    element.
+    """
+    items = list(items)
+    if min_n is None:
+        min_n = len(items) + 1
+    columns = ['Group', 'Factor', 'Importance', 'Performance', 'Category', 'N']
+    frame = df[[group_col] + items + [target]]
+    frame = frame[frame[group_col].notna() & frame[target].notna()]
+    if missing == 'listwise':
+        frame = frame.dropna()
+    values = _ipa_values(frame, tuple(items) + (target,), missing)
+    codes, groups = pd.factorize(frame[group_col], sort=True)
+    if len(groups) == 0:
+        return pd.DataFrame(columns=columns), []
+
+    counts, means, corr, n_pair = grouped_correlations(values, codes, len(groups))
+    keep = counts >= min_n
+    skipped = [str(g) for g in groups[~keep]]
+    if not keep.any():
+        return pd.DataFrame(columns=columns), skipped
+
+    importance = batched_importance(corr[keep], method=method, alpha=float(alpha)).round(3)
+    performance = means[keep, :-1].round(3)
+    categories = np.array(QUADRANTS)[classify_quadrants(importance, performance)]
+
+    n_keep, k = importance.shape
+    result = pd.DataFrame({
+        'Group': np.repeat(groups[keep].astype(str), k),
+        'Factor': np.tile(items, n_keep),
+        'Importance': importance.ravel(),
+        'Performance': performance.ravel(),
+        'Category': categories.ravel(),
+        'N': n_pair[keep, :-1, -1].astype(int).ravel(),
+    })
+    return result, skipped
+
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+
+# Definisikan warna, emotikon, dan deskripsi
+MOOD_MAP = {
+    1: {'emo': '😭', 'desc': 'Sedih', 'color': '#8B0000'},
+    2: {'emo': '😞', 'desc': 'Kesepian', 'color': '#CD5C5C'},
+    3: {'emo': '😐', 'desc': 'Tertekan', 'color': '#FFA07A'},
+    4: {'emo': '😠', 'desc': 'Marah', 'color': '#FFE4B5'},
+    5: {'emo': '😄', 'desc': 'Senang', 'color': '#FFD700'},
+    6: {'emo': '😁', 'desc': 'Bermakna', 'color': '#ADFF2F'},
+    7: {'emo': '🤩', 'desc': 'Tenteram', 'color': '#00BFFF'},
+    8: {'emo': '😍', 'desc': 'Tenang', 'color': '#00008B'}
+}
+MOOD_LEVELS = list(MOOD_MAP.keys())
+
+_DESC = np.array([MOOD_MAP[m]['desc'] for m in MOOD_LEVELS])
+_EMO = np.array([MOOD_MAP[m]['emo'] for m in MOOD_LEVELS])
+_COLOR = np.array([MOOD_MAP[m]['color'] for m in MOOD_LEVELS])
+
+
+def mood_distribution(df, group_cols, unique_col=None, label_sep=' '):
+    """8-bin EMO histogram per group, as a long table (one row per group and EMO level).
+
+    Counts come from a single np.bincount on group_code * 8 + (EMO - 1). With
+    unique_col (e.g. 'nik') each respondent is counted once per group and EMO.
+    Columns: *group_cols, EMO, count, total, percentage, desc, emo, color, label.
+    """
+    group_cols = list(group_cols)
+    columns = group_cols + ['EMO', 'count', 'total', 'percentage', 'desc', 'emo', 'color', 'label']
+    data = df[group_cols + ['EMO'] + ([unique_col] if unique_col else [])].dropna(subset=group_cols + ['EMO'])
+    emo = pd.to_numeric(data['EMO'], errors='coerce')
+    data = data[emo.isin(MOOD_LEVELS)]
+    if unique_col:
+        data = data.drop_duplicates()
+    if data.empty:
+        return pd.DataFrame(columns=columns)
+
+    n_levels = len(MOOD_LEVELS)
+    emo_codes = pd.to_numeric(data['EMO']).to_numpy(dtype=int) - 1
+    group_codes, groups = pd.MultiIndex.from_frame(data[group_cols]).factorize(sort=True)
+    counts = np.bincount(group_codes * n_levels + emo_codes, minlength=len(groups) * n_levels)
+    counts = counts.reshape(len(groups), n_levels)
+    totals = counts.sum(axis=1)
+    percentage = counts / totals[:, None] * 100
+
+    result = groups.repeat(n_levels).to_frame(index=False, name=group_cols)
+    result['EMO'] = np.tile(MOOD_LEVELS, len(groups))
+    result['count'] = counts.ravel()
+    result['total'] = totals.repeat(n_levels)
+    result['percentage'] = percentage.ravel()
+    result['desc'] = np.tile(_DESC, len(groups))
+    result['emo'] = np.tile(_EMO, len(groups))
+    result['color'] = np.tile(_COLOR, len(groups))
+    # Label text format: "xx.x% (n)"
+    result['label'] = (
+        pd.Series(np.char.mod('%.1f%%', result['percentage'].to_numpy()))
+        + label_sep + '(' + result['count'].astype(str) + ')'
+    )
+    return result[columns]
+
+
+def mood_by_year(frames, masks):
+    """Mood Meter per survey year: distinct respondents (nik) per EMO level among the masked rows.
+
+    frames/masks map year -> frame / boolean row mask. Levels nobody chose are
+    left out; 'year' is a string, as the chart's category axis expects.
+    """
+    summary = pd.concat(
+        [
+            mood_distribution(df.loc[masks[year], ['nik', 'EMO']].assign(year=year), ['year'], unique_col='nik')
+            for year, df in frames.items()
+        ],
+        ignore_index=True
+    )
+    summary = summary[summary['count'] > 0]
+    summary['year'] = summary['year'].astype(str)
+    return summary
+
+
+def mood_by_column(df, column):
+    """Mood Meter per value of column for rows with both column and EMO.
+
+    Values with a single answer are removed (confidentiality). Returns
+    (distribution, number of values removed).
+    """
+    counts = mood_distribution(df[[column, 'EMO']].dropna(how='any'), [column], label_sep='\n')
+    original_size = counts[column].nunique()
+    counts = counts[counts['total'] > 1]
+    return counts, original_size - counts[column].nunique()
@@ -0,0 +1,159 @@
+import pandas as pd
+
+YEARS = [2023, 2024, 2025]
+
+
+def nps_summary(df):
+    """Promoter (9-10) / passive (7-8) / detractor (0-6) counts and shares of df's NPS answers."""
+    nps = pd.to_numeric(df['NPS'], errors='coerce')
+    total = nps.count()
+    promoters = int((nps >= 9).sum())
+    passives = int(((nps >= 7) & (nps <= 8)).sum())
+    detractors = int((nps <= 6).sum())
+
+    percent_promoters = (promoters / total) * 100 if total > 0 else 0
+    percent_passives = (passives / total) * 100 if total > 0 else 0
+    percent_detractors = (detractors / total) * 100 if total > 0 else 0
+    return {
+        'promoters': promoters,
+        'passives': passives,
+        'detractors': detractors,
+        'percent_promoters': percent_promoters,
+        'percent_passives': percent_passives,
+        'percent_detractors': percent_detractors,
+        'nps': percent_promoters - percent_detractors,
+        'total': total
+    }
+
+
+def nps_by_year(df):
+    """NPS per survey year of a frame with a 'year' column.
+
+    Years with N <= 1 are left out of the table (confidentiality).
+    Returns (table with Year/Detractors/Passives/Promoters/NPS, {year: nps_summary}, removed years).
+    """
+    results = {year: nps_summary(df[df['year'] == year]) for year in YEARS}
+    nps_df = pd.DataFrame({
+        'Year': YEARS,
+        'Detractors': [results[y]['percent_detractors'] for y in YEARS],
+        'Passives': [results[y]['percent_passives'] for y in YEARS],
+        'Promoters': [results[y]['percent_promoters'] for y in YEARS],
+        'NPS': [results[y]['nps'] for y in YEARS]
+    })
+
+    removed = [year for year in YEARS if results[year]['total'] <= 1]
+    if removed:
+        nps_df = nps_df[~nps_df['Year'].isin(removed)]
+    nps_df['Year'] = nps_df['Year'].astype(int)
+    return nps_df, results, removed
+
+
+def _group_summary(df):
+    total = df['NPS'].count()
+
+    promoters = (df['NPS'] >= 9).sum()
+    detractors = (df['NPS'] <= 6).sum()
+    passives = ((df['NPS'] >= 7) & (df['NPS'] <= 8)).sum()
+
+    promoters_pct = (promoters / total) * 100 if total > 0 else 0
+    detractors_pct = (detractors / total) * 100 if total > 0 else 0
+
+    return pd.Series({
+        'Detractors': detractors_pct,
+        'Promoters': promoters_pct,
+        'NPS': promoters_pct - detractors_pct,
+        'Promoters_Count': promoters,
+        'Passives_Count': passives,
+        'Detractors_Count': detractors,
+        'Total': total
+    })
+
+
+def nps_comparison(df, column):
+    """Detractor % / promoter % / NPS per value of column and year, with year-over-year Δ.
+
+    Values with exactly one respondent (distinct nik) in any year are removed.
+    Returns (table, number of values removed).
+    """
+    yearly_counts = df.groupby([column, 'year'])['nik'].nunique().unstack(fill_value=0)
+    for y in YEARS:
+        if y not in yearly_counts.columns:
+            yearly_counts[y] = 0
+    to_remove = yearly_counts[(yearly_counts[YEARS] == 1).any(axis=1)].index.tolist()
+
+    data = df[~df[column].isin(to_remove)] if to_remove else df
+    data = data.assign(NPS=pd.to_numeric(data['NPS'], errors='coerce'))
+    summary = data.groupby([column, 'year'], dropna=False).apply(_group_summary).reset_index()
+
+    summary_2023 = summary[summary['year'] == 2023].drop(columns=['year'])
+    summary_2024 = summary[summary['year'] == 2024].drop(columns=['year'])
+    summary_2025 = summary[summary['year'] == 2025].drop(columns=['year'])
+
+    comparison = pd.merge(summary_2023, summary_2024, on=column, suffixes=('_2023', '_2024'), how='outer')
+    comparison = pd.merge(comparison, summary_2025, on=column, how='outer')
+    comparison.rename(columns={
+        'Detractors': 'Detractors_2025',
+        'Promoters': 'Promoters_2025',
+        'NPS': 'NPS_2025'
+    }, inplace=True)
+
+    comparison['Δ 2023–2024 (%)'] = (comparison['NPS_2024'] - comparison['NPS_2023']).round(1)
+    comparison['Δ 2024–2025 (%)'] = (comparison['NPS_2025'] - comparison['NPS_2024']).round(1)
+
+    ordered_cols = [
+        column,
+        'Detractors_2023', 'Promoters_2023', 'NPS_2023',
+        'Detractors_2024', 'Promoters_2024', 'NPS_2024',
+        'Δ 2023–2024 (%)',
+        'Detractors_2025', 'Promoters_2025', 'NPS_2025',
+        'Δ 2024–2025 (%)'
+    ]
+    comparison = comparison[[c for c in ordered_cols if c in comparison.columns]]
+    for col in comparison.columns:
+        if col.startswith(('Detractors_', 'Promoters_', 'NPS_')):
+            comparison[col] = comparison[col].round(1)
+    return comparison, len(to_remove)
+
+
+def nps_breakdown(df, column):
+    """Promoter / passive / detractor shares per value of column, for one year's rows.
+
+    Values with a single answer are removed. Returns None when df has no NPS
+    answers, else (per-value table with NPS_Score, long table for a stacked
+    bar with Percentage and Counts, removed values).
+    """
+    data = df.dropna(subset=['NPS'])
+    if data.empty:
+        return None
+    data = data.assign(NPS=pd.to_numeric(data['NPS'], errors='coerce'))
+
+    grouped = data.groupby(column).apply(lambda x: pd.Series({
+        'Promoters': (x['NPS'] >= 9).mean() * 100,
+        'Passives': ((x['NPS'] >= 7) & (x['NPS'] <= 8)).mean() * 100,
+        'Detractors': (x['NPS'] <= 6).mean() * 100,
+        'Promoters_Count': (x['NPS'] >= 9).sum(),
+        'Passives_Count': ((x['NPS'] >= 7) & (x['NPS'] <= 8)).sum(),
+        'Detractors_Count': (x['NPS'] <= 6).sum(),
+    })).reset_index()
+
+    # Confidentiality: drop values with N = 1
+    grouped['Total'] = grouped[['Promoters_Count', 'Passives_Count', 'Detractors_Count']].sum(axis=1)
+    removed = grouped[grouped['Total'] == 1][column].tolist()
+    grouped = grouped[grouped['Total'] > 1]
+
+    stacked = grouped.melt(
+        id_vars=[column],
+        value_vars=['Promoters', 'Passives', 'Detractors'],
+        var_name='NPS Category',
+        value_name='Percentage'
+    )
+    counts = grouped.melt(
+        id_vars=[column],
+        value_vars=['Promoters_Count', 'Passives_Count', 'Detractors_Count'],
+        var_name='NPS Category Count',
+        value_name='Counts'
+    )
+    stacked['Counts'] = counts['Counts'].values
+
+    grouped['NPS_Score'] = (grouped['Promoters'] - grouped['Detractors']).round(1)
+    return grouped, stacked, removed
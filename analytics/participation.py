@@ -0,0 +1,223 @@
+import threading
+import numpy as np
+import pandas as pd
+
+
+# Demographic columns with precomputed participation counts
+PARTICIPATION_COLUMNS = [
+    'unit', 'subunit', 'directorate', 'division', 'site', 'department', 'section',
+    'layer', 'status', 'generation', 'gender',
+    'tenure_category', 'region'
+]
+
+
+def participation_counts(df, year, columns, by=('subunit',)):
+    """Distinct `nik` submitted vs. total per (column, value), split by the `by` columns.
+
+    Returns a long table: year, column, value, *by, participants, total.
+    """
+    by = [b for b in by if b in df.columns]
+    tables = []
+    for col in columns:
+        if col not in df.columns:
+            continue
+        keys = by + [col] if col not in by else by
+        base = df[keys + ['nik', 'submitted']].drop_duplicates(keys + ['nik', 'submitted'])
+        total = base.drop_duplicates(keys + ['nik']).groupby(keys, observed=True).size()
+        done = base[base['submitted']].groupby(keys, observed=True).size()
+        counts = pd.DataFrame({'participants': done, 'total': total}).fillna(0).astype(int).reset_index()
+        counts['column'] = col
+        counts['value'] = counts[col].astype(str)
+        tables.append(counts[['column', 'value'] + by + ['participants', 'total']])
+
+    if not tables:
+        return pd.DataFrame(columns=['year', 'column', 'value'] + by + ['participants', 'total'])
+    result = pd.concat(tables, ignore_index=True)
+    result.insert(0, 'year', str(year))
+    return result
+
+
+def daily_counts(df, group_col, start, n_days=None):
+    """Submissions per (group, day since start) with one np.bincount over day offsets.
+
+    Uses the parsed 'submit_dt' column; rows without a submit date are ignored.
+    Returns (groups, counts) where counts has shape (len(groups), n_days).
+    """
+    dated = df[df['submit_dt'].notna() & df[group_col].notna()]
+    codes, groups = pd.factorize(dated[group_col], sort=True)
+    offsets = (dated['submit_dt'].dt.normalize() - start).dt.days.to_numpy()
+    if n_days is None:
+        n_days = int(offsets.max()) + 1 if len(offsets) else 0
+    keep = (offsets >= 0) & (offsets < n_days)
+    flat = np.bincount(codes[keep] * n_days + offsets[keep], minlength=len(groups) * n_days)
+    return list(groups), flat.reshape(len(groups), n_days)
+
+
+class DailyResponses:
+    """Daily submission counts per group for one survey year, updated incrementally.
+
+    The sheets are rosters: a response fills submit_date on the employee's
+    existing row. Each row (nik, plus its occurrence for repeated niks) keeps
+    its (group, day); a new data version bincounts only the rows whose cell
+    changed, removing their old cell and adding the new one. Frames of the
+    version already counted are skipped, and older versions are ignored.
+    """
+
+    def __init__(self, group_col):
+        self.group_col = group_col
+        self.lock = threading.Lock()
+        self.version = None
+        self.start = None
+        self.groups = []
+        self.counts = np.zeros((0, 0), dtype=np.int64)
+        self.rows = None
+        self.n_rows = 0
+
+    def _grow(self, groups, start, n_days):
+        """Make room for new groups, an earlier start date or later days."""
+        shift = 0 if self.start is None else (self.start - start).days
+        new_groups = [g for g in groups if g not in self.groups]
+        counts = np.zeros((len(self.groups) + len(new_groups), max(n_days, self.counts.shape[1] + shift)), dtype=np.int64)
+        counts[:len(self.groups), shift:shift + self.counts.shape[1]] = self.counts
+        self.counts = counts
+        self.groups = self.groups + new_groups
+        self.start = start
+
+    def _dated_rows(self, df):
+        """(group, submit day) of the submitted rows, indexed by (nik, occurrence)."""
+        dated = df['submit_dt'].notna().to_numpy() & df[self.group_col].notna().to_numpy()
+        occurrence = df.groupby('nik', dropna=False, sort=False).cumcount()
+        index = pd.MultiIndex.from_arrays([df['nik'].to_numpy()[dated], occurrence.to_numpy()[dated]])
+        return pd.DataFrame(
+            {self.group_col: df[self.group_col].to_numpy()[dated], 'submit_dt': df['submit_dt'].dt.normalize().to_numpy()[dated]},
+            index=index
+        )
+
+    def _add(self, rows, sign):
+        groups, counts = daily_counts(rows, self.group_col, self.start, self.counts.shape[1])
+        index = [self.groups.index(g) for g in groups]
+        self.counts[index] += sign * counts
+
+    def update(self, df):
+        version = df.attrs.get('data_version')
+        with self.lock:
+            if version is not None and self.version is not None and version <= self.version:
+                return self
+            rows = self._dated_rows(df)
+            previous = rows.iloc[:0] if self.rows is None else self.rows
+            old = previous.reindex(rows.index.union(previous.index))
+            new = rows.reindex(old.index)
+            changed = ~((old[self.group_col] == new[self.group_col]) & (old['submit_dt'] == new['submit_dt'])).to_numpy()
+            removed = old[changed].dropna()
+            added = new[changed].dropna()
+            if not added.empty:
+                first = added['submit_dt'].min()
+                start = first if self.start is None else min(self.start, first)
+                n_days = (added['submit_dt'].max() - start).days + 1
+                self._grow(added[self.group_col].unique(), start, n_days)
+                self._add(added, 1)
+            if not removed.empty:
+                self._add(removed, -1)
+            self.rows = rows
+            self.version = version
+            self.n_rows = len(df)
+            return self
+
+    def curve(self, groups=None):
+        """Daily and cumulative submissions summed over the given groups (all if None)."""
+        with self.lock:
+            if self.start is None:
+                return pd.DataFrame(columns=['date', 'daily', 'cumulative'])
+            rows = [self.groups.index(g) for g in (groups if groups is not None else self.groups) if g in self.groups]
+            daily = self.counts[rows].sum(axis=0)
+            dates = pd.date_range(self.start, periods=len(daily), freq='D')
+        return pd.DataFrame({'date': dates, 'daily': daily, 'cumulative': daily.cumsum()})
+
+
+def response_curve(df, group_col='subunit'):
+    """Daily and cumulative submissions of df (no caching, for filtered subsets)."""
+    dated = df['submit_dt'].dropna()
+    if dated.empty:
+        return pd.DataFrame(columns=['date', 'daily', 'cumulative'])
+    start = dated.min().normalize()
+    _, counts = daily_counts(df, group_col, start)
+    daily = counts.sum(axis=0)
+    return pd.DataFrame({
+        'date': pd.date_range(start, periods=len(daily), freq='D'),
+        'daily': daily,
+        'cumulative': daily.cumsum()
+    })
+
+
+def eta_to_target(curve, total, target_rate, window=7):
+    """Projected date the cumulative rate reaches target_rate (%) at the recent daily pace.
+
+    Returns (current_rate, pace_per_day, eta) where eta is a Timestamp, the date
+    the target was already reached, or None if the recent pace is zero.
+    """
+    if curve.empty or total == 0:
+        return 0.0, 0.0, None
+    submitted = int(curve['cumulative'].iloc[-1])
+    current_rate = submitted / total * 100
+    target_count = np.ceil(target_rate / 100 * total)
+    pace = float(curve['daily'].iloc[-window:].mean())
+    if submitted >= target_count:
+        return current_rate, pace, curve.loc[curve['cumulative'] >= target_count, 'date'].iloc[0]
+    if pace <= 0:
+        return current_rate, 0.0, None
+    days_left = int(np.ceil((target_count - submitted) / pace))
+    return current_rate, pace, curve['date'].iloc[-1] + pd.Timedelta(days=days_left)
+
+
+# ==============================
+# PARTICIPATION TABLES
+# ==============================
+YEARS = ("2023", "2024", "2025")
+
+
+def scoped_participation(frames, spec, columns, years=YEARS, table=None):
+    """participation_counts of the rows spec covers, for each year in years.
+
+    Without filters, and given the precomputed table (participation_table),
+    the table is sliced to spec.units; otherwise the rows are counted from
+    frames ({year: frame}), copying only the columns the counts read.
+    """
+    if not spec and table is not None:
+        return table[
+            table['subunit'].isin(spec.units) &
+            table['column'].isin(columns) &
+            table['year'].isin(years)
+        ]
+    counted = []
+    for y in years:
+        df = frames[y]
+        needed = [c for c in dict.fromkeys(['subunit', *columns, 'nik', 'submitted']) if c in df.columns]
+        counted.append(participation_counts(df.loc[spec.mask(df), needed], y, columns))
+    return pd.concat(counted, ignore_index=True)
+
+
+def yearly_participation(counts, years=YEARS):
+    """Participants, total and rate (%) per year from participation counts over one column (e.g. subunit)."""
+    yearly = counts.groupby('year')[['participants', 'total']].sum().reindex(list(years), fill_value=0)
+    return pd.DataFrame([
+        {
+            'year': row.Index,
+            'participants': row.participants,
+            'total': row.total,
+            'percentage': round(row.participants / row.total * 100, 1) if row.total > 0 else 0
+        }
+        for row in yearly.itertuples()
+    ])
+
+
+def participation_by_value(counts, column):
+    """Done / Not Done per value of column, as (% table, count table), values with nobody left out."""
+    grouped = counts.groupby('value')[['participants', 'total']].sum()
+    grouped = grouped[grouped['total'] > 0]
+
+    pivot_counts = pd.DataFrame({
+        'Done': grouped['participants'],
+        'Not Done': grouped['total'] - grouped['participants']
+    })
+    pivot_df = pivot_counts.div(grouped['total'], axis=0) * 100
+    return pivot_df.rename_axis(column).reset_index(), pivot_counts.rename_axis(column).reset_index()
@@ -0,0 +1,253 @@
+import numpy as np
+import pandas as pd
+
+# ==============================
+# COLUMNS
+# ==============================
+SATISFACTION_COLUMNS = [
+    'SAT', 'average_kd', 'average_ki', 'average_kr',
+    'average_pr', 'average_tu', 'average_ke'
+]
+
+SATISFACTION_ITEMS = [
+    'SAT',
+    'KD0', 'KD1', 'KD2', 'KD3', 'KE0', 'KE1', 'KE2', 'KE3',
+    'KI0', 'KI1', 'KI2', 'KI3', 'KI4', 'KI5',
+    'KR0', 'KR1', 'KR2', 'KR3', 'KR4', 'KR5',
+    'PR0', 'PR1', 'PR2',
+    'TU0', 'TU1', 'TU2', 'TU3'
+]
+
+SATISFACTION_LABELS = {
+    'SAT': 'Overall Satisfaction',
+    'average_kd': 'Kebutuhan Dasar',
+    'average_ki': 'Kontribusi Individu',
+    'average_kr': 'Kerjasama',
+    'average_pr': 'Pertumbuhan',
+    'average_tu': 'Tujuan',
+    'average_ke': 'Keterlekatan'
+}
+
+# Item-code prefix -> dimension, for the score distribution
+DIMENSION_PREFIXES = {
+    "SAT": "Overall Satisfaction",
+    "KD": "Kebutuhan Dasar",
+    "KI": "Kontribusi Individu",
+    "KR": "Kerjasama",
+    "PR": "Pertumbuhan",
+    "TU": "Tujuan",
+    "KE": "Keterlekatan"
+}
+
+YEARS = [2023, 2024, 2025]
+
+
+# ==============================
+# PREPARATION
+# ==============================
+def with_average_sat(df, items=SATISFACTION_ITEMS):
+    """Copy of df with SAT replaced by the mean of the satisfaction items (SAT included) it has."""
+    existing = [c for c in items if c in df.columns]
+    df = df.copy()
+    if existing:
+        df['SAT'] = df[existing].mean(axis=1)
+    return df
+
+
+def satisfaction_years(frames, spec, columns):
+    """Filtered year frames with numeric `columns`.
+
+    A year left with N <= 1 under an active filter comes back as an empty
+    frame (confidentiality). Returns ({year: frame}, [hidden years]).
+    """
+    years, hidden = {}, []
+    for year, df in frames.items():
+        df = spec.apply(df)
+        if df.shape[0] <= 1 and spec:
+            hidden.append(year)
+            df = pd.DataFrame()
+        for col in columns:
+            if col not in df.columns:
+                df[col] = pd.NA
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+        years[year] = df
+    return years, hidden
+
+
+# ==============================
+# YEAR COMPARISON
+# ==============================
+def top_box_percentage(df, columns):
+    """Top box % (score = 5) for each column in df."""
+    result = {}
+    for col in columns:
+        if col in df.columns:
+            total = df[col].notna().sum()
+            top5 = (df[col] == 5).sum()
+            result[col] = round((top5 / total * 100), 2) if total > 0 else np.nan
+        else:
+            result[col] = np.nan
+    return pd.Series(result)
+
+
+def year_comparison(years, columns, labels, item_level=False, drop_sat=False):
+    """Mean (and top box at item level) per dimension/item and year, with year-over-year progress.
+
+    years maps 2023/2024/2025 to the prepared frames; the last row holds N
+    (respondents with SAT). drop_sat removes the SAT row (item level with
+    SAT recomputed as the item average).
+    """
+    comparison = None
+    for year in YEARS:
+        avg = years[year][columns].mean().round(2).reset_index()
+        avg.columns = ['Dimension/Item', f'Average {year}']
+        comparison = avg if comparison is None else comparison.merge(avg, on='Dimension/Item', how='outer')
+
+    if item_level:
+        for year in YEARS:
+            top = top_box_percentage(years[year], columns).reset_index()
+            top.columns = ['Dimension/Item', f'Top Box {year} (%)']
+            comparison = comparison.merge(top, on='Dimension/Item', how='outer')
+
+    comparison['Dimension/Item'] = comparison['Dimension/Item'].map(labels).fillna(comparison['Dimension/Item'])
+
+    comparison['Progress 2024'] = comparison['Average 2024'] - comparison['Average 2023']
+    comparison['Progress 2025'] = comparison['Average 2025'] - comparison['Average 2024']
+
+    # N row
+    n = {year: years[year]['SAT'].count() for year in YEARS}
+    n_row = {
+        'Dimension/Item': 'N',
+        'Average 2023': n[2023],
+        'Average 2024': n[2024],
+        'Average 2025': n[2025],
+        'Progress 2024': n[2024] - n[2023],
+        'Progress 2025': n[2025] - n[2024],
+    }
+    if item_level:
+        n_row.update({f'Top Box {year} (%)': np.nan for year in YEARS})
+    comparison = pd.concat([comparison, pd.DataFrame([n_row])], ignore_index=True)
+
+    # SAT first
+    if 'SAT' in comparison['Dimension/Item'].values:
+        sat_row = comparison[comparison['Dimension/Item'] == 'SAT']
+        other_rows = comparison[comparison['Dimension/Item'] != 'SAT']
+        comparison = pd.concat([sat_row, other_rows], ignore_index=True)
+
+    if drop_sat:
+        comparison = comparison[comparison['Dimension/Item'] != 'SAT']
+
+    if item_level:
+        return comparison[['Dimension/Item', 'Top Box 2023 (%)', 'Average 2023', 'Top Box 2024 (%)', 'Average 2024', 'Progress 2024', 'Top Box 2025 (%)', 'Average 2025', 'Progress 2025']]
+    return comparison[['Dimension/Item', 'Average 2023', 'Average 2024', 'Progress 2024', 'Average 2025', 'Progress 2025']]
+
+
+# ==============================
+# DEMOGRAPHY COMPARISON
+# ==============================
+def summarize_by_demography(df, year, dimension_col, demo_col, include_topbox=False):
+    """Mean, N (and top box %) of dimension_col per value of demo_col; missing values become 'Missing'."""
+    if demo_col not in df.columns:
+        base_cols = [demo_col, f'{year} Mean', f'{year} N']
+        if include_topbox:
+            base_cols.insert(2, f'{year} Top Box (%)')
+        return pd.DataFrame(columns=base_cols)
+
+    temp = df.copy()
+    temp[demo_col] = temp[demo_col].astype(object).fillna("Missing").astype(str)
+
+    grouped = (
+        temp.groupby(demo_col)[dimension_col]
+        .agg(['mean', 'count'])
+        .round(2)
+        .reset_index()
+    )
+    grouped.columns = [demo_col, f'{year} Mean', f'{year} N']
+
+    if include_topbox:
+        topbox = (
+            temp.groupby(demo_col)[dimension_col]
+            .apply(lambda x: (x == 5).sum() / x.notna().sum() * 100 if x.notna().sum() > 0 else np.nan)
+            .reset_index(name=f'{year} Top Box (%)')
+        )
+        grouped = grouped.merge(topbox, on=demo_col, how='left')
+
+    return grouped
+
+
+def demography_comparison(years, dimension_col, demo_col, include_topbox=False):
+    """Per-year N / top box / mean / progress of one dimension by demographic value.
+
+    Values with N = 1 in any year are removed. Sorted by the 2025 mean.
+    Returns (table, number of values removed).
+    """
+    merged = None
+    for year in YEARS:
+        summary = summarize_by_demography(years[year], year, dimension_col, demo_col, include_topbox=include_topbox)
+        merged = summary if merged is None else merged.merge(summary, on=demo_col, how='outer')
+
+    for col in [f'{y} Mean' for y in YEARS]:
+        if col in merged.columns:
+            merged[col] = pd.to_numeric(merged[col], errors='coerce')
+
+    # Remove N=1 for confidentiality
+    n_cols = [f'{y} N' for y in YEARS if f'{y} N' in merged.columns]
+    rows_removed = 0
+    if n_cols:
+        condition = (merged[n_cols] == 1).any(axis=1)
+        rows_removed = condition.sum()
+        merged = merged[~condition]
+
+    if '2023 Mean' in merged.columns and '2024 Mean' in merged.columns:
+        merged['Progress 2024'] = merged['2024 Mean'] - merged['2023 Mean']
+    if '2024 Mean' in merged.columns and '2025 Mean' in merged.columns:
+        merged['Progress 2025'] = merged['2025 Mean'] - merged['2024 Mean']
+
+    # Column ordering: N -> Top Box (if any) -> Mean -> Progress
+    cols = [demo_col]
+    for y in YEARS:
+        if f'{y} Mean' in merged.columns:
+            year_cols = [f'{y} N']
+            if f'{y} Top Box (%)' in merged.columns:
+                year_cols.append(f'{y} Top Box (%)')
+            year_cols.append(f'{y} Mean')
+            if y in [2024, 2025]:
+                year_cols.append(f'Progress {y}')
+            cols += year_cols
+    merged = merged[cols]
+
+    if '2025 Mean' in merged.columns:
+        merged = merged.sort_values(by='2025 Mean', ascending=False)
+    return merged, rows_removed
+
+
+# ==============================
+# SCORE DISTRIBUTION
+# ==============================
+def score_distribution(df, prefixes=DIMENSION_PREFIXES):
+    """Share (%) of answers 1..5 per dimension, pooled over the items of each prefix.
+
+    Long table: Dimension, Score ('1'..'5'), Percent.
+    """
+    table = pd.DataFrame(columns=[1, 2, 3, 4, 5])
+    for prefix, label in prefixes.items():
+        relevant_columns = [col for col in df.columns if col.lower().startswith(prefix.lower())]
+        if relevant_columns:
+            scores = df[relevant_columns].melt(value_name='Score').drop(columns='variable')
+            score_counts = (
+                scores['Score']
+                .value_counts(normalize=True)
+                .reindex(range(1, 6), fill_value=0) * 100
+            ).round(1)
+            table.loc[label] = score_counts.values
+
+    table.reset_index(inplace=True)
+    table.columns = ['Dimension', 1, 2, 3, 4, 5]
+    table.columns = table.columns.astype(str)
+
+    return table.melt(
+        id_vars='Dimension',
+        value_vars=['1', '2', '3', '4', '5'],
+        var_name='Score',
+        value_name='Percent'
+    )
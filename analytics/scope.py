@@ -0,0 +1,41 @@
+import numpy as np
+
+
+class FilterSpec:
+    """Rows a view covers: the user's subunits, narrowed by the selected filter values.
+
+    units=None means no subunit restriction (e.g. frames that are already
+    scoped). Filters on columns a frame does not have are ignored, and empty
+    selections count as "no filter", as make_filter returns them.
+    """
+
+    def __init__(self, units=None, filters=None):
+        self.units = None if units is None else tuple(units)
+        self.filters = {col: list(values) for col, values in (filters or {}).items() if len(values)}
+
+    def __bool__(self):
+        return bool(self.filters)
+
+    def mask(self, df):
+        """Boolean row mask of df."""
+        if self.units is None:
+            mask = np.ones(len(df), dtype=bool)
+        else:
+            mask = df['subunit'].isin(self.units).to_numpy()
+        for col, values in self.filters.items():
+            if col in df.columns:
+                mask &= df[col].isin(values).to_numpy()
+        return mask
+
+    def apply(self, df):
+        """The covered rows of df as a frame owned by the caller (take, not a view)."""
+        return df.take(np.flatnonzero(self.mask(df)))
+
+    def key(self):
+        """Canonical, hashable form: the same selection in any order gives the same key."""
+        units = None if self.units is None else tuple(sorted(set(self.units)))
+        filters = tuple(sorted((col, tuple(sorted(set(map(str, values))))) for col, values in self.filters.items()))
+        return units, filters
+
+    def __repr__(self):
+        return f'FilterSpec(units={self.units!r}, filters={self.filters!r})'
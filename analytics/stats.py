@@ -0,0 +1,174 @@
+import numpy as np
+import pandas as pd
+from lazy_import import lazy_import
+
+stats = lazy_import('scipy.stats')
+
+
+def check_normality(samples):
+    """Shapiro–Wilk at 5%; fewer than 5 samples count as not normal."""
+    if len(samples) < 5:
+        return False
+    _, p = stats.shapiro(samples)
+    return p > 0.05
+
+
+def correlation_tests(data):
+    """Pairwise correlation of every column pair with automatic test selection.
+
+    Each pair uses its common non-missing rows: Pearson if both sides pass
+    the normality check, Spearman otherwise. The matrix is Pearson only if
+    every column is normal. Returns (pair table, correlation matrix, method).
+    """
+    variables = list(data.columns)
+    results = []
+    for i in range(len(variables)):
+        for j in range(i + 1, len(variables)):
+            pair = data[[variables[i], variables[j]]].dropna()
+            x, y = pair[variables[i]], pair[variables[j]]
+
+            if len(x) > 2:
+                normal_x, normal_y = check_normality(x), check_normality(y)
+                if normal_x and normal_y:
+                    r, p = stats.pearsonr(x, y)
+                    test_used = "Pearson"
+                else:
+                    r, p = stats.spearmanr(x, y)
+                    test_used = "Spearman"
+
+                results.append({
+                    "Var1": variables[i],
+                    "Var2": variables[j],
+                    "Normal Var1": normal_x,
+                    "Normal Var2": normal_y,
+                    "Test Used": test_used,
+                    "r": round(r, 3),
+                    "p-value": round(p, 4),
+                    "Significant (p<0.05)": "✅" if p < 0.05 else "–"
+                })
+
+    method = 'pearson' if all(check_normality(data[v].dropna()) for v in variables) else 'spearman'
+    corr_matrix = data.corr(method=method).round(3)
+    return pd.DataFrame(results), corr_matrix, method
+
+
+# ==============================
+# MEAN DIFFERENCE TESTS
+# ==============================
+def cohen_d(x, y):
+    """Cohen's d with the pooled (average-variance) standard deviation."""
+    return (np.mean(x) - np.mean(y)) / np.sqrt((np.std(x, ddof=1)**2 + np.std(y, ddof=1)**2)/2)
+
+
+def rank_biserial_r(stat, n1, n2=None, test_type="mannwhitney"):
+    """Effect size r = z / sqrt(N) of a Mann–Whitney U or Wilcoxon W statistic (normal approximation)."""
+    if test_type == "mannwhitney":
+        U = stat
+        mean_U = n1 * n2 / 2
+        std_U = np.sqrt(n1 * n2 * (n1 + n2 + 1) / 12)
+        z = (U - mean_U) / std_U
+        r = z / np.sqrt(n1 + n2)
+    else:
+        W = stat
+        n = n1
+        mean_W = n*(n+1)/4
+        std_W = np.sqrt(n*(n+1)*(2*n+1)/24)
+        z = (W - mean_W) / std_W
+        r = z / np.sqrt(n)
+    return r
+
+
+def kruskal_eta_sq(H, k, n):
+    """Eta squared of a Kruskal–Wallis H over k groups and n observations."""
+    return (H - k + 1) / (n - k)
+
+
+def interpret_effect_size(es, test_type="cohen"):
+    """Negligible / Small / Medium / Large for a Cohen's d, an r or an eta squared."""
+    if test_type == "cohen":
+        if abs(es) < 0.2:
+            return "Negligible"
+        elif abs(es) < 0.5:
+            return "Small"
+        elif abs(es) < 0.8:
+            return "Medium"
+        else:
+            return "Large"
+    elif test_type == "r":
+        if abs(es) < 0.1:
+            return "Negligible"
+        elif abs(es) < 0.3:
+            return "Small"
+        elif abs(es) < 0.5:
+            return "Medium"
+        else:
+            return "Large"
+    elif test_type == "eta":
+        if es < 0.01:
+            return "Negligible"
+        elif es < 0.06:
+            return "Small"
+        elif es < 0.14:
+            return "Medium"
+        else:
+            return "Large"
+    return "Unknown"
+
+
+def group_summary(groups, labels):
+    """N, mean and standard deviation of each sample (table: Group, N, Mean, Std Dev)."""
+    return pd.DataFrame({
+        'Group': list(labels),
+        'N': [len(g) for g in groups],
+        'Mean': [np.mean(g) for g in groups],
+        'Std Dev': [np.std(g, ddof=1) for g in groups],
+    })
+
+
+def _test_result(test, stat, p, effect_size, es_type):
+    return {
+        'test': test, 'stat': stat, 'p': p,
+        'effect_size': effect_size, 'effect_label': interpret_effect_size(effect_size, test_type=es_type)
+    }
+
+
+def independent_test(x, y):
+    """Welch t-test if both samples pass the normality check, Mann–Whitney U otherwise.
+
+    Returns {test, stat, p, effect_size, effect_label}; the effect size is
+    Cohen's d or the rank-biserial r.
+    """
+    if check_normality(x) and check_normality(y):
+        stat, p = stats.ttest_ind(x, y, equal_var=False)
+        return _test_result("Independent T-test", stat, p, cohen_d(x, y), "cohen")
+    stat, p = stats.mannwhitneyu(x, y)
+    return _test_result("Mann–Whitney U test", stat, p, rank_biserial_r(stat, len(x), len(y), test_type="mannwhitney"), "r")
+
+
+def paired_test(x, y):
+    """Paired t-test if the differences pass the normality check, Wilcoxon signed-rank otherwise."""
+    if check_normality(x - y):
+        stat, p = stats.ttest_rel(x, y)
+        return _test_result("Paired T-test", stat, p, cohen_d(x, y), "cohen")
+    stat, p = stats.wilcoxon(x, y)
+    return _test_result("Wilcoxon Signed-Rank", stat, p, rank_biserial_r(stat, len(x), test_type="wilcoxon"), "r")
+
+
+def multi_group_test(groups):
+    """One-way ANOVA (eta squared) if every group passes the normality check, Kruskal–Wallis otherwise."""
+    if all(check_normality(g) for g in groups):
+        stat, p = stats.f_oneway(*groups)
+        values = np.concatenate([np.asarray(g, dtype=float) for g in groups])
+        grand_mean = np.mean(values)
+        ss_between = sum(len(g)*(np.mean(g)-grand_mean)**2 for g in groups)
+        ss_total = np.sum((values - grand_mean)**2)
+        return _test_result("One-way ANOVA", stat, p, ss_between / ss_total, "eta")
+    stat, p = stats.kruskal(*groups)
+    n_total = sum(len(g) for g in groups)
+    return _test_result("Kruskal–Wallis", stat, p, kruskal_eta_sq(stat, len(groups), n_total), "eta")
+
+
+def paired_samples(df1, df2, column):
+    """column of the respondents (by nik) present in both frames, as two aligned Series."""
+    merged = df1[['nik', column]].merge(df2[['nik', column]], on='nik', how='inner', suffixes=('_1', '_2'))
+    return merged[f'{column}_1'], merged[f'{column}_2']
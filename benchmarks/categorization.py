@@ -0,0 +1,116 @@
+"""Per-rerun cost of the categorization page (page5) at a given respondent count.
+
+The es25 snapshot is resampled to --rows respondents. Both versions of the
+page's computation run on it and are timed:
+  before: categorize/categorize_NPS per element for three years, combined
+          category per row with apply(axis=1), pivot_table + reindex;
+  after:  satisfaction/NPS codes for the selected year only, one bincount.
+The heatmap counts and the demography breakdown must match.
+
+    python benchmarks/categorization.py --data snapshots/ --rows 100000
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from rerun_memory import ROOT  # noqa: F401 (puts the repo on sys.path)
+from analytics.categorization import (
+    SATISFACTION_LEVELS, NPS_LEVELS, category_matrix, combined_codes, combined_labels, nps_codes, satisfaction_codes
+)
+
+
+def categorize(value):
+    if value >= 4:
+        return 'High'
+    elif value <= 2:
+        return 'Low'
+    else:
+        return 'Medium'
+
+
+def categorize_NPS(value):
+    if value >= 9:
+        return 'Promoter'
+    elif value <= 6:
+        return 'Detractor'
+    else:
+        return 'Passive'
+
+
+def before(years, combine_with_nps, comparison_column):
+    for df in years:
+        df['category_sat'] = df['SAT'].apply(categorize)
+        df['category_ke1'] = df['KE1'].apply(categorize)
+        df['category_nps'] = df['NPS'].apply(categorize_NPS)
+    df_survey = years[0].copy()
+    df_survey = df_survey[(~df_survey['KE1'].isna()) | (~df_survey['NPS'].isna())]
+    other = 'category_nps' if combine_with_nps else 'category_ke1'
+    suffix = '' if combine_with_nps else ' Likelihood to Stay'
+    df_survey['combined_category'] = df_survey.apply(
+        lambda row: f"{row['category_sat']} Satisfaction - {row[other]}{suffix}", axis=1
+    )
+    levels = NPS_LEVELS if combine_with_nps else SATISFACTION_LEVELS
+    df_survey[other] = pd.Categorical(df_survey[other], categories=levels, ordered=True)
+    pivot = df_survey.pivot_table(index='category_sat', columns=other, aggfunc='size', fill_value=0, observed=False)
+    pivot = pivot.reindex(index=SATISFACTION_LEVELS, columns=levels).fillna(0)
+    selected = sorted(df_survey['combined_category'].unique())[0]
+    breakdown = df_survey[df_survey['combined_category'] == selected][comparison_column].value_counts()
+    return pivot, selected, breakdown
+
+
+def after(years, combine_with_nps, comparison_column):
+    df = years[0]
+    df_survey = df.take(np.flatnonzero((df['KE1'].notna() | df['NPS'].notna()).to_numpy()))
+    sat = satisfaction_codes(df_survey['SAT'])
+    other = nps_codes(df_survey['NPS']) if combine_with_nps else satisfaction_codes(df_survey['KE1'])
+    codes = combined_codes(sat, other)
+    labels = combined_labels(combine_with_nps)
+    pivot = category_matrix(codes, combine_with_nps)
+    selected = sorted(labels[c] for c in np.flatnonzero(pivot.to_numpy().ravel()))[0]
+    breakdown = df_survey.loc[codes == labels.index(selected), comparison_column].value_counts()
+    return pivot, selected, breakdown
+
+
+def best_of(fn, frames, repeat, *args):
+    times = []
+    for _ in range(repeat):
+        years = [df.copy() for df in frames]
+        start = time.perf_counter()
+        result = fn(years, *args)
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', required=True, help='directory with es25/es24/es23 .pkl snapshots')
+    parser.add_argument('--rows', type=int, default=100_000, help='respondents per year')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--column', default='layer', help='comparison column for the breakdown')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    frames = []
+    for name in ('es25', 'es24', 'es23'):
+        df = pd.read_pickle(os.path.join(args.data, f'{name}.pkl'))
+        df = df.iloc[rng.integers(0, len(df), args.rows)].reset_index(drop=True)
+        for col in ('SAT', 'KE1', 'NPS'):
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+        frames.append(df)
+
+    print(f"{args.rows} respondents per year, best of {args.repeat}")
+    print(f"{'combination':<28} {'before s':>9} {'after s':>8} {'speed-up':>9}")
+    for combine_with_nps in (False, True):
+        t_before, (p_before, s_before, b_before) = best_of(before, frames, args.repeat, combine_with_nps, args.column)
+        t_after, (p_after, s_after, b_after) = best_of(after, frames, args.repeat, combine_with_nps, args.column)
+        assert (p_before.to_numpy() == p_after.to_numpy()).all(), 'heatmap counts differ'
+        assert s_before == s_after and b_before.sort_index().equals(b_after.sort_index()), 'breakdown differs'
+        label = 'Satisfaction x NPS' if combine_with_nps else 'Satisfaction x Likelihood'
+        print(f"{label:<28} {t_before:>9.3f} {t_after:>8.3f} {t_before / t_after:>8.0f}x")
+
+
+if __name__ == '__main__':
+    main()
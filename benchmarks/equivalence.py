@@ -0,0 +1,490 @@
+"""Golden-output check: the pages' original computations against the analytics engines.
+
+Each case runs a reference implementation (the computation as the page did it
+before it was optimized, kept here as it was) and the engine the page calls
+now on the same prepared frames. It compares the published numbers within a
+tolerance and reports the time of each and the speed-up:
+  nps_by_year      NPS shares per year (page4);
+  nps_comparison   NPS per demographic value and year, with deltas (page4);
+  top_box          top box % per satisfaction item and year (page3);
+  mood_by_year     Mood Meter distribution per year (page2);
+  gallup           engagement categories per unit and year (page7);
+  categorization   satisfaction x NPS / likelihood heatmap counts (page5);
+  ipa_ols          standardized betas vs least squares on standardized data (page8);
+  ipa_ridge        ridge betas vs the closed-form ridge on standardized data;
+  ipa_groups       per-subunit betas vs one least-squares fit per subunit.
+
+The frames come from synthetic sheets (synthetic.py, one run per --rows) and
+from snapshot directories (--data, es25/es24/es23/creds .pkl as the
+fetch_data functions return them, e.g. an anonymized export). They are
+prepared with build_data as in the app. Every case runs on all rows and on
+the scope of each --users name found in the creds sheet. The engines keep
+no caches of their own, so engine times are cold.
+
+    python benchmarks/equivalence.py --rows 10000 100000
+    python benchmarks/equivalence.py --data fixtures/ --rows --cases nps_comparison ipa_ols
+
+Exits with status 1 when any case differs.
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from rerun_memory import ROOT  # noqa: F401 (puts the repo on sys.path)
+
+YEARS = [2023, 2024, 2025]
+
+# Published values are rounded to 1-3 decimals; a difference in the last digit
+# from floating-point summation order is within tolerance, anything larger is not
+TOLERANCE = {
+    'nps_by_year': 1e-9,
+    'nps_comparison': 0.1 + 1e-9,
+    'top_box': 0.01 + 1e-9,
+    'mood_by_year': 1e-9,
+    'gallup': 1e-9,
+    'categorization': 0,
+    'ipa_ols': 0.001 + 1e-9,
+    'ipa_ridge': 0.001 + 1e-9,
+    'ipa_groups': 0.001 + 1e-9,
+}
+IPA_TARGETS = ('SAT', 'NPS')
+COMPARISON_COLUMN = 'layer'
+
+
+# ==============================
+# REFERENCE IMPLEMENTATIONS
+# ==============================
+def reference_nps_by_year(data):
+    def calculate_nps(df):
+        df['NPS'] = pd.to_numeric(df['NPS'], errors='coerce')
+        total = df['NPS'].count()
+        promoters = df[df['NPS'] >= 9].shape[0]
+        passives = df[(df['NPS'] >= 7) & (df['NPS'] <= 8)].shape[0]
+        detractors = df[df['NPS'] <= 6].shape[0]
+
+        percent_promoters = (promoters / total) * 100 if total > 0 else 0
+        percent_passives = (passives / total) * 100 if total > 0 else 0
+        percent_detractors = (detractors / total) * 100 if total > 0 else 0
+        nps = percent_promoters - percent_detractors
+        return {'promoters': promoters, 'passives': passives, 'detractors': detractors,
+                'percent_promoters': percent_promoters, 'percent_passives': percent_passives,
+                'percent_detractors': percent_detractors, 'nps': nps, 'total': total}
+
+    filtered_data = data['combined']
+    results = {}
+    for year in YEARS:
+        df_year = filtered_data[filtered_data['year'] == year].copy()
+        results[year] = calculate_nps(df_year)
+    nps_df = pd.DataFrame({
+        'Year': YEARS,
+        'Detractors': [results[y]['percent_detractors'] for y in YEARS],
+        'Passives': [results[y]['percent_passives'] for y in YEARS],
+        'Promoters': [results[y]['percent_promoters'] for y in YEARS],
+        'NPS': [results[y]['nps'] for y in YEARS],
+        'total': [results[y]['total'] for y in YEARS],
+    })
+    years_to_remove = [year for year in YEARS if results[year]['total'] <= 1]
+    return nps_df[~nps_df['Year'].isin(years_to_remove)]
+
+
+def reference_nps_comparison(data):
+    selected_filter = COMPARISON_COLUMN
+    nps_compare = data['combined'].copy()
+    yearly_counts = nps_compare.groupby([selected_filter, 'year'])['nik'].nunique().unstack(fill_value=0)
+    for y in YEARS:
+        if y not in yearly_counts.columns:
+            yearly_counts[y] = 0
+    mask_remove = (yearly_counts[YEARS] == 1).any(axis=1)
+    to_remove = yearly_counts[mask_remove].index.tolist()
+    if len(to_remove) > 0:
+        nps_compare = nps_compare[~nps_compare[selected_filter].isin(to_remove)]
+
+    def calc_nps_summary(df):
+        df['NPS'] = pd.to_numeric(df['NPS'], errors='coerce')
+        total = df['NPS'].count()
+        promoters = (df['NPS'] >= 9).sum()
+        detractors = (df['NPS'] <= 6).sum()
+        passives = ((df['NPS'] >= 7) & (df['NPS'] <= 8)).sum()
+        promoters_pct = (promoters / total) * 100 if total > 0 else 0
+        detractors_pct = (detractors / total) * 100 if total > 0 else 0
+        return pd.Series({
+            'Detractors': detractors_pct, 'Promoters': promoters_pct, 'NPS': promoters_pct - detractors_pct,
+            'Promoters_Count': promoters, 'Passives_Count': passives, 'Detractors_Count': detractors,
+            'Total': total
+        })
+
+    summary = nps_compare.groupby([selected_filter, 'year'], dropna=False).apply(calc_nps_summary).reset_index()
+    summary_2023 = summary[summary['year'] == 2023].drop(columns=['year'])
+    summary_2024 = summary[summary['year'] == 2024].drop(columns=['year'])
+    summary_2025 = summary[summary['year'] == 2025].drop(columns=['year'])
+    comparison_df = pd.merge(summary_2023, summary_2024, on=selected_filter, suffixes=('_2023', '_2024'), how='outer')
+    comparison_df = pd.merge(comparison_df, summary_2025, on=selected_filter, how='outer')
+    comparison_df.rename(columns={
+        'Detractors': 'Detractors_2025', 'Promoters': 'Promoters_2025', 'NPS': 'NPS_2025'
+    }, inplace=True)
+    comparison_df['Δ 2023–2024 (%)'] = (comparison_df['NPS_2024'] - comparison_df['NPS_2023']).round(1)
+    comparison_df['Δ 2024–2025 (%)'] = (comparison_df['NPS_2025'] - comparison_df['NPS_2024']).round(1)
+    ordered_cols = [
+        selected_filter,
+        'Detractors_2023', 'Promoters_2023', 'NPS_2023',
+        'Detractors_2024', 'Promoters_2024', 'NPS_2024',
+        'Δ 2023–2024 (%)',
+        'Detractors_2025', 'Promoters_2025', 'NPS_2025',
+        'Δ 2024–2025 (%)'
+    ]
+    comparison_df = comparison_df[[c for c in ordered_cols if c in comparison_df.columns]]
+    for col in ordered_cols[1:]:
+        if col in comparison_df.columns and not col.startswith('Δ'):
+            comparison_df[col] = comparison_df[col].round(1)
+    return comparison_df
+
+
+def reference_top_box(data):
+    def top_box_percentage(df, columns):
+        result = {}
+        for col in columns:
+            if col in df.columns:
+                total = df[col].notna().sum()
+                top5 = (df[col] == 5).sum()
+                result[col] = round((top5 / total * 100), 2) if total > 0 else np.nan
+            else:
+                result[col] = np.nan
+        return pd.Series(result)
+
+    from analytics.satisfaction import SATISFACTION_ITEMS
+    return pd.DataFrame({year: top_box_percentage(data[year], SATISFACTION_ITEMS) for year in YEARS})
+
+
+def reference_mood_by_year(data):
+    filtered_data = data['combined']
+    mood_summary = filtered_data.groupby(['year', 'EMO'])['nik'].nunique().reset_index(name='count')
+    total_per_year = mood_summary.groupby('year')['count'].transform('sum')
+    mood_summary['percentage'] = (mood_summary['count'] / total_per_year) * 100
+    mood_summary['year'] = mood_summary['year'].astype(str)
+    mood_summary['label'] = mood_summary.apply(lambda row: f"{row['percentage']:.1f}% ({row['count']})", axis=1)
+    return mood_summary
+
+
+def reference_gallup(data):
+    from analytics.gallup import GALLUP_ITEMS
+
+    def categorize_gallup(score):
+        if pd.isna(score):
+            return np.nan
+        if score <= 2.75:
+            return "Actively Disengaged"
+        elif score <= 4.24:
+            return "Not Engaged"
+        else:
+            return "Actively Engaged"
+
+    def compute_percentage(df, group_col):
+        group_counts = df.groupby([group_col, "Engagement Category"]).size().unstack(fill_value=0)
+        group_perc = group_counts.div(group_counts.sum(axis=1), axis=0) * 100
+        group_perc = group_perc.reindex(columns=["Actively Disengaged", "Not Engaged", "Actively Engaged"], fill_value=0)
+        group_counts = group_counts.reindex(columns=["Actively Disengaged", "Not Engaged", "Actively Engaged"], fill_value=0)
+        group_perc.reset_index(inplace=True)
+        group_counts.reset_index(inplace=True)
+        merged = group_perc.melt(id_vars=[group_col], var_name="Engagement Category", value_name="Percent").merge(
+            group_counts.melt(id_vars=[group_col], var_name="Engagement Category", value_name="Count"),
+            on=[group_col, "Engagement Category"]
+        )
+        return merged.rename(columns={group_col: "Group"})
+
+    tables = []
+    for year in YEARS:
+        df_selected = data[year].copy()
+        existing_cols = [c for c in GALLUP_ITEMS if c in df_selected.columns]
+        df_selected['Gallup_Avg'] = df_selected[existing_cols].mean(axis=1, skipna=True)
+        df_selected['Engagement Category'] = df_selected['Gallup_Avg'].apply(categorize_gallup)
+        tables.append(compute_percentage(df_selected, 'unit').assign(year=year))
+    return pd.concat(tables, ignore_index=True)
+
+
+def reference_categorization(data):
+    from categorization import before
+    return categorization_table(before, [data[2025].copy(), data[2024].copy(), data[2023].copy()])
+
+
+def categorization_table(page, frames):
+    """Heatmap cells and the demography breakdown of the first category, for both heatmaps."""
+    tables = []
+    for nps in (False, True):
+        pivot, selected, breakdown = page(frames, nps, COMPARISON_COLUMN)
+        tables.append(pd.DataFrame({
+            'chart': 'heatmap', 'nps': nps,
+            'row': np.repeat(pivot.index.astype(str), pivot.shape[1]),
+            'column': np.tile(pivot.columns.astype(str), pivot.shape[0]),
+            'count': pivot.to_numpy().ravel(),
+        }))
+        tables.append(pd.DataFrame({
+            'chart': f"breakdown: {selected}", 'nps': nps,
+            'row': breakdown.index.astype(str), 'column': COMPARISON_COLUMN, 'count': breakdown.to_numpy(),
+        }))
+    return pd.concat(tables, ignore_index=True)
+
+
+def _ipa_frame(df, year, target):
+    from analytics.ipa import ipa_items
+    items = ipa_items(year)
+    return df.dropna(subset=[target] + items), items
+
+
+def _standardize(values):
+    """Columns centered and scaled to unit variance (ddof=0); constant columns stay unscaled."""
+    values = np.asarray(values, dtype=float)
+    std = values.std(axis=0)
+    std[std == 0] = 1.0
+    return (values - values.mean(axis=0)) / std
+
+
+def _fit_importance(df, items, target, ridge_alpha=None):
+    """Standardized betas of target on items, as page8 fitted them (StandardScaler + LinearRegression/Ridge).
+
+    On centered data the intercept is zero, so OLS is a least-squares solve and
+    ridge is solve(X'X + alpha I, X'y).
+    """
+    X = _standardize(df[items])
+    y = _standardize(df[[target]]).ravel()
+    if ridge_alpha is None:
+        coef = np.linalg.lstsq(X, y, rcond=None)[0]
+    else:
+        coef = np.linalg.solve(X.T @ X + ridge_alpha * np.eye(X.shape[1]), X.T @ y)
+    return pd.DataFrame({
+        'Factor': items,
+        'Importance': [round(beta, 3) for beta in coef],
+        'Performance': [round(m, 3) for m in df[items].mean().values],
+    })
+
+
+def reference_ipa(data, method):
+    tables = []
+    for year in YEARS:
+        for target in IPA_TARGETS:
+            df, items = _ipa_frame(data[year], year, target)
+            if df.empty:
+                continue
+            # The engine's ridge penalty is on the correlation matrix: alpha * n on standardized data
+            ridge_alpha = None if method == 'ols' else 1.0 * len(df)
+            tables.append(_fit_importance(df, items, target, ridge_alpha).assign(year=year, target=target))
+    return pd.concat(tables, ignore_index=True)
+
+
+def reference_ipa_groups(data):
+    tables = []
+    for year in YEARS:
+        for target in IPA_TARGETS:
+            df, items = _ipa_frame(data[year], year, target)
+            df = df[df['subunit'].notna()]
+            for group, rows in df.groupby('subunit', sort=True):
+                if len(rows) < len(items) + 1:
+                    continue
+                table = _fit_importance(rows, items, target)
+                tables.append(table.assign(Group=str(group), year=year, target=target))
+    return pd.concat(tables, ignore_index=True)
+
+
+# ==============================
+# ENGINES (what the pages call now)
+# ==============================
+def engine_nps_by_year(data):
+    from analytics.nps import nps_by_year
+    nps_df, results, _ = nps_by_year(data['combined'])
+    return nps_df.assign(total=[results[y]['total'] for y in nps_df['Year']])
+
+
+def engine_nps_comparison(data):
+    from analytics.nps import nps_comparison
+    return nps_comparison(data['combined'], COMPARISON_COLUMN)[0]
+
+
+def engine_top_box(data):
+    from analytics.satisfaction import SATISFACTION_ITEMS, top_box_percentage
+    return pd.DataFrame({year: top_box_percentage(data[year], SATISFACTION_ITEMS) for year in YEARS})
+
+
+def engine_mood_by_year(data):
+    from analytics.mood import mood_by_year
+    frames = {year: data[year] for year in YEARS}
+    masks = {year: np.ones(len(df), dtype=bool) for year, df in frames.items()}
+    return mood_by_year(frames, masks)[['year', 'EMO', 'count', 'percentage', 'label']]
+
+
+def engine_gallup(data):
+    from analytics.gallup import GALLUP_ITEMS, engagement_distribution, with_engagement
+    tables = []
+    for year in YEARS:
+        df = data[year]
+        df = with_engagement(df, [c for c in GALLUP_ITEMS if c in df.columns])
+        tables.append(engagement_distribution(df, 'unit').assign(year=year))
+    return pd.concat(tables, ignore_index=True)
+
+
+def engine_categorization(data):
+    from categorization import after
+    return categorization_table(after, [data[2025], data[2024], data[2023]])
+
+
+def engine_ipa(data, method):
+    from analytics.ipa import compute_importance, ipa_items
+    tables = []
+    for year in YEARS:
+        for target in IPA_TARGETS:
+            table, n = compute_importance(data[year], year, target, ipa_items(year), method=method, missing='listwise')
+            if n:
+                tables.append(table[['Factor', 'Importance', 'Performance']].assign(year=year, target=target))
+    return pd.concat(tables, ignore_index=True)
+
+
+def engine_ipa_groups(data):
+    from analytics.ipa import compute_group_importance, ipa_items
+    tables = []
+    for year in YEARS:
+        for target in IPA_TARGETS:
+            table, _ = compute_group_importance(data[year], year, target, ipa_items(year), missing='listwise')
+            tables.append(table[['Factor', 'Importance', 'Performance', 'Group']].assign(year=year, target=target))
+    return pd.concat(tables, ignore_index=True)
+
+
+# name -> (reference, engine, sort keys of the output; None keeps the index as a column)
+CASES = {
+    'nps_by_year': (reference_nps_by_year, engine_nps_by_year, ['Year']),
+    'nps_comparison': (reference_nps_comparison, engine_nps_comparison, [COMPARISON_COLUMN]),
+    'top_box': (reference_top_box, engine_top_box, None),
+    'mood_by_year': (reference_mood_by_year, engine_mood_by_year, ['year', 'EMO']),
+    'gallup': (reference_gallup, engine_gallup, ['year', 'Group', 'Engagement Category']),
+    'categorization': (reference_categorization, engine_categorization, ['nps', 'chart', 'row']),
+    'ipa_ols': (lambda d: reference_ipa(d, 'ols'), lambda d: engine_ipa(d, 'ols'), ['year', 'target', 'Factor']),
+    'ipa_ridge': (lambda d: reference_ipa(d, 'ridge'), lambda d: engine_ipa(d, 'ridge'), ['year', 'target', 'Factor']),
+    'ipa_groups': (reference_ipa_groups, engine_ipa_groups, ['year', 'target', 'Group', 'Factor']),
+}
+
+
+# ==============================
+# COMPARISON
+# ==============================
+def canonical(table, keys):
+    """Rows sorted by keys; without keys the index (e.g. item names) becomes a column."""
+    if keys is None:
+        return table.reset_index()
+    return table.sort_values(keys, kind='stable').reset_index(drop=True)
+
+
+def difference(reference, engine):
+    """(largest absolute difference of the numeric cells, problem or None).
+
+    Non-numeric cells must be equal and NaN must sit in the same cells; the
+    problem is then inf with a description.
+    """
+    if list(reference.columns) != list(engine.columns):
+        return np.inf, f"columns {list(reference.columns)} vs {list(engine.columns)}"
+    if len(reference) != len(engine):
+        return np.inf, f"{len(reference)} vs {len(engine)} rows"
+    worst = 0.0
+    for col in reference.columns:
+        a, b = reference[col], engine[col]
+        if pd.api.types.is_numeric_dtype(a) and pd.api.types.is_numeric_dtype(b):
+            a, b = a.to_numpy(dtype=float), b.to_numpy(dtype=float)
+            if not np.array_equal(np.isnan(a), np.isnan(b)):
+                return np.inf, f"missing values differ in {col!r}"
+            if len(a) and not np.isnan(a).all():
+                worst = max(worst, float(np.nanmax(np.abs(a - b))))
+        elif not (a.astype(str).to_numpy() == b.astype(str).to_numpy()).all():
+            row = int(np.flatnonzero(a.astype(str).to_numpy() != b.astype(str).to_numpy())[0])
+            return np.inf, f"{col!r} row {row}: {a.iloc[row]!r} vs {b.iloc[row]!r}"
+    return worst, None
+
+
+def best_of(fn, data, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(data)
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+# ==============================
+# DATA
+# ==============================
+def prepared_frames(raw):
+    """build_data on (es25, es24, es23, creds) as the fetch functions would return them."""
+    import data_processing
+    data_processing.fetch_data_survey25 = lambda: raw[0]
+    data_processing.fetch_data_survey24 = lambda: raw[1]
+    data_processing.fetch_data_survey23 = lambda: raw[2]
+    data_processing.fetch_data_creds = lambda: raw[3]
+    df25, df24, df23, creds = data_processing.build_data()
+    return {2023: df23, 2024: df24, 2025: df25}, creds
+
+
+def scoped(frames, units=None):
+    """Year frames (year as an int column) and their concatenation, restricted to units."""
+    from analytics.scope import FilterSpec
+    spec = FilterSpec(units)
+    data = {year: spec.apply(df).assign(year=year) for year, df in frames.items()}
+    data['combined'] = pd.concat([data[year] for year in YEARS], ignore_index=True)
+    return data
+
+
+def sources(args):
+    from synthetic import survey_frames
+    for rows in args.rows:
+        yield f"synthetic {rows}", survey_frames(rows, args.seed)
+    for directory in args.data:
+        yield directory, tuple(pd.read_pickle(os.path.join(directory, f'{name}.pkl'))
+                               for name in ('es25', 'es24', 'es23', 'creds'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='*', default=[10_000], help='synthetic respondents per year')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data', nargs='*', default=[], help='snapshot directories (es25/es24/es23/creds .pkl)')
+    parser.add_argument('--users', nargs='*', default=['unit1'], help='also check these users\' scopes')
+    parser.add_argument('--cases', nargs='*', default=list(CASES), choices=list(CASES))
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    os.environ.setdefault('ES_ANALYTICS_WORKERS', '0')
+    # Both sides run the pages' pandas idioms (groupby.apply, errors='ignore'); keep the table readable
+    warnings.simplefilter('ignore', FutureWarning)
+    import streamlit  # noqa: F401 (creates its loggers; the cache warns once per function without a runtime)
+    logging.getLogger('streamlit.runtime.caching.cache_data_api').setLevel(logging.ERROR)
+    failures = 0
+    print(f"{'data':<18} {'scope':<8} {'case':<15} {'reference s':>11} {'engine s':>9} {'speed-up':>9} {'max diff':>9}  result")
+    for name, raw in sources(args):
+        frames, creds = prepared_frames(raw)
+        scopes = [('all', None)]
+        for user in args.users:
+            units = creds.loc[creds['username'] == user, 'unit']
+            if units.empty:
+                print(f"{name:<18} {user:<8} (no such user in the creds sheet, skipped)")
+                continue
+            scopes.append((user, units.values[0].split(', ')))
+
+        for scope, units in scopes:
+            data = scoped(frames, units)
+            for case in args.cases:
+                reference, engine, keys = CASES[case]
+                t_ref, expected = best_of(reference, data, args.repeat)
+                t_eng, actual = best_of(engine, data, args.repeat)
+                worst, problem = difference(canonical(expected, keys), canonical(actual, keys))
+                ok = problem is None and worst <= TOLERANCE[case]
+                failures += not ok
+                result = 'ok' if ok else f"DIFFERS: {problem or f'{worst:.3g} > {TOLERANCE[case]:g}'}"
+                print(f"{name:<18} {scope:<8} {case:<15} {t_ref:>11.4f} {t_eng:>9.4f} "
+                      f"{t_ref / t_eng:>8.1f}x {worst:>9.2g}  {result}")
+    if failures:
+        print(f"\n{failures} case(s) differ")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Cold-start profile of the login page and the analysis pages.
+
+Each script runs once in a fresh interpreter under `python -X importtime`
+(AppTest, snapshot data as in rerun_memory.py). For every script it reports
+the cold run time, the total import time, and the heaviest top-level imports.
+
+    python benchmarks/import_profile.py --data snapshots/ streamlit_app.py pages/page1.py pages/page6.py
+
+The login page (streamlit_app.py) runs logged out: that is the first paint a
+visitor waits for. Pages run logged in as --user.
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+
+from rerun_memory import ROOT, patch_sources
+
+IMPORT_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)')
+
+
+def child(script, data_dir, user):
+    os.chdir(ROOT)
+    patch_sources(data_dir)
+    from streamlit.testing.v1 import AppTest
+
+    start = time.perf_counter()
+    at = AppTest.from_file(script, default_timeout=600)
+    if os.path.basename(script) != 'streamlit_app.py':
+        at.session_state['authentication_status'] = True
+        at.session_state['logged_in'] = True
+        at.session_state['username'] = user
+    at.run()
+    print(f"RUN {time.perf_counter() - start:.3f} {len(at.exception)}")
+
+
+def profile(script, data_dir, user, top):
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', os.path.abspath(__file__),
+         '--child', script, '--data', data_dir, '--user', user],
+        capture_output=True, text=True
+    )
+    run = re.search(r'^RUN (\S+) (\d+)', proc.stdout, re.M)
+    if run is None:
+        print(f"{script}: failed\n{proc.stderr[-2000:]}")
+        return
+    total_us = 0
+    roots = []
+    for match in IMPORT_LINE.finditer(proc.stderr):
+        self_us, cumulative_us, indent, name = match.groups()
+        total_us += int(self_us)
+        if not indent:
+            roots.append((int(cumulative_us), name))
+    roots.sort(reverse=True)
+    heaviest = ', '.join(f"{name} {us / 1000:.0f}ms" for us, name in roots[:top])
+    errors = f" ({run.group(2)} exception(s))" if run.group(2) != '0' else ''
+    print(f"{script:<20} run {float(run.group(1)):6.2f}s  imports {total_us / 1e6:5.2f}s{errors}")
+    print(f"{'':<20} {heaviest}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('scripts', nargs='*', default=['streamlit_app.py'] + [f'pages/page{i}.py' for i in range(1, 9)])
+    parser.add_argument('--data', required=True, help='directory with es25/es24/es23/creds .pkl snapshots')
+    parser.add_argument('--user', default='hr', help="username in the creds sheet")
+    parser.add_argument('--top', type=int, default=5, help='heaviest top-level imports to list')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    data_dir = os.path.abspath(args.data)
+    if args.child:
+        child(args.child, data_dir, args.user)
+        return
+    for script in args.scripts:
+        profile(script, data_dir, args.user, args.top)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Process RSS as a function of concurrent sessions.
+
+Keeps N AppTest sessions of a page alive in one process (so the
+cache_resource data plane is shared the way it is under `streamlit run`),
+reruns each of them and reports the RSS. AppTest creates and tears down its
+runtime around every run, so sessions are rerun one after another rather than
+in threads: the number measures what each extra session keeps resident.
+
+    python benchmarks/load_test.py pages/page1.py --data snapshots/ --sessions 1 2 4 8 --rounds 2
+
+See rerun_memory.py for the --data snapshot layout.
+"""
+import argparse
+import os
+import sys
+import time
+
+from rerun_memory import ROOT, patch_sources
+
+
+def rss_mb():
+    """Current resident set size of this process (Linux /proc)."""
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return float('nan')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('page', help='page script, e.g. pages/page1.py')
+    parser.add_argument('--data', required=True, help='directory with es25/es24/es23/creds .pkl snapshots')
+    parser.add_argument('--user', default='hr', help="username in the creds sheet")
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--rounds', type=int, default=2, help='reruns per session at each level')
+    args = parser.parse_args()
+
+    page = os.path.abspath(args.page)
+    os.chdir(ROOT)
+    patch_sources(os.path.abspath(args.data))
+    from streamlit.testing.v1 import AppTest
+
+    def new_session():
+        at = AppTest.from_file(page, default_timeout=600)
+        at.session_state['authentication_status'] = True
+        at.session_state['logged_in'] = True
+        at.session_state['username'] = args.user
+        return at
+
+    sessions = []
+    print(f"{'sessions':>8} {'seconds':>8} {'RSS MB':>8} {'MB/session':>10}")
+    baseline = rss_mb()
+    for n in sorted(args.sessions):
+        sessions += [new_session() for _ in range(n - len(sessions))]
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            runs = [at.run() for at in sessions]
+        elapsed = time.perf_counter() - start
+        errors = [at.exception[0].value for at in runs if at.exception]
+        rss = rss_mb()
+        print(f"{n:>8} {elapsed:>8.1f} {rss:>8.1f} {(rss - baseline) / n:>10.1f}")
+        if errors:
+            print('exception:', errors[0])
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Peak memory per rerun of a dashboard page.
+
+Runs a page headless with streamlit's AppTest, reading the survey sheets from
+pickled snapshots instead of Google Sheets, and reports the tracemalloc peak
+of each rerun, the memory still allocated after it, and the process max RSS.
+
+    python benchmarks/rerun_memory.py pages/page2.py --data snapshots/ --user hr --reruns 5
+
+With --max-growth MB it doubles as a memory regression check: the exit code
+is 1 if memory still allocated grows by more than MB between the second
+rerun (caches warm) and the last one, e.g. figures that are never closed.
+
+The --data directory holds es25.pkl, es24.pkl, es23.pkl and creds.pkl
+(DataFrames as returned by the fetch_data functions).
+"""
+import argparse
+import gc
+import os
+import resource
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def patch_sources(data_dir):
+    import fetch_data
+    import navigation
+
+    def loader(name):
+        return lambda: pd.read_pickle(os.path.join(data_dir, f'{name}.pkl'))
+
+    # data_processing imports the fetch functions by name: if it is already
+    # imported (e.g. by an earlier test), patch its copies too
+    modules = [fetch_data] + ([sys.modules['data_processing']] if 'data_processing' in sys.modules else [])
+    for module in modules:
+        module.fetch_data_survey25 = loader('es25')
+        module.fetch_data_survey24 = loader('es24')
+        module.fetch_data_survey23 = loader('es23')
+        module.fetch_data_creds = loader('creds')
+    # page_link needs the multipage app context, which AppTest does not provide;
+    # the per-rerun hooks (ES_PROFILE timings, ES_PROFILE_DIR dumps) still run
+    navigation.make_sidebar = lambda: navigation.start_rerun(navigation.current_page())
+
+
+def measure(page, user, reruns):
+    """Rerun page as user; yields (seconds, peak MB, retained MB, max RSS MB) per rerun.
+
+    patch_sources must have been called. Raises RuntimeError if the page raises.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(page, default_timeout=300)
+    at.session_state['authentication_status'] = True
+    at.session_state['logged_in'] = True
+    at.session_state['username'] = user
+
+    tracemalloc.start()
+    try:
+        for _ in range(reruns):
+            tracemalloc.reset_peak()
+            start = time.perf_counter()
+            at.run()
+            elapsed = time.perf_counter() - start
+            if at.exception:
+                raise RuntimeError(at.exception[0].value)
+            gc.collect()
+            current, peak = tracemalloc.get_traced_memory()
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+            yield elapsed, peak / 2**20, current / 2**20, max_rss
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('page', help='page script, e.g. pages/page2.py')
+    parser.add_argument('--data', required=True, help='directory with es25/es24/es23/creds .pkl snapshots')
+    parser.add_argument('--user', default='hr', help="username in the creds sheet")
+    parser.add_argument('--reruns', type=int, default=5)
+    parser.add_argument('--max-growth', type=float, help='fail if retained MB grow more than this after rerun 1')
+    args = parser.parse_args()
+
+    page = os.path.abspath(args.page)
+    os.chdir(ROOT)
+    patch_sources(os.path.abspath(args.data))
+
+    retained = []
+    print(f"{'rerun':>5} {'seconds':>8} {'peak MB':>8} {'retained MB':>11} {'max RSS MB':>10}")
+    try:
+        for i, (elapsed, peak, current, max_rss) in enumerate(measure(page, args.user, args.reruns)):
+            retained.append(current)
+            print(f"{i:>5} {elapsed:>8.2f} {peak:>8.1f} {current:>11.1f} {max_rss:>10.1f}")
+    except RuntimeError as e:
+        print('exception:', e)
+        sys.exit(1)
+
+    if args.max_growth is not None and len(retained) > 2:
+        growth = retained[-1] - retained[1]
+        print(f"retained growth after warm-up: {growth:.1f} MB (limit {args.max_growth:.1f} MB)")
+        if growth > args.max_growth:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+"""Benchmark suite: finalize_data and every page at several respondent counts.
+
+For each size, a fresh interpreter generates synthetic sheets (synthetic.py,
+the same seed every time) and serves them in place of the fetch_data
+functions. It then times:
+  finalize_data      build_data + freeze, the first call of the process;
+  pages/pageN.py     first run of the page with the data plane warm
+                     (page caches cold), then one warm rerun.
+Analytics jobs run inline (ES_ANALYTICS_WORKERS=0), so their cost lands in
+the page that asks for them.
+
+Each invocation appends one entry to the JSON history (commit, versions,
+timings per size) and prints the change against the previous entry
+for the same size.
+
+    python benchmarks/suite.py --sizes 10000 100000 1000000
+    python benchmarks/suite.py --sizes 10000 --pages pages/page5.py --label "page5 codes"
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from rerun_memory import ROOT
+
+HISTORY = os.path.join(ROOT, 'benchmarks', 'history.json')
+PAGES = [f'pages/page{i}.py' for i in range(1, 9)]
+
+
+def child(rows, pages, user, seed, out):
+    os.environ['ES_ANALYTICS_WORKERS'] = '0'
+    os.chdir(ROOT)
+    import fetch_data
+    import navigation
+    from synthetic import survey_frames
+
+    results = {'rows': rows}
+
+    def save():
+        # After every stage, so a run killed later (e.g. out of memory) keeps what it measured
+        results['max_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        with open(out, 'w') as f:
+            json.dump(results, f)
+
+    start = time.perf_counter()
+    frames = dict(zip(('es25', 'es24', 'es23', 'creds'), survey_frames(rows, seed)))
+    results['generate'] = time.perf_counter() - start
+    save()
+
+    fetch_data.fetch_data_survey25 = lambda: frames['es25']
+    fetch_data.fetch_data_survey24 = lambda: frames['es24']
+    fetch_data.fetch_data_survey23 = lambda: frames['es23']
+    fetch_data.fetch_data_creds = lambda: frames['creds']
+    navigation.make_sidebar = lambda: navigation.start_rerun(navigation.current_page())
+
+    from data_processing import finalize_data
+    from streamlit.testing.v1 import AppTest
+    start = time.perf_counter()
+    finalize_data()
+    results['finalize_data'] = time.perf_counter() - start
+    save()
+
+    results['pages'] = {}
+    for page in pages:
+        at = AppTest.from_file(os.path.join(ROOT, page), default_timeout=3600)
+        at.session_state['authentication_status'] = True
+        at.session_state['logged_in'] = True
+        at.session_state['username'] = user
+        timings = {}
+        for run in ('first', 'rerun'):
+            start = time.perf_counter()
+            at.run()
+            timings[run] = time.perf_counter() - start
+        if at.exception:
+            timings['error'] = str(at.exception[0].value)[:200]
+        results['pages'][page] = timings
+        save()
+
+
+def run_size(rows, args):
+    with tempfile.NamedTemporaryFile(suffix='.json') as out:
+        cmd = [sys.executable, '-W', 'ignore', os.path.abspath(__file__), '--child', str(rows),
+               '--user', args.user, '--seed', str(args.seed), '--out', out.name, '--pages', *args.pages]
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        with open(out.name) as f:
+            text = f.read()
+        result = json.loads(text) if text else {'rows': rows}
+        if proc.returncode == -9:
+            result['error'] = 'killed (SIGKILL, most likely out of memory)'
+        elif proc.returncode != 0:
+            result['error'] = f'exit {proc.returncode}: {proc.stderr.strip()[-500:]}'
+        return result
+
+
+def git_commit():
+    def git(*cmd):
+        return subprocess.run(['git', *cmd], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    commit = git('rev-parse', '--short', 'HEAD')
+    dirty = git('status', '--porcelain', '--untracked-files=no')
+    return f'{commit}-dirty' if dirty else commit
+
+
+def flat_timings(result):
+    """{'generate': s, 'finalize_data': s, 'pages/page1.py first': s, ...} of one size."""
+    timings = {'generate': result.get('generate'), 'finalize_data': result.get('finalize_data')}
+    for page, page_timings in result.get('pages', {}).items():
+        for run in ('first', 'rerun'):
+            timings[f'{page} {run}'] = page_timings.get(run)
+    return timings
+
+
+def previous_result(history, rows):
+    for entry in reversed(history):
+        for result in entry['results']:
+            if result['rows'] == rows and 'finalize_data' in result:
+                return entry, result
+    return None, None
+
+
+def report(result, history):
+    rows = result['rows']
+    entry, previous = previous_result(history, rows)
+    against = f" vs {entry['commit']} ({entry['timestamp'][:10]})" if entry else ''
+    print(f"\n{rows} rows, max RSS {result.get('max_rss_mb', 0):.0f} MB{against}")
+    if 'error' in result:
+        print(f"  failed: {result['error']}")
+    old = flat_timings(previous) if previous else {}
+    for name, seconds in flat_timings(result).items():
+        if seconds is None:
+            continue
+        line = f"  {name:<28} {seconds:9.3f}s"
+        if old.get(name):
+            line += f"  {old[name]:9.3f}s  {(seconds / old[name] - 1) * 100:+6.1f}%"
+        print(line)
+    for page, timings in result.get('pages', {}).items():
+        if 'error' in timings:
+            print(f"  {page}: exception: {timings['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+                        help='employees per survey year')
+    parser.add_argument('--pages', nargs='*', default=PAGES)
+    parser.add_argument('--user', default='hr', help='username in the synthetic creds sheet')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--history', default=HISTORY, help='JSON history file to append to')
+    parser.add_argument('--label', default='', help='note stored with the entry')
+    parser.add_argument('--no-record', action='store_true', help='print only, do not append to the history')
+    parser.add_argument('--child', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--out', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.pages, args.user, args.seed, args.out)
+        return
+
+    history = []
+    if os.path.exists(args.history):
+        with open(args.history) as f:
+            history = json.load(f)
+
+    results = []
+    for rows in args.sizes:
+        result = run_size(rows, args)
+        report(result, history)
+        results.append(result)
+
+    if not args.no_record:
+        import numpy as np
+        import pandas as pd
+        import streamlit
+        history.append({
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'label': args.label,
+            'machine': f"{platform.machine()}, {os.cpu_count()} CPU",
+            'python': platform.python_version(),
+            'versions': {'pandas': pd.__version__, 'numpy': np.__version__, 'streamlit': streamlit.__version__},
+            'results': results,
+        })
+        with open(args.history, 'w') as f:
+            json.dump(history, f, indent=1)
+        print(f"\nrecorded in {os.path.relpath(args.history)}")
+
+
+if __name__ == '__main__':
+    main()
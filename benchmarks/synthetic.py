@@ -0,0 +1,174 @@
+"""Synthetic ES23/ES24/ES25 sheets for benchmarks.
+
+survey_frame() returns a frame shaped like `pd.DataFrame(sheet.get_all_records())`
+for the combined survey sheets: same columns, object columns holding ints for
+answered cells and '' for blanks, submit_date as text. Respondents sit in a
+fixed org tree (unit > subunit > directorate > division > department >
+section, with skewed section sizes). Likert items, SAT, NPS and EMO share a
+per-respondent engagement factor, so correlations and IPA quadrants are not
+noise. TU3 exists only in 2025, as in the real sheets.
+
+    python benchmarks/synthetic.py --rows 100000 --out snapshots/
+
+writes es25/es24/es23/creds .pkl snapshots for the other benchmark scripts.
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+ITEMS = [
+    'KD0', 'KD1', 'KD2', 'KD3', 'KE0', 'KE1', 'KE2', 'KE3',
+    'KI0', 'KI1', 'KI2', 'KI3', 'KI4', 'KI5',
+    'KR0', 'KR1', 'KR2', 'KR3', 'KR4', 'KR5',
+    'PR0', 'PR1', 'PR2',
+    'TU0', 'TU1', 'TU2', 'TU3'
+]
+PROFILE_COLUMNS = [
+    'nik', 'name', 'email', 'unit', 'subunit', 'directorate', 'division', 'site',
+    'department', 'section', 'layer', 'status', 'work_contract', 'generation',
+    'gender', 'marital', 'education', 'children', 'region', 'participation_23',
+    'tenure', 'submit_date'
+]
+
+# Org tree: number of nodes per level, each node has a parent one level up
+ORG_LEVELS = [('unit', 6), ('subunit', 30), ('directorate', 72), ('division', 240), ('department', 600), ('section', 1500)]
+
+# (values, weights) of the demographic columns
+DEMOGRAPHICS = {
+    'layer': (['Group 1', 'Group 1 Str Layer 5', 'Group 2', 'Group 2 Str Layer 4', 'Group 3',
+               'Group 3 Str Layer 3A', 'Group 3 Str Layer 3B', 'Group 4', 'Group 4 Str Layer 2',
+               'Group 5', 'Group 5 Str Layer 1'],
+              [40, 8, 25, 6, 8, 5, 3, 2, 1.5, 1, 0.5]),
+    'status': (['Permanent', 'Contract', 'Trainee'], [70, 25, 5]),
+    'work_contract': (['PKWTT', 'PKWT', 'Outsourcing'], [65, 30, 5]),
+    'generation': (['Baby Boomer', 'Gen X', 'Millennial', 'Gen Z'], [3, 22, 55, 20]),
+    'gender': (['Male', 'Female'], [62, 38]),
+    'marital': (['Single', 'Married', 'Divorced', 'Widowed'], [30, 65, 4, 1]),
+    'education': (['SMA/SMK', 'D3', 'D4', 'S1', 'S2', 'S3'], [20, 15, 5, 45, 14, 1]),
+    'children': (['0', '1', '2', '3', '>3'], [35, 25, 25, 12, 3]),
+    'region': (['Jabodetabek', 'Jawa', 'Sumatera', 'Kalimantan', 'Sulawesi', 'Bali & Nusa Tenggara', 'Papua & Maluku'],
+               [40, 25, 13, 9, 7, 4, 2]),
+}
+SITES = 24
+RESPONSE_RATE = {2023: 0.78, 2024: 0.82, 2025: 0.86}
+
+
+def org_tree(seed=0):
+    """Parent index of every node, per level (the same tree for all years)."""
+    rng = np.random.default_rng(seed)
+    parents = {}
+    previous = None
+    for level, size in ORG_LEVELS:
+        if previous is None:
+            parents[level] = np.full(size, -1)
+        else:
+            # every parent gets at least one child
+            parents[level] = rng.permutation(np.concatenate([np.arange(previous), rng.integers(0, previous, size - previous)]))
+        previous = size
+    return parents
+
+
+def _labels(prefix, size):
+    # One str object per distinct value, shared by every row that has it
+    return np.array([f'{prefix}{i}' for i in range(size)], dtype=object)
+
+
+def _org_columns(section, parents):
+    names = {}
+    node = section
+    for level, size in reversed(ORG_LEVELS):
+        names[level] = _labels(f'{level[:3].upper()}-', size)[node]
+        node = parents[level][node]
+    return names
+
+
+def _likert(latent, rng, n, low, high, center, spread):
+    """Integer answers in [low, high] from a latent score plus noise."""
+    value = center + spread * latent + rng.normal(0, 0.8, n)
+    return np.clip(np.rint(value), low, high).astype(int)
+
+
+def _sheet_column(values, answered):
+    """ints where answered, '' elsewhere (object dtype, as get_all_records returns)."""
+    column = values.astype(object)
+    column[~answered] = ''
+    return column
+
+
+def survey_frame(year, n, seed=0):
+    """One year of the combined survey sheet with n employees."""
+    rng = np.random.default_rng([seed, year])
+    parents = org_tree(seed)
+    n_sections = ORG_LEVELS[-1][1]
+    section_weights = rng.lognormal(0, 1.0, n_sections)
+    section = rng.choice(n_sections, n, p=section_weights / section_weights.sum())
+
+    nik = np.arange(100000, 100000 + n)
+    data = {
+        'nik': nik,
+        'name': [f'Employee {i}' for i in nik],
+        'email': [f'employee{i}@example.com' for i in nik],
+    }
+    data.update(_org_columns(section, parents))
+    data['site'] = _labels('Site ', SITES)[section % SITES]
+    for col, (values, weights) in DEMOGRAPHICS.items():
+        p = np.asarray(weights, dtype=float)
+        data[col] = np.asarray(values, dtype=object)[rng.choice(len(values), n, p=p / p.sum())]
+    data['participation_23'] = np.where(rng.random(n) < RESPONSE_RATE[2023], 'Yes', 'No').astype(object)
+    data['tenure'] = np.minimum(rng.exponential(7, n), 38).astype(int)
+
+    # Response curve: most answers in the first days of a three-week window
+    answered = rng.random(n) < RESPONSE_RATE.get(year, 0.8)
+    offset = np.minimum(rng.exponential(4 * 86400, n), 21 * 86400 - 1).astype('timedelta64[s]')
+    submitted_at = np.datetime64(f'{year}-09-01T08:00:00') + offset
+    data['submit_date'] = np.where(answered, np.char.replace(submitted_at.astype(str), 'T', ' '), '').astype(object)
+
+    # Engagement factor per respondent, a per-dimension shift, then item noise
+    engagement = rng.normal(0, 1, n)
+    dimension_shift = {dim: rng.normal(0, 0.3) for dim in ('KD', 'KE', 'KI', 'KR', 'PR', 'TU')}
+    items = ITEMS if year >= 2025 else [c for c in ITEMS if c != 'TU3']
+    for item in items:
+        loading = rng.uniform(0.3, 0.9)
+        values = _likert(loading * engagement + dimension_shift[item[:2]], rng, n, 1, 5, 3.7, 0.8)
+        data[item] = _sheet_column(values, answered)
+    data['SAT'] = _sheet_column(_likert(engagement, rng, n, 1, 5, 3.8, 0.9), answered)
+    data['NPS'] = _sheet_column(_likert(engagement, rng, n, 0, 10, 7.2, 1.8), answered)
+    data['EMO'] = _sheet_column(_likert(engagement, rng, n, 1, 8, 5.0, 1.5), answered)
+
+    return pd.DataFrame(data, columns=PROFILE_COLUMNS + items + ['SAT', 'NPS', 'EMO'])
+
+
+def creds_frame(seed=0):
+    """'Dashboard Credentials' sheet: user 'hr' sees every subunit, 'unit<k>' one unit."""
+    parents = org_tree(seed)
+    subunits = [f'SUB-{i}' for i in range(ORG_LEVELS[1][1])]
+    rows = [{'username': 'hr', 'name': 'HR', 'password': 'x', 'unit': ', '.join(subunits), 'email': 'hr@example.com'}]
+    for unit in range(ORG_LEVELS[0][1]):
+        own = [s for s, parent in zip(subunits, parents['subunit']) if parent == unit]
+        rows.append({'username': f'unit{unit}', 'name': f'UNI-{unit}', 'password': 'x',
+                     'unit': ', '.join(own), 'email': f'unit{unit}@example.com'})
+    return pd.DataFrame(rows)
+
+
+def survey_frames(n, seed=0):
+    """(es25, es24, es23, creds) as the fetch_data functions return them."""
+    return survey_frame(2025, n, seed), survey_frame(2024, n, seed), survey_frame(2023, n, seed), creds_frame(seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10_000, help='employees per survey year')
+    parser.add_argument('--out', required=True, help='directory for es25/es24/es23/creds .pkl')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    for name, df in zip(('es25', 'es24', 'es23', 'creds'), survey_frames(args.rows, args.seed)):
+        df.to_pickle(os.path.join(args.out, f'{name}.pkl'))
+        print(f"{name}: {df.shape[0]} rows x {df.shape[1]} columns")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Page reruns per second as a function of worker processes.
+
+Publishes the snapshot frames once to a shared directory (shared_data), then
+starts W processes that each attach to it through ES_SHARED_DATA and rerun a
+page with AppTest for --seconds. Reports total reruns/s and the largest
+worker PSS (shared pages split between workers), for every worker count.
+
+    python benchmarks/throughput.py pages/page6.py --data snapshots/ --workers 1 2 4 --seconds 30
+
+See rerun_memory.py for the --data snapshot layout.
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from rerun_memory import ROOT, patch_sources
+
+
+def pss_mb():
+    """Proportional set size: pages shared with other workers count fractionally."""
+    with open('/proc/self/smaps_rollup') as rollup:
+        for line in rollup:
+            if line.startswith('Pss:'):
+                return int(line.split()[1]) / 1024
+    return float('nan')
+
+
+def worker(page, data_dir, shared_dir, user, seconds, results):
+    os.environ['ES_SHARED_DATA'] = shared_dir
+    os.chdir(ROOT)
+    patch_sources(data_dir)
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(page, default_timeout=600)
+    at.session_state['authentication_status'] = True
+    at.session_state['logged_in'] = True
+    at.session_state['username'] = user
+    at.run()  # warm-up: attach + first render
+
+    runs = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        at.run()
+        runs += 1
+    results.put((runs, pss_mb()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('page', help='page script, e.g. pages/page6.py')
+    parser.add_argument('--data', required=True, help='directory with es25/es24/es23/creds .pkl snapshots')
+    parser.add_argument('--user', default='hr', help="username in the creds sheet")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--seconds', type=float, default=30)
+    args = parser.parse_args()
+
+    page = os.path.abspath(args.page)
+    data_dir = os.path.abspath(args.data)
+    os.chdir(ROOT)
+    patch_sources(data_dir)
+    from data_processing import build_data
+    from result_cache import code_version
+    from shared_data import publish
+
+    shared_dir = tempfile.mkdtemp(prefix='es-result-', dir='/dev/shm' if os.path.isdir('/dev/shm') else None)
+    try:
+        publish(build_data(), shared_dir, code_version())
+        ctx = multiprocessing.get_context('spawn')
+        print(f"{'workers':>7} {'reruns/s':>9} {'PSS MB/worker':>13}")
+        for n in args.workers:
+            results = ctx.Queue()
+            procs = [
+                ctx.Process(target=worker, args=(page, data_dir, shared_dir, args.user, args.seconds, results))
+                for _ in range(n)
+            ]
+            for proc in procs:
+                proc.start()
+            stats = [results.get() for _ in procs]
+            for proc in procs:
+                proc.join()
+            runs = sum(r for r, _ in stats)
+            print(f"{n:>7} {runs / args.seconds:>9.2f} {max(m for _, m in stats):>13.1f}")
+    finally:
+        shutil.rmtree(shared_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+import hashlib
+import threading
+import types
+from collections import OrderedDict
+import streamlit as st
+from analytics.executor import request_key
+from profiling import tally
+
+# ==============================
+# FIGURE CACHE
+# ==============================
+# Plotly figures are rebuilt on every rerun even when the aggregate table
+# behind them has not changed. cached_figure keeps built figures in a
+# process-wide LRU keyed by the builder's code and the hash of its arguments
+# (aggregate tables by content, styling parameters by value), so an unchanged
+# chart is handed to st.plotly_chart without running px/go again.
+#
+# Builders must take everything they use as arguments (no captured page
+# variables), and the returned figure is shared: do not modify it afterwards.
+
+FIGURE_CACHE_SIZE = 256
+
+
+class FigureCache:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.figures = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            figure = self.figures.get(key)
+            if figure is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.figures.move_to_end(key)
+            return figure
+
+    def put(self, key, figure):
+        with self.lock:
+            self.figures[key] = figure
+            self.figures.move_to_end(key)
+            while len(self.figures) > self.max_entries:
+                self.figures.popitem(last=False)
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'entries': len(self.figures),
+            }
+
+
+@st.cache_resource(show_spinner=False)
+def figure_cache():
+    return FigureCache(FIGURE_CACHE_SIZE)
+
+
+def _figure_key(build, args):
+    code = build.__code__
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f'{code.co_filename}:{build.__qualname__}'.encode())
+    h.update(code.co_code)
+    # Constants (titles, colours) but not nested code objects, whose repr changes every rerun
+    h.update(repr(tuple(c for c in code.co_consts if not isinstance(c, types.CodeType))).encode())
+    h.update(request_key(build, args).encode())
+    return h.hexdigest()
+
+
+def cached_figure(build, *args):
+    """build(*args) as a Plotly figure, reused while the arguments are unchanged."""
+    cache = figure_cache()
+    key = _figure_key(build, args)
+    figure = cache.get(key)
+    if figure is None:
+        tally(cache_misses=1)
+        figure = build(*args)
+        cache.put(key, figure)
+    else:
+        tally(cache_hits=1)
+    return figure
+
+
+def figure_cache_stats():
+    """Hit/miss counters and size of the process-wide figure cache."""
+    return figure_cache().stats()
@@ -1,14 +1,120 @@
+import os
+import threading
 import streamlit as st
 import pandas as pd
 import numpy as np
-from fetch_data import fetch_data_survey25, fetch_data_survey24, fetch_data_survey23, fetch_data_creds
+from time import perf_counter
+from shared_data import attach_or_publish
+from analytics.participation import PARTICIPATION_COLUMNS, DailyResponses, participation_counts
+from analytics.scope import FilterSpec
+from profiling import CacheStats, tag, count_scope
+from result_cache import code_version, frames_fingerprint, persistent_results_enabled
+from telemetry import measured
+from fetch_data import fetch_data_survey25, fetch_data_survey24, fetch_data_survey23, fetch_data_creds, sheet_store
 
-#@st.cache_data()
 def finalize_data():
-    df_survey25 = fetch_data_survey25()
-    df_survey24 = fetch_data_survey24()
-    df_survey23 = fetch_data_survey23()
-    df_creds = fetch_data_creds()
+    """Shared read-only data plane: built once per data version, referenced by every session.
+
+    The frames are frozen (see freeze_frame); pages must not write into them,
+    they select rows with masks and build their own small frames. With
+    ES_SHARED_DATA set, the frames are memory-mapped from shared_data instead.
+    Each frame carries its data version in df.attrs['data_version'] and, when
+    results are kept on disk (ES_RESULT_CACHE_DIR), the content hash of all
+    four in df.attrs['data_fingerprint'].
+    """
+    prepared_stats()['frames'].request()
+    return _prepared_frames(data_version())
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _prepared_frames(version, _refresh=False):
+    start = perf_counter()
+    shared_dir = os.environ.get('ES_SHARED_DATA')
+    if shared_dir:
+        # Multi-process serving (serve_workers.py): attach to the published arrays
+        frames = attach_or_publish(shared_dir, build_data, code_version())
+    else:
+        frames = tuple(freeze_frame(df) for df in build_data())
+    fingerprint = frames_fingerprint(frames) if persistent_results_enabled() else None
+    for df in frames:
+        df.attrs['data_version'] = version
+        if fingerprint is not None:
+            df.attrs['data_fingerprint'] = fingerprint
+    stats = prepared_stats()['frames']
+    if _refresh:
+        stats.rebuilt(perf_counter() - start)
+    else:
+        stats.miss(perf_counter() - start)
+    return frames
+
+@st.cache_resource(show_spinner=False)
+def prepared_stats():
+    """CacheStats of the prepared frames and the participation table."""
+    return {'frames': CacheStats(), 'participation': CacheStats()}
+
+def data_version():
+    """Bumped each time refresh_data publishes reloaded sheets (0 until then)."""
+    return sheet_store().version
+
+_refresh_lock = threading.Lock()
+
+def refresh_data(titles):
+    """Reload sheets and rebuild the prepared frames on a background thread.
+
+    Sessions keep using the current frames until the new ones are built;
+    returns False when a refresh is already running.
+    """
+    if os.environ.get('ES_SHARED_DATA'):
+        raise RuntimeError(
+            "ES_SHARED_DATA frames are published by serve_workers.py; restart it (without --reuse) to reload the sheets"
+        )
+    if not _refresh_lock.acquire(blocking=False):
+        return False
+    sheet_store().refreshing = tuple(titles)
+    threading.Thread(target=_refresh, args=(tuple(titles),), name='data-refresh', daemon=True).start()
+    return True
+
+def refreshing():
+    return _refresh_lock.locked()
+
+def _refresh(titles):
+    store = sheet_store()
+    try:
+        store.error = None
+        sheets = store.reload(titles)
+        version = store.version + 1
+        with store.staged(sheets):
+            _prepared_frames(version, _refresh=True)
+        previous = store.publish(sheets)
+        # Sessions holding the old frames keep them until their rerun ends
+        _prepared_frames.clear(previous)
+    except Exception as e:
+        store.error = f"{', '.join(titles)}: {e!r}"
+    finally:
+        store.refreshing = ()
+        _refresh_lock.release()
+
+def freeze_frame(df):
+    """Copy of df with one read-only NumPy array per column.
+
+    In-place writes (df.loc[...] = ..., df[col].fillna(inplace=True)) raise
+    "assignment destination is read-only" instead of leaking into other sessions.
+    Extension columns (categoricals) are kept as they are.
+    """
+    columns = {}
+    for col in df.columns:
+        values = df[col].array
+        if isinstance(df[col].dtype, np.dtype):
+            values = df[col].to_numpy(copy=True)
+            values.flags.writeable = False
+        columns[col] = values
+    return pd.DataFrame(columns, index=df.index, copy=False)
+
+@measured('refresh', 'build_data')
+def build_data():
+    df_survey25 = fetch_data_survey25().copy()
+    df_survey24 = fetch_data_survey24().copy()
+    df_survey23 = fetch_data_survey23().copy()
+    df_creds = fetch_data_creds().copy()
 
     df_survey25['tenure'] = pd.to_numeric(df_survey25['tenure'], errors='coerce')
     df_survey24['tenure'] = pd.to_numeric(df_survey24['tenure'], errors='coerce')
@@ -48,6 +154,11 @@ def finalize_data():
     df_survey24['year'] = '2024'
     df_survey25['year'] = '2025'
 
+    # Parse submit_date once: 'submitted' flag and 'submit_dt' timestamp
+    for df in [df_survey23, df_survey24, df_survey25]:
+        df['submitted'] = df['submit_date'].notna() & (df['submit_date'] != "")
+        df['submit_dt'] = pd.to_datetime(df['submit_date'].where(df['submitted']), errors='coerce')
+
     # Calculate the average for each dimension and round to 1 decimal place
     # For df_survey25
     df_survey25['average_kd'] = df_survey25[['KD1', 'KD2', 'KD3', 'KD0']].mean(axis=1).round(2)
@@ -99,3 +210,92 @@ def finalize_data():
 
     return df_survey25, df_survey24, df_survey23, df_creds
 
+
+
+# ==============================
+# DATA ACCESS
+# ==============================
+# Pages read the year frames through boolean row masks instead of building
+# filtered copies; only the columns a chart needs are materialized.
+def user_units_for(df_creds, username):
+    """Subunits the user may see, from the 'Dashboard Credentials' sheet."""
+    units = df_creds.loc[df_creds['username'] == username, 'unit'].values[0].split(', ')
+    tag(scope_units=len(units))
+    return units
+
+def scope_mask(df, user_units, selected_filters=None):
+    """Boolean row mask: the user's subunits, narrowed by the selected filters."""
+    mask = FilterSpec(user_units, selected_filters).mask(df)
+    if not selected_filters:
+        count_scope(df, int(mask.sum()))
+    return mask
+
+def scoped_frame(df, user_units, columns=None, submitted_only=False, **new_columns):
+    """The user's rows of a shared frame as a frame owned by the session.
+
+    Only `columns` (those df has, in that order; all if None) are copied, so a
+    session holds the cells its page reads rather than the full width. With
+    submitted_only, only respondents who submitted are kept. Built with a
+    positional take, so adding columns afterwards writes to a plain copy
+    (no SettingWithCopy chain back to the shared frame).
+    """
+    mask = scope_mask(df, user_units)
+    if submitted_only:
+        mask &= df['submitted'].to_numpy(dtype=bool)
+    rows = np.flatnonzero(mask)
+    if columns is None:
+        scoped = df.take(rows)
+    else:
+        columns = [c for c in dict.fromkeys(columns) if c in df.columns]
+        scoped = df.iloc[rows, df.columns.get_indexer(columns)]
+    for col, value in new_columns.items():
+        scoped[col] = value
+    return scoped
+
+def masked_columns(frames, masks, columns):
+    """Stack only `columns` of the masked rows of each frame (e.g. for filter options)."""
+    return pd.concat(
+        [df.loc[masks[key], [c for c in columns if c in df.columns]] for key, df in frames.items()],
+        ignore_index=True
+    )
+
+def participation_table():
+    """Participation counts per (year, column, value, subunit), computed once per data version."""
+    prepared_stats()['participation'].request()
+    return _participation_table(data_version())
+
+@st.cache_data(show_spinner=False, max_entries=2)
+def _participation_table(version):
+    start = perf_counter()
+    df_survey25, df_survey24, df_survey23, _ = _prepared_frames(version)
+    table = pd.concat([
+        participation_counts(df_survey23, '2023', PARTICIPATION_COLUMNS),
+        participation_counts(df_survey24, '2024', PARTICIPATION_COLUMNS),
+        participation_counts(df_survey25, '2025', PARTICIPATION_COLUMNS),
+    ], ignore_index=True)
+    prepared_stats()['participation'].miss(perf_counter() - start)
+    return table
+
+@st.cache_resource(show_spinner=False)
+def _daily_store():
+    return {}
+
+def daily_responses(df, year, group_col='subunit'):
+    """Shared, incrementally updated DailyResponses for (year, group_col)."""
+    store = _daily_store()
+    daily = store.get((str(year), group_col))
+    if daily is None:
+        daily = store.setdefault((str(year), group_col), DailyResponses(group_col))
+    return daily.update(df)
+
+def daily_store_stats():
+    """Entries, rows counted and bytes of the shared DailyResponses store."""
+    store = _daily_store()
+    entries = list(store.values())
+    return {
+        'entries': len(entries),
+        'rows': sum(d.n_rows for d in entries),
+        'bytes': sum(
+            d.counts.nbytes + (int(d.rows.memory_usage(deep=True).sum()) if d.rows is not None else 0) for d in entries
+        ),
+    }
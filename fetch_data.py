@@ -1,55 +1,136 @@
+import threading
+import time
+from contextlib import contextmanager
+from time import perf_counter
 import streamlit as st
 import pandas as pd
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-import toml
+from lazy_import import lazy_import
+from profiling import CacheStats
+from telemetry import record
 
-# Fetch data
+# Only needed on a cache miss (not at all when attached to shared data)
+gspread = lazy_import('gspread')
+service_account = lazy_import('oauth2client.service_account')
 
-@st.cache_resource()
-def fetch_data_survey25():
+SHEETS = ('ES25 - Combined Data', 'ES24 - Combined Data', 'ES23 - Combined Data', 'Dashboard Credentials')
+
+# ==============================
+# SHEET STORE
+# ==============================
+# The sheets are read once per process and kept in a SheetStore instead of a
+# plain st.cache_resource entry, so the operations page can show when each
+# one was fetched and reload it: a reload fetches into a staged copy, the
+# prepared frames are rebuilt from it (data_processing.refresh_data), and
+# only then is it made current. Sessions keep the frames they already hold.
+# Each fetch is recorded as a 'fetch' telemetry event.
+
+
+def load_sheet(title):
+    """All records of the first worksheet of the Google Sheet `title`."""
     secret_info = st.secrets["sheets"]
     scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(secret_info, scope)
+    creds = service_account.ServiceAccountCredentials.from_json_keyfile_dict(secret_info, scope)
     client = gspread.authorize(creds)
-    spreadsheet = client.open('ES25 - Combined Data')
+    spreadsheet = client.open(title)
     sheet = spreadsheet.sheet1
     data = sheet.get_all_records()
-    df_survey25 = pd.DataFrame(data)
-    return df_survey25
+    return pd.DataFrame(data)
+
+
+class SheetStore:
+    """Current copy of each sheet, with fetch time, fetch duration and hit/miss counts."""
+
+    def __init__(self, load):
+        self.load = load
+        self.lock = threading.Lock()
+        self.sheets = {}  # title -> {'frame', 'fetched_at', 'seconds'}
+        self.stats = {title: CacheStats() for title in SHEETS}
+        self.fetch_locks = {title: threading.Lock() for title in SHEETS}
+        self.version = 0
+        self.refreshing = ()
+        self.error = None
+        self._staged = threading.local()
+
+    def get(self, title):
+        staged = getattr(self._staged, 'sheets', None)
+        if staged is not None and title in staged:
+            return staged[title]['frame']
+        self.stats[title].request()
+        entry = self.sheets.get(title)
+        if entry is None:
+            # One fetch per sheet; concurrent first sessions wait for it
+            with self.fetch_locks[title]:
+                entry = self.sheets.get(title)
+                if entry is None:
+                    entry = self._fetch(title)
+                    with self.lock:
+                        self.sheets[title] = entry
+                    self.stats[title].miss(entry['seconds'])
+        return entry['frame']
+
+    def _fetch(self, title):
+        started, start = time.time(), perf_counter()
+        frame = self.load(title)
+        seconds = perf_counter() - start
+        record('fetch', title, seconds * 1000, started=started, rows=len(frame))
+        return {'frame': frame, 'fetched_at': started, 'seconds': seconds}
+
+    def reload(self, titles):
+        """The current sheets with `titles` fetched again; not made current (see publish)."""
+        fresh = {}
+        for title in titles:
+            fresh[title] = self._fetch(title)
+            self.stats[title].rebuilt(fresh[title]['seconds'])
+        with self.lock:
+            return {**self.sheets, **fresh}
+
+    @contextmanager
+    def staged(self, sheets):
+        """Serve `sheets` to get() calls made by this thread (to build frames from them)."""
+        self._staged.sheets = sheets
+        try:
+            yield
+        finally:
+            self._staged.sheets = None
+
+    def publish(self, sheets):
+        """Make reloaded sheets current; returns the previous data version."""
+        with self.lock:
+            previous = self.version
+            self.sheets = {**self.sheets, **sheets}
+            self.version += 1
+            return previous
+
+    def info(self):
+        """One row per sheet for the operations page."""
+        rows = []
+        for title in SHEETS:
+            entry = self.sheets.get(title)
+            rows.append({
+                'name': title,
+                'frame': entry['frame'] if entry else None,
+                'fetched_at': entry['fetched_at'] if entry else None,
+                'refresh_seconds': entry['seconds'] if entry else None,
+                **self.stats[title].counts(),
+            })
+        return rows
+
+
+@st.cache_resource(show_spinner=False)
+def sheet_store():
+    return SheetStore(load_sheet)
+
+
+# Fetch data
+
+def fetch_data_survey25():
+    return sheet_store().get('ES25 - Combined Data')
 
-@st.cache_resource()
 def fetch_data_survey24():
-    secret_info = st.secrets["sheets"]
-    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(secret_info, scope)
-    client = gspread.authorize(creds)
-    spreadsheet = client.open('ES24 - Combined Data')
-    sheet = spreadsheet.sheet1
-    data = sheet.get_all_records()
-    df_survey24 = pd.DataFrame(data)
-    return df_survey24
+    return sheet_store().get('ES24 - Combined Data')
 
-@st.cache_resource()
 def fetch_data_survey23():
-    secret_info = st.secrets["sheets"]
-    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(secret_info, scope)
-    client = gspread.authorize(creds)
-    spreadsheet = client.open('ES23 - Combined Data')
-    sheet = spreadsheet.sheet1
-    data = sheet.get_all_records()
-    df_survey23 = pd.DataFrame(data)
-    return df_survey23
+    return sheet_store().get('ES23 - Combined Data')
 
-@st.cache_resource()
 def fetch_data_creds():
-    secret_info = st.secrets["sheets"]
-    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(secret_info, scope)
-    client = gspread.authorize(creds)
-    spreadsheet = client.open('Dashboard Credentials')
-    sheet = spreadsheet.sheet1
-    data = sheet.get_all_records()
-    df_creds = pd.DataFrame(data)
-    return df_creds
+    return sheet_store().get('Dashboard Credentials')
@@ -0,0 +1,25 @@
+import importlib
+import sys
+import types
+
+
+class LazyModule(types.ModuleType):
+    """Stand-in for a module that imports it on first attribute access.
+
+    The stand-in is not registered in sys.modules, so tools that scan
+    sys.modules (inspect, Streamlit's file watcher) do not trigger the import.
+    """
+
+    def __getattr__(self, attr):
+        return getattr(importlib.import_module(self.__name__), attr)
+
+
+def lazy_import(name):
+    """Module `name`, imported only once a section actually uses it.
+
+    Pages bind heavy libraries (plotly, scipy, gspread) with this at
+    the top, so the header and filters render before a chart section needs them.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    return LazyModule(name)
@@ -1,8 +1,12 @@
+import os
 import streamlit as st
 from time import sleep
 from streamlit.runtime.scriptrunner import get_script_run_ctx
 from streamlit.source_util import get_pages
 import pandas as pd
+from profiling import start_rerun, tag
+
+ADMIN_ENV = 'ES_ADMIN_USERS'
 
 
 def get_current_page_name():
@@ -15,6 +19,23 @@ def get_current_page_name():
     return pages[ctx.page_script_hash]["page_name"]
 
 
+def current_page():
+    """Name of the page being run ('page1', 'streamlit_app', ...); 'unknown' outside a script run."""
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return "unknown"
+    page = ctx.pages_manager.get_pages().get(ctx.page_script_hash)
+    return page["page_name"] if page else "unknown"
+
+
+def is_admin():
+    """Logged-in user is listed in ES_ADMIN_USERS (comma-separated usernames)."""
+    if not st.session_state.get("logged_in", False):
+        return False
+    admins = {u.strip() for u in os.environ.get(ADMIN_ENV, '').split(',') if u.strip()}
+    return st.session_state.get("username") in admins
+
+
 def make_sidebar():
     with st.sidebar:
         st.title(":blue_heart: KG Survey Result")
@@ -34,6 +55,10 @@ def make_sidebar():
             st.write("")
             st.write("")
 
+            if is_admin():
+                st.page_link("pages/page9.py", label="Operations", icon="🛠️")
+                st.toggle("Show rerun timings", key="show_timings")
+
             if st.button("Log out"):
                 logout()
 
@@ -42,6 +67,8 @@ def make_sidebar():
             # redirect them to the login page
             st.switch_page("streamlit_app.py")
 
+    start_rerun(current_page(), enabled=is_admin() and st.session_state.get("show_timings", False))
+
 
 def logout():
     st.session_state.logged_in = False
@@ -83,5 +110,6 @@ def make_filter(columns_list, df_survey, key_prefix="filter"):
         if values:
             selected_filters[filter_col] = values
 
+    tag(filters=selected_filters)
     return selected_filters
 
@@ -1,10 +1,19 @@
 from navigation import make_sidebar, make_filter
 import streamlit as st
-from data_processing import finalize_data
-import altair as alt
-import plotly.express as px
+from data_processing import (
+    finalize_data, participation_table, daily_responses, user_units_for, scope_mask, masked_columns
+)
+from analytics.scope import FilterSpec
+from analytics.participation import (
+    response_curve, eta_to_target,
+    scoped_participation, yearly_participation, participation_by_value
+)
+from profiling import timed, tag
 import pandas as pd
-import plotly.graph_objects as go
+from lazy_import import lazy_import
+
+px = lazy_import('plotly.express')
+go = lazy_import('plotly.graph_objects')
 
 st.set_page_config(
     page_title='Demography',
@@ -12,7 +21,8 @@ st.set_page_config(
 )
 
 make_sidebar()
-df_survey25, df_survey24, df_survey23, df_creds = finalize_data()
+with timed('load'):
+    df_survey25, df_survey24, df_survey23, df_creds = finalize_data()
 
 # ==============================
 # FILTER CONFIG
@@ -23,17 +33,6 @@ columns_list = [
     'tenure_category', 'region'
 ]
 
-# ==============================
-# CATEGORY FUNCTION
-# ==============================
-def categorize(value):
-    if value >= 5:
-        return 'High'
-    elif value <= 2:
-        return 'Low'
-    else:
-        return None
-
 # ==============================
 # FILTER FUNCTION
 # ==============================
@@ -59,6 +58,7 @@ def make_filter(columns_list, df_survey, combined_df):
             filtered_combined = filtered_combined[filtered_combined[filter_col].isin(selected_filter_value)]
             selected_filters[filter_col] = selected_filter_value
 
+    tag(filters=selected_filters)
     if filtered_data.shape[0] <= 1 or filtered_combined.shape[0] <= 1:
         st.write("Data is unavailable to protect confidentiality.")
         return pd.DataFrame(), pd.DataFrame(), {}
@@ -71,24 +71,16 @@ def make_filter(columns_list, df_survey, combined_df):
 # ==============================
 if st.session_state.get('authentication_status'):
     username = st.session_state['username']
-    user_units = df_creds.loc[df_creds['username'] == username, 'unit'].values[0].split(', ')
-
-    # Filter each dataset based on user access
-    df_survey25 = df_survey25[df_survey25['subunit'].isin(user_units)]
-    df_survey24 = df_survey24[df_survey24['subunit'].isin(user_units)]
-    df_survey23 = df_survey23[df_survey23['subunit'].isin(user_units)]
+    user_units = user_units_for(df_creds, username)
 
-    # Add year column
-    df_survey25['year'] = 2025
-    df_survey24['year'] = 2024
-    df_survey23['year'] = 2023
+    # The shared frames stay unscoped (they also feed the response-curve cache);
+    # the session keeps row masks and copies only the filter columns
+    frames = {"2023": df_survey23, "2024": df_survey24, "2025": df_survey25}
+    with timed('scope'):
+        masks = {year: scope_mask(df, user_units) for year, df in frames.items()}
 
-    # Combine all years
-    combined_df = pd.concat([df_survey23, df_survey24, df_survey25], ignore_index=True)
-
-    # Add satisfaction categories
-    for d in [df_survey23, df_survey24, df_survey25]:
-        d['category_sat'] = d['SAT'].apply(categorize)
+        # Combine all years
+        combined_df = masked_columns(frames, masks, columns_list)
 
     st.header('Demography Overview', divider='rainbow')
 
@@ -110,23 +102,13 @@ if st.session_state.get('authentication_status'):
     # ==============================
     # FILTER SECTION
     # ==============================
-    filtered_data, filtered_combined, selected_filters = make_filter(columns_list, combined_df, combined_df)
-
-    def apply_selected_filters(df, selected_filters):
-        if not selected_filters:
-            return df.copy()
-        filtered = df.copy()
-        for col, values in selected_filters.items():
-            if not values:
-                continue
-            if col in filtered.columns:
-                filtered = filtered[filtered[col].isin(values)]
-        return filtered
-
-    # Apply filters to each year
-    df_survey23_filtered = apply_selected_filters(df_survey23, selected_filters)
-    df_survey24_filtered = apply_selected_filters(df_survey24, selected_filters)
-    df_survey25_filtered = apply_selected_filters(df_survey25, selected_filters)
+    with timed('filter'):
+        filtered_data, filtered_combined, selected_filters = make_filter(columns_list, combined_df, combined_df)
+
+        # Participation counts: precomputed per (year, column, value, subunit) when
+        # no extra filter is active, otherwise counted from the filtered rows
+        spec = FilterSpec(user_units, selected_filters)
+        table = None if spec else participation_table()
 
     #st.write("Selected filters:", selected_filters)
     #st.write("Combined filtered rows:", len(filtered_combined))
@@ -137,29 +119,9 @@ if st.session_state.get('authentication_status'):
     # ==============================
     st.markdown("#### 📈 Metrics Overview by Year")
 
-    def calc_participants(df, year_label):
-        if df.empty:
-            return {'year': year_label, 'participants': 0, 'total': 0, 'percentage': 0}
-        df = df.copy()
-        total = df['nik'].nunique()
-        participants = df.loc[df['submit_date'].notna() & (df['submit_date'] != ""), 'nik'].nunique()
-        percentage = (participants / total * 100) if total > 0 else 0
-        return {
-            'year': year_label,
-            'participants': participants,
-            'total': total,
-            'percentage': round(percentage, 1)
-        }
-
-    yearly_data = []
-    for year, df in [
-        ("2023", df_survey23_filtered),
-        ("2024", df_survey24_filtered),
-        ("2025", df_survey25_filtered)
-    ]:
-        yearly_data.append(calc_participants(df, year))
-
-    df_yearly = pd.DataFrame(yearly_data)
+    # Year totals = sum over the user's subunits
+    with timed('aggregate'):
+        df_yearly = yearly_participation(scoped_participation(frames, spec, ['subunit'], table=table))
 
     # ==============================
 
@@ -250,79 +212,104 @@ if st.session_state.get('authentication_status'):
     year_options = ["2023", "2024", "2025"]
     selected_year = st.selectbox("Select Year to Display:", year_options, index=year_options.index("2025"))
 
-    # Gabungkan semua tahun dulu
-    combined_years = pd.concat([
-        df_survey23_filtered.assign(year="2023"),
-        df_survey24_filtered.assign(year="2024"),
-        df_survey25_filtered.assign(year="2025")
-    ], ignore_index=True)
-
-    # Filter by selected year first
-    df_year_selected = combined_years[combined_years['year'] == selected_year]
-
-    if unit_column in df_year_selected.columns:
-        df_filtered = df_year_selected.copy()
-
-        # Buat kolom status partisipasi
-        df_filtered['status_participation'] = df_filtered['submit_date'].apply(
-            lambda x: 'Done' if pd.notna(x) and x != "" else 'Not Done'
-        )
-
-        # Hitung jumlah unik NIK per unit-column dan status
-        grouped = (
-            df_filtered.groupby([unit_column, 'status_participation'])
-            .agg(count=('nik', 'nunique'))
-            .reset_index()
-        )
+    if unit_column in combined_df.columns:
+        # Jumlah unik NIK per nilai kolom: Done vs Not Done
+        with timed('aggregate'):
+            pivot_df, pivot_counts = participation_by_value(
+                scoped_participation(frames, spec, [unit_column], years=(selected_year,), table=table),
+                unit_column
+            )
 
-        # Hitung total per unit untuk persentase
-        totals = grouped.groupby(unit_column)['count'].transform('sum')
-        grouped['percentage'] = grouped['count'] / totals * 100
+        # Plot horizontal stacked bar (Done vs Not Done)
+        with timed('render'):
+            fig2 = px.bar(
+                pivot_df,
+                y=unit_column,
+                x=['Done', 'Not Done'],
+                barmode='stack',
+                orientation='h',
+                title=f'Participation Status Distribution by {unit_column.capitalize()} ({selected_year})',
+                color_discrete_map={
+                    'Done': '#1A2B4C',
+                    'Not Done': '#EAD8C0'
+                }
+            )
 
-        # Pivot untuk plot stacked bar
-        pivot_df = grouped.pivot(index=unit_column, columns='status_participation', values='percentage').fillna(0)
-        pivot_counts = grouped.pivot(index=unit_column, columns='status_participation', values='count').fillna(0)
+            # Tambahkan label persentase + jumlah
+            for trace in fig2.data:
+                status = trace.name
+                trace.customdata = pivot_counts[status]
+                trace.texttemplate = '%{x:.1f}%% (%{customdata})'
+                trace.textposition = 'inside'
+
+            fig2.update_layout(
+                xaxis=dict(title="Percentage (%)", range=[0, 100]),
+                yaxis=dict(title=unit_column.capitalize(), categoryorder='total ascending'),
+                height=700,
+                template="plotly_white",
+                legend_title_text="Participation Status",
+                bargap=0.2
+            )
 
-        # Pastikan kolom Done dan Not Done selalu ada
-        for col in ['Done', 'Not Done']:
-            if col not in pivot_df.columns:
-                pivot_df[col] = 0
-                pivot_counts[col] = 0
+            st.plotly_chart(fig2, use_container_width=True)
 
-        pivot_df = pivot_df.reset_index()
-        pivot_counts = pivot_counts.reset_index()
+    else:
+        st.warning(f"Column '{unit_column}' not found in data.")
 
-        # Plot horizontal stacked bar (Done vs Not Done)
-        fig2 = px.bar(
-            pivot_df,
-            y=unit_column,
-            x=['Done', 'Not Done'],
-            barmode='stack',
-            orientation='h',
-            title=f'Participation Status Distribution by {unit_column.capitalize()} ({selected_year})',
-            color_discrete_map={
-                'Done': '#1A2B4C',
-                'Not Done': '#EAD8C0'
-            }
-        )
+    st.divider()
 
-        # Tambahkan label persentase + jumlah
-        for trace in fig2.data:
-            status = trace.name
-            trace.customdata = pivot_counts[status]
-            trace.texttemplate = '%{x:.1f}%% (%{customdata})'
-            trace.textposition = 'inside'
-
-        fig2.update_layout(
-            xaxis=dict(title="Percentage (%)", range=[0, 100]),
-            yaxis=dict(title=unit_column.capitalize(), categoryorder='total ascending'),
-            height=700,
-            template="plotly_white",
-            legend_title_text="Participation Status",
-            bargap=0.2
-        )
+    # ==============================
+    # 📅 PARTICIPATION OVER TIME
+    # ==============================
+    st.markdown(f"#### 📅 Participation Over Time ({selected_year})")
 
-        st.plotly_chart(fig2, use_container_width=True)
+    with timed('aggregate'):
+        if not spec:
+            curve = daily_responses(frames[selected_year], selected_year).curve(user_units)
+        else:
+            df_year = frames[selected_year]
+            curve = response_curve(df_year.loc[spec.mask(df_year), ['subunit', 'submit_dt']])
 
+    if curve.empty:
+        st.info("No submit dates available for this selection.")
     else:
-        st.warning(f"Column '{unit_column}' not found in data.")
+        total_selected = int(df_yearly.loc[df_yearly['year'] == selected_year, 'total'].sum())
+        target_rate = st.slider("Target participation rate (%):", min_value=10, max_value=100, value=80, step=5)
+        current_rate, pace, eta = eta_to_target(curve, total_selected, target_rate)
+
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Current rate", f"{current_rate:.1f}%")
+        col2.metric("Pace (last 7 days)", f"{pace:.1f} / day")
+        if eta is None:
+            col3.metric("ETA to target", "–")
+        elif current_rate >= target_rate:
+            col3.metric("Target reached on", eta.strftime('%d %b %Y'))
+        else:
+            col3.metric("ETA to target", eta.strftime('%d %b %Y'))
+
+        with timed('render'):
+            fig3 = go.Figure()
+            fig3.add_trace(go.Bar(
+                x=curve['date'],
+                y=curve['daily'],
+                name='Daily responses',
+                marker_color='#EAD8C0'
+            ))
+            fig3.add_trace(go.Scatter(
+                x=curve['date'],
+                y=curve['cumulative'] / total_selected * 100 if total_selected else curve['cumulative'] * 0,
+                name='Cumulative rate (%)',
+                mode='lines+markers',
+                line=dict(color='#1A2B4C'),
+                yaxis='y2'
+            ))
+            fig3.add_hline(y=target_rate, line_dash='dash', line_color='green', yref='y2')
+            fig3.update_layout(
+                xaxis=dict(title="Date"),
+                yaxis=dict(title="Responses per day"),
+                yaxis2=dict(title="Cumulative rate (%)", overlaying='y', side='right', range=[0, 100]),
+                legend=dict(orientation="h", y=-0.2),
+                height=450,
+                template="plotly_white"
+            )
+            st.plotly_chart(fig3, use_container_width=True)
@@ -1,60 +1,29 @@
 from navigation import make_sidebar, make_filter
 import streamlit as st
-from data_processing import finalize_data
-from scipy import stats
+from data_processing import finalize_data, user_units_for
+from analytics.scope import FilterSpec
+from analytics.satisfaction import (
+    with_average_sat, satisfaction_years, year_comparison, demography_comparison, score_distribution
+)
+from profiling import timed
+from result_cache import shared_result
+from views import YEARS, SATISFACTION_CHART_YEAR, SATISFACTION_FILTER_COLUMNS, satisfaction_columns, satisfaction_scope
 import pandas as pd
-import plotly.express as px
-import numpy as np
+from lazy_import import lazy_import
+
+px = lazy_import('plotly.express')
 
 st.set_page_config(page_title='Satisfaction', page_icon=':👍:')
 make_sidebar()
 
 # Load data
-df_survey25, df_survey24, df_survey23, df_creds = finalize_data()
+with timed('load'):
+    df_survey25, df_survey24, df_survey23, df_creds = finalize_data()
 
 # -----------------------
 # Configuration / mappings
 # -----------------------
-satisfaction_columns = [
-    'SAT', 'average_kd', 'average_ki', 'average_kr',
-    'average_pr', 'average_tu', 'average_ke'
-]
-
-satisfaction_columns_item = [
-    'SAT',
-    'KD0', 'KD1', 'KD2', 'KD3', 'KE0', 'KE1', 'KE2', 'KE3',
-    'KI0', 'KI1', 'KI2', 'KI3', 'KI4', 'KI5',
-    'KR0', 'KR1', 'KR2', 'KR3', 'KR4', 'KR5',
-    'PR0', 'PR1', 'PR2',
-    'TU0', 'TU1', 'TU2', 'TU3'
-]
-
-satisfaction_mapping = {
-    'SAT': 'Overall Satisfaction',
-    'average_kd': 'Kebutuhan Dasar',
-    'average_ki': 'Kontribusi Individu',
-    'average_kr': 'Kerjasama',
-    'average_pr': 'Pertumbuhan',
-    'average_tu': 'Tujuan',
-    'average_ke': 'Keterlekatan'
-}
-
-satisfaction_mapping_item = {k: k for k in satisfaction_columns_item}
-
-columns_list = [
-    'unit', 'subunit', 'directorate', 'site', 'division',  'department', 'section',
-    'layer', 'work_contract', 'generation', 'gender', 'tenure_category', 'region'
-]
-
-prefix_mapping = {
-    "SAT": "Overall Satisfaction",
-    "KD": "Kebutuhan Dasar",
-    "KI": "Kontribusi Individu",
-    "KR": "Kerjasama",
-    "PR": "Pertumbuhan",
-    "TU": "Tujuan",
-    "KE": "Keterlekatan"
-}
+columns_list = SATISFACTION_FILTER_COLUMNS
 
 score_labels = {
     "1": "Sangat Tidak Setuju",
@@ -87,17 +56,18 @@ def highlight_progress(val):
 # -----------------------
 if st.session_state.get('authentication_status'):
     username = st.session_state['username']
-    user_units = df_creds.loc[df_creds['username'] == username, 'unit'].values[0].split(', ')
-    df_survey25 = df_survey25[df_survey25['subunit'].isin(user_units)]
-    df_survey24 = df_survey24[df_survey24['subunit'].isin(user_units)]
-    df_survey23 = df_survey23[df_survey23['subunit'].isin(user_units)]
+    user_units = user_units_for(df_creds, username)
+    with timed('scope'):
+        # Only the filter columns, the items and the dimension averages are copied
+        scoped = satisfaction_scope({2023: df_survey23, 2024: df_survey24, 2025: df_survey25}, user_units)
+        df_survey23, df_survey24, df_survey25 = scoped[2023], scoped[2024], scoped[2025]
 
     st.header('Satisfaction Score', divider='rainbow')
 
     # Item-level toggle
     item_level_analysis = st.checkbox("Check to analyze at item level", value=False)
 
-    # Choose columns based on toggle
+    # Item descriptions at item level
     if item_level_analysis:
         data = {
             "Code": [
@@ -170,160 +140,60 @@ if st.session_state.get('authentication_status'):
         # Display the styled table using st.markdown with unsafe_allow_html=True
         st.markdown(table_html, unsafe_allow_html=True)
 
-        satisfaction_cols = satisfaction_columns_item
-        satisfaction_map = satisfaction_mapping_item
-        prefix_mapping = satisfaction_mapping_item
-    else:
-        satisfaction_cols = satisfaction_columns
-        satisfaction_map = satisfaction_mapping
-        prefix_mapping = prefix_mapping
+    # Choose columns based on toggle
+    satisfaction_cols, satisfaction_map, prefix_mapping = satisfaction_columns(item_level_analysis)
 
     # Recalculate SAT dynamically from raw item-level columns
     use_average_sat = st.checkbox("Use average of satisfaction items for Overall Satisfaction", value=False, key="UseAverageSAT")
 
-    if use_average_sat:
-        for df in [df_survey23, df_survey24, df_survey25]:
-            existing_cols = [c for c in satisfaction_columns_item if c in df.columns]
-            if existing_cols:
-                df['SAT'] = df[existing_cols].mean(axis=1)
+    with timed('aggregate'):
+        if use_average_sat:
+            df_survey23, df_survey24, df_survey25 = (with_average_sat(df) for df in (df_survey23, df_survey24, df_survey25))
 
     # Filters
-    combined_for_filters = pd.concat([df_survey23, df_survey24, df_survey25], ignore_index=True)
-    selected_filters = make_filter(columns_list, combined_for_filters, key_prefix="filter")
-
-    def apply_selected_filters(df, selected_filters):
-        if not selected_filters:
-            return df.copy()
-        filtered = df.copy()
-        for col, values in selected_filters.items():
-            if values and col in filtered.columns:
-                filtered = filtered[filtered[col].isin(values)]
-        return filtered
-
-    df_survey23_filtered = apply_selected_filters(df_survey23, selected_filters)
-    df_survey24_filtered = apply_selected_filters(df_survey24, selected_filters)
-    df_survey25_filtered = apply_selected_filters(df_survey25, selected_filters)
-
-    # --- CONFIDENTIALITY CHECK ---
-    def confidentiality_guard(df):
-        if df.shape[0] <= 1 and len(selected_filters) > 0:
-            st.warning("⚠️ Data is unavailable to protect confidentiality (N ≤ 1).")
-            return pd.DataFrame()
-        return df
-
-    df_survey23_filtered = confidentiality_guard(df_survey23_filtered)
-    df_survey24_filtered = confidentiality_guard(df_survey24_filtered)
-    df_survey25_filtered = confidentiality_guard(df_survey25_filtered)
-
-    # Ensure numeric
-    for col in satisfaction_cols:
-        for df in [df_survey23_filtered, df_survey24_filtered, df_survey25_filtered]:
-            if col not in df.columns:
-                df[col] = pd.NA
-            df[col] = pd.to_numeric(df[col], errors='coerce')
+    with timed('filter'):
+        combined_for_filters = pd.concat([df_survey23, df_survey24, df_survey25], ignore_index=True)
+        selected_filters = make_filter(columns_list, combined_for_filters, key_prefix="filter")
+
+        # Filtered years; a year with N ≤ 1 under a filter is hidden (confidentiality)
+        years, hidden_years = satisfaction_years(
+            {2023: df_survey23, 2024: df_survey24, 2025: df_survey25},
+            FilterSpec(filters=selected_filters), satisfaction_cols
+        )
+        # The toggles change the year frames, so they go into depends_on
+        view = FilterSpec(user_units, selected_filters)
+        view_options = (item_level_analysis, use_average_sat)
+    for _ in hidden_years:
+        st.warning("⚠️ Data is unavailable to protect confidentiality (N ≤ 1).")
 
     # -----------------------
     # Year Comparison Table
     # -----------------------
-
-    # --- Top Box Calculation (score = 5) ---
-    def top_box_percentage(df, columns):
-        """Calculate top box % (score = 5) for each column in df."""
-        result = {}
-        for col in columns:
-            if col in df.columns:
-                total = df[col].notna().sum()
-                top5 = (df[col] == 5).sum()
-                result[col] = round((top5 / total * 100), 2) if total > 0 else np.nan
-            else:
-                result[col] = np.nan
-        return pd.Series(result)
-
-    df_avg_23 = df_survey23_filtered[satisfaction_cols].mean().round(2).reset_index()
-    df_avg_23.columns = ['Dimension/Item', 'Average 2023']
-    df_avg_24 = df_survey24_filtered[satisfaction_cols].mean().round(2).reset_index()
-    df_avg_24.columns = ['Dimension/Item', 'Average 2024']
-    df_avg_25 = df_survey25_filtered[satisfaction_cols].mean().round(2).reset_index()
-    df_avg_25.columns = ['Dimension/Item', 'Average 2025']
-
-    # Calculate Top Box if item level is checked
-    if item_level_analysis:
-        top23 = top_box_percentage(df_survey23_filtered, satisfaction_cols).reset_index()
-        top23.columns = ['Dimension/Item', 'Top Box 2023 (%)']
-
-        top24 = top_box_percentage(df_survey24_filtered, satisfaction_cols).reset_index()
-        top24.columns = ['Dimension/Item', 'Top Box 2024 (%)']
-
-        top25 = top_box_percentage(df_survey25_filtered, satisfaction_cols).reset_index()
-        top25.columns = ['Dimension/Item', 'Top Box 2025 (%)']
-
-        df_comparison = df_avg_23.merge(df_avg_24, on='Dimension/Item', how='outer')
-        df_comparison = df_comparison.merge(df_avg_25, on='Dimension/Item', how='outer')
-        df_comparison = df_comparison.merge(top23, on='Dimension/Item', how='outer')
-        df_comparison = df_comparison.merge(top24, on='Dimension/Item', how='outer')
-        df_comparison = df_comparison.merge(top25, on='Dimension/Item', how='outer')
-    else:
-        df_comparison = df_avg_23.merge(df_avg_24, on='Dimension/Item', how='outer')
-        df_comparison = df_comparison.merge(df_avg_25, on='Dimension/Item', how='outer')
-
-    df_comparison['Dimension/Item'] = df_comparison['Dimension/Item'].map(satisfaction_map).fillna(df_comparison['Dimension/Item'])
-    
-    df_comparison['Progress 2024'] = df_comparison['Average 2024'] - df_comparison['Average 2023']
-    df_comparison['Progress 2025'] = df_comparison['Average 2025'] - df_comparison['Average 2024']
-
-    # N row
-    n_row_dict = {
-        'Dimension/Item': 'N',
-        'Average 2023': df_survey23_filtered['SAT'].count(),
-        'Average 2024': df_survey24_filtered['SAT'].count(),
-        'Average 2025': df_survey25_filtered['SAT'].count(),
-        'Progress 2024': df_survey24_filtered['SAT'].count() - df_survey23_filtered['SAT'].count(),
-        'Progress 2025': df_survey25_filtered['SAT'].count() - df_survey24_filtered['SAT'].count(),
-    }
-
-    # Add empty Top Box columns for N row if needed
-    if item_level_analysis:
-        n_row_dict.update({
-            'Top Box 2023 (%)': np.nan,
-            'Top Box 2024 (%)': np.nan,
-            'Top Box 2025 (%)': np.nan
-        })
-
-    n_row = pd.DataFrame([n_row_dict])
-    df_comparison = pd.concat([df_comparison, n_row], ignore_index=True)
-
-    # Reorder rows so SAT appears first
-    if 'SAT' in df_comparison['Dimension/Item'].values:
-        sat_row = df_comparison[df_comparison['Dimension/Item'] == 'SAT']
-        other_rows = df_comparison[df_comparison['Dimension/Item'] != 'SAT']
-        df_comparison = pd.concat([sat_row, other_rows], ignore_index=True)
-
-    # If both item level and SAT-average checkboxes are selected, drop SAT row
-    if item_level_analysis and st.session_state.get('UseAverageSAT', False):
-        df_comparison = df_comparison[df_comparison['Dimension/Item'] != 'SAT']
-
-    if item_level_analysis:
-        df_comparison = df_comparison[['Dimension/Item', 'Top Box 2023 (%)', 'Average 2023', 'Top Box 2024 (%)','Average 2024', 'Progress 2024', 'Top Box 2025 (%)', 'Average 2025', 'Progress 2025']]
-    else:
-        df_comparison = df_comparison[['Dimension/Item', 'Average 2023', 'Average 2024', 'Progress 2024', 'Average 2025', 'Progress 2025']]
+    drop_sat = item_level_analysis and st.session_state.get('UseAverageSAT', False)
+    with timed('aggregate'):
+        df_comparison = shared_result(
+            'satisfaction.year_comparison', view, year_comparison, years, satisfaction_cols, satisfaction_map,
+            item_level=item_level_analysis, drop_sat=drop_sat, depends_on=view_options
+        )
 
     st.subheader("🟣 Year-over-Year Dimension Comparison", divider="gray")
     
-    styled_year = (
-        df_comparison.style
-        .applymap(highlight_progress, subset=['Progress 2024', 'Progress 2025'])
-        .format({
-            'Average 2023': '{:.2f}',
-            'Average 2024': '{:.2f}',
-            'Average 2025': '{:.2f}',
-            'Progress 2024': '{:+.2f}',
-            'Progress 2025': '{:+.2f}',
-            'Top Box 2023 (%)': '{:.0f}%',
-            'Top Box 2024 (%)': '{:.0f}%',
-            'Top Box 2025 (%)': '{:.0f}%'
-        }, na_rep='–')
-    )
-    st.dataframe(styled_year, use_container_width=True, hide_index=True)
+    with timed('render'):
+        styled_year = (
+            df_comparison.style
+            .applymap(highlight_progress, subset=['Progress 2024', 'Progress 2025'])
+            .format({
+                'Average 2023': '{:.2f}',
+                'Average 2024': '{:.2f}',
+                'Average 2025': '{:.2f}',
+                'Progress 2024': '{:+.2f}',
+                'Progress 2025': '{:+.2f}',
+                'Top Box 2023 (%)': '{:.0f}%',
+                'Top Box 2024 (%)': '{:.0f}%',
+                'Top Box 2025 (%)': '{:.0f}%'
+            }, na_rep='–')
+        )
+        st.dataframe(styled_year, use_container_width=True, hide_index=True)
 
     # -----------------------
     # 🟢 Year-over-Year Demographic Comparison
@@ -351,73 +221,12 @@ if st.session_state.get('authentication_status'):
         key="demo_table_demography"
     )
 
-    # -----------------------
-    # Helper: Summarize by demography
-    # -----------------------
-    def summarize_by_demography(df, year, dimension_col, demo_col, include_topbox=False):
-        if demo_col not in df.columns:
-            base_cols = [demo_col, f'{year} Mean', f'{year} N']
-            if include_topbox:
-                base_cols.insert(2, f'{year} Top Box (%)')
-            return pd.DataFrame(columns=base_cols)
-        
-        temp = df.copy()
-        temp[demo_col] = temp[demo_col].astype(object).fillna("Missing").astype(str)
-
-        grouped = (
-            temp.groupby(demo_col)[dimension_col]
-            .agg(['mean', 'count'])
-            .round(2)
-            .reset_index()
+    with timed('aggregate'):
+        demo_merge, rows_removed = shared_result(
+            'satisfaction.demography_comparison', view, demography_comparison,
+            years, selected_dimension_for_demo_table, selected_demography_for_table,
+            include_topbox=item_level_analysis, depends_on=view_options, persist=True
         )
-        grouped.columns = [demo_col, f'{year} Mean', f'{year} N']
-
-        if include_topbox:
-            topbox = (
-                temp.groupby(demo_col)[dimension_col]
-                .apply(lambda x: (x == 5).sum() / x.notna().sum() * 100 if x.notna().sum() > 0 else np.nan)
-                .reset_index(name=f'{year} Top Box (%)')
-            )
-            grouped = grouped.merge(topbox, on=demo_col, how='left')
-
-        return grouped
-
-    # -----------------------
-    # Summaries per year
-    # -----------------------
-    demo_23 = summarize_by_demography(
-        df_survey23_filtered, 2023, selected_dimension_for_demo_table, selected_demography_for_table,
-        include_topbox=item_level_analysis
-    )
-    demo_24 = summarize_by_demography(
-        df_survey24_filtered, 2024, selected_dimension_for_demo_table, selected_demography_for_table,
-        include_topbox=item_level_analysis
-    )
-    demo_25 = summarize_by_demography(
-        df_survey25_filtered, 2025, selected_dimension_for_demo_table, selected_demography_for_table,
-        include_topbox=item_level_analysis
-    )
-
-    # -----------------------
-    # Merge all years
-    # -----------------------
-    demo_merge = demo_23.merge(demo_24, on=selected_demography_for_table, how='outer')
-    demo_merge = demo_merge.merge(demo_25, on=selected_demography_for_table, how='outer')
-
-    # Ensure numeric
-    for col in [f'{y} Mean' for y in [2023, 2024, 2025]]:
-        if col in demo_merge.columns:
-            demo_merge[col] = pd.to_numeric(demo_merge[col], errors='coerce')
-
-    # -----------------------
-    # Remove N=1 for confidentiality
-    # -----------------------
-    n_cols = [f'{y} N' for y in [2023, 2024, 2025] if f'{y} N' in demo_merge.columns]
-    rows_removed = 0
-    if n_cols:
-        condition = (demo_merge[n_cols] == 1).any(axis=1)
-        rows_removed = condition.sum()
-        demo_merge = demo_merge[~condition]
 
     if rows_removed > 0:
         st.write(
@@ -425,34 +234,6 @@ if st.session_state.get('authentication_status'):
             f"'{selected_demography_for_table.capitalize()}' column were removed to protect confidentiality (N=1)."
         )
 
-    # -----------------------
-    # Progress calculation
-    # -----------------------
-    if '2023 Mean' in demo_merge.columns and '2024 Mean' in demo_merge.columns:
-        demo_merge['Progress 2024'] = demo_merge['2024 Mean'] - demo_merge['2023 Mean']
-    if '2024 Mean' in demo_merge.columns and '2025 Mean' in demo_merge.columns:
-        demo_merge['Progress 2025'] = demo_merge['2025 Mean'] - demo_merge['2024 Mean']
-
-    # -----------------------
-    # Column ordering: N → Top Box (if any) → Mean → Progress
-    # -----------------------
-    cols = [selected_demography_for_table]
-    for y in [2023, 2024, 2025]:
-        if f'{y} Mean' in demo_merge.columns:
-            year_cols = [f'{y} N']
-            if f'{y} Top Box (%)' in demo_merge.columns:
-                year_cols.append(f'{y} Top Box (%)')
-            year_cols.append(f'{y} Mean')
-            if y in [2024, 2025]:
-                year_cols.append(f'Progress {y}')
-            cols += year_cols
-
-    demo_merge = demo_merge[cols]
-
-    # Sort by 2025 Mean if available
-    if '2025 Mean' in demo_merge.columns:
-        demo_merge = demo_merge.sort_values(by='2025 Mean', ascending=False)
-
     # -----------------------
     # Format table
     # -----------------------
@@ -465,13 +246,14 @@ if st.session_state.get('authentication_status'):
         elif 'Top Box' in c:
             format_dict[c] = '{:.0f}%'
 
-    styled_demo = (
-        demo_merge.style
-        .applymap(highlight_progress, subset=['Progress 2024', 'Progress 2025'])
-        .format(format_dict, na_rep='–')
-    )
+    with timed('render'):
+        styled_demo = (
+            demo_merge.style
+            .applymap(highlight_progress, subset=['Progress 2024', 'Progress 2025'])
+            .format(format_dict, na_rep='–')
+        )
 
-    st.dataframe(styled_demo, use_container_width=True, hide_index=True)
+        st.dataframe(styled_demo, use_container_width=True, hide_index=True)
 
 
     # -----------------------
@@ -481,78 +263,53 @@ if st.session_state.get('authentication_status'):
 
     selected_year_for_chart = st.radio(
         "Select Year for Score Percentage Charts:",
-        options=[2023, 2024, 2025],
-        index=2,  # 0 → 2023, 1 → 2024, 2 → 2025
+        options=list(YEARS),
+        index=YEARS.index(SATISFACTION_CHART_YEAR),
         horizontal=True,
         key="score_percentage_year"
     )
 
-    # Pick the filtered dataframe based on selected year
-    if selected_year_for_chart == 2023:
-        df_selected_year = df_survey23_filtered
-    elif selected_year_for_chart == 2024:
-        df_selected_year = df_survey24_filtered
-    else:
-        df_selected_year = df_survey25_filtered
-
-    df_score_dimension = pd.DataFrame(columns=[1, 2, 3, 4, 5])
-
-    for prefix, label in prefix_mapping.items():
-        relevant_columns = [col for col in df_selected_year.columns if col.lower().startswith(prefix.lower())]
-        if relevant_columns:
-            prefix_data = df_selected_year[relevant_columns].melt(value_name='Score').drop(columns='variable')
-            score_counts = (
-                prefix_data['Score']
-                .value_counts(normalize=True)
-                .reindex(range(1, 6), fill_value=0) * 100
-            ).round(1)
-            df_score_dimension.loc[label] = score_counts.values
-
-    df_score_dimension.reset_index(inplace=True)
-    df_score_dimension.columns = ['Dimension', 1, 2, 3, 4, 5]
-    df_score_dimension.columns = df_score_dimension.columns.astype(str)
-
-    dimension_score_melt = df_score_dimension.melt(
-        id_vars='Dimension',
-        value_vars=['1', '2', '3', '4', '5'],
-        var_name='Score',
-        value_name='Percent'
-    )
+    with timed('aggregate'):
+        dimension_score_melt = shared_result(
+            'satisfaction.score_distribution', view, score_distribution, years[selected_year_for_chart], prefix_mapping,
+            depends_on=view_options + (selected_year_for_chart,)
+        )
 
-    overall_data = dimension_score_melt[dimension_score_melt['Dimension'] == 'Overall Satisfaction']
-    other_data = dimension_score_melt[dimension_score_melt['Dimension'] != 'Overall Satisfaction']
-
-    chart1 = px.bar(
-        overall_data,
-        x="Percent",
-        y="Dimension",
-        color="Score",
-        orientation="h",
-        text="Percent",
-        color_discrete_sequence=px.colors.sequential.Purples
-    )
-    chart1.update_traces(texttemplate='%{text:.1f}%', textposition='inside')
-
-    chart2 = px.bar(
-        other_data,
-        x="Percent",
-        y="Dimension",
-        color="Score",
-        orientation="h",
-        text="Percent",
-        color_discrete_sequence=px.colors.sequential.Blues
-    )
-    chart2.update_traces(texttemplate='%{text:.1f}%', textposition='inside')
+        overall_data = dimension_score_melt[dimension_score_melt['Dimension'] == 'Overall Satisfaction']
+        other_data = dimension_score_melt[dimension_score_melt['Dimension'] != 'Overall Satisfaction']
+
+    with timed('render'):
+        chart1 = px.bar(
+            overall_data,
+            x="Percent",
+            y="Dimension",
+            color="Score",
+            orientation="h",
+            text="Percent",
+            color_discrete_sequence=px.colors.sequential.Purples
+        )
+        chart1.update_traces(texttemplate='%{text:.1f}%', textposition='inside')
+
+        chart2 = px.bar(
+            other_data,
+            x="Percent",
+            y="Dimension",
+            color="Score",
+            orientation="h",
+            text="Percent",
+            color_discrete_sequence=px.colors.sequential.Blues
+        )
+        chart2.update_traces(texttemplate='%{text:.1f}%', textposition='inside')
 
-    try:
-        chart1.for_each_trace(lambda t: t.update(name=score_labels[t.name]))
-        chart2.for_each_trace(lambda t: t.update(name=score_labels[t.name]))
-    except Exception:
-        pass
+        try:
+            chart1.for_each_trace(lambda t: t.update(name=score_labels[t.name]))
+            chart2.for_each_trace(lambda t: t.update(name=score_labels[t.name]))
+        except Exception:
+            pass
 
-    # Display charts (no expander)
-    st.plotly_chart(chart1, use_container_width=True)
-    st.plotly_chart(chart2, use_container_width=True)
+        # Display charts (no expander)
+        st.plotly_chart(chart1, use_container_width=True)
+        st.plotly_chart(chart2, use_container_width=True)
 
 
 else:
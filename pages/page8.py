@@ -1,12 +1,58 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
-from sklearn.linear_model import LinearRegression
-from sklearn.preprocessing import StandardScaler
-import matplotlib.pyplot as plt
-from matplotlib.ticker import FormatStrFormatter
-from data_processing import finalize_data
+from lazy_import import lazy_import
+from data_processing import finalize_data, user_units_for
 from navigation import make_sidebar, make_filter
+from charts import cached_figure
+from analytics.ipa import (
+    IMPORTANCE_METHODS, MISSING_MODES, ipa_items, compute_importance, ipa_quadrants,
+    bootstrap_quadrants, compute_group_importance, ipa_result_table, improve_summary,
+    with_item_labels
+)
+from analytics.scope import FilterSpec
+from profiling import timed
+from result_cache import run_job, shared_result
+from views import IPA_DEFAULT_YEAR, IPA_FILTER_COLUMNS, IPA_RIDGE_ALPHA, IPA_TARGETS, IPA_YEAR_OPTIONS, ipa_scope
+
+px = lazy_import('plotly.express')
+
+# ==============================
+# FIGURES
+# ==============================
+GROUP_CHART_LIMIT = 12  # small multiples drawn by default in the batch IPA
+
+IPA_COLORS = {
+    'Leverage': '#2ca02c',
+    'Improve': '#d62728',
+    'Nice to have': '#1f77b4',
+    'Low priority': '#ff7f0e'
+}
+
+
+def ipa_scatter_figure(points, importance_midpoint, performance_midpoint, method_label, target_option):
+    """IPA quadrant scatter: one labelled point per factor, midpoint lines."""
+    fig = px.scatter(
+        points, x='Performance', y='Importance', color='Category', text='Factor',
+        color_discrete_map=IPA_COLORS,
+        category_orders={'Category': list(IPA_COLORS)}
+    )
+    fig.update_traces(marker=dict(size=12, opacity=0.8), textposition='top right', textfont=dict(size=11))
+
+    # Garis tengah
+    fig.add_hline(y=importance_midpoint, line_dash='dash', line_color='green',
+                  annotation_text='Importance Midpoint', annotation_position='bottom right')
+    fig.add_vline(x=performance_midpoint, line_dash='dash', line_color='red',
+                  annotation_text='Performance Midpoint', annotation_position='top left')
+
+    fig.update_layout(
+        title=f'Importance–Performance Analysis (Target: {target_option})',
+        xaxis_title='Performance (Mean of Items)',
+        yaxis_title=f'Importance ({method_label} vs {target_option})',
+        xaxis_tickformat='.2f',
+        yaxis_tickformat='.2f',
+        height=600
+    )
+    return fig
+
 
 # ==============================
 # PAGE CONFIG
@@ -17,40 +63,38 @@ make_sidebar()
 # ==============================
 # LOAD DATA
 # ==============================
-df_survey25, df_survey24, df_survey23, df_creds = finalize_data()
-df_all = {"2025": df_survey25, "2024": df_survey24, "2023": df_survey23}
+with timed('load'):
+    df_survey25, df_survey24, df_survey23, df_creds = finalize_data()
+    df_all = dict(zip(IPA_YEAR_OPTIONS, (df_survey25, df_survey24, df_survey23)))
 
 st.header('Importance–Performance Analysis (IPA)', divider='rainbow')
 
 # ==============================
 # SELECT YEAR
 # ==============================
-selected_year = st.selectbox("Pilih tahun survei:", options=list(df_all.keys()), index=0)
-df = df_all[selected_year].copy()
-df = df[df['submit_date'].notna() & (df['submit_date'] != "")]
+selected_year = st.selectbox("Pilih tahun survei:", options=IPA_YEAR_OPTIONS, index=IPA_YEAR_OPTIONS.index(IPA_DEFAULT_YEAR))
 
 # ==============================
 # USER ACCESS FILTER
 # ==============================
+user_units = None
 if st.session_state.get('authentication_status'):
     username = st.session_state['username']
-    user_units = df_creds.loc[df_creds['username'] == username, 'unit'].values[0].split(', ')
-    df = df[df['subunit'].isin(user_units)]
+    user_units = user_units_for(df_creds, username)
+
+# Only the selected year's submitted respondents, with the filter columns, the items and the targets
+with timed('scope'):
+    df = ipa_scope(df_all[selected_year], user_units, selected_year)
 
 # ==============================
 # FILTER TAMBAHAN
 # ==============================
-columns_list = [
-    'unit', 'subunit', 'directorate', 'division', 'department', 'section',
-    'layer', 'status', 'generation', 'gender', 'marital', 'education',
-    'tenure_category', 'children', 'region', 'participation_23'
-]
-
-selected_filters = make_filter(columns_list, df, key_prefix="ipa_filter")
+columns_list = IPA_FILTER_COLUMNS
 
-for col, values in selected_filters.items():
-    if values:
-        df = df[df[col].isin(values)]
+with timed('filter'):
+    selected_filters = make_filter(columns_list, df, key_prefix="ipa_filter")
+    df = df[FilterSpec(filters=selected_filters).mask(df)]
+    view = FilterSpec(user_units, selected_filters)
 
 st.write(f"Jumlah data setelah filter: {df.shape[0]} responden")
 
@@ -59,7 +103,7 @@ st.write(f"Jumlah data setelah filter: {df.shape[0]} responden")
 # ==============================
 target_option = st.radio(
     "Pilih variabel target untuk menghitung *Importance*:",
-    options=["SAT", "NPS"],
+    options=IPA_TARGETS,
     format_func=lambda x: "Satisfaction (SAT)" if x == "SAT" else "Net Promoter Score (NPS)",
     horizontal=True
 )
@@ -67,15 +111,7 @@ target_option = st.radio(
 # ==============================
 # DEFINISI VARIABEL
 # ==============================
-independent_vars = [
-    'KD0', 'KD1', 'KD2', 'KD3', 'KE0', 'KE1', 'KE2', 'KE3',
-    'KI0', 'KI1', 'KI2', 'KI3', 'KI4', 'KI5',
-    'KR0', 'KR1', 'KR2', 'KR3', 'KR4', 'KR5',
-    'PR0', 'PR1', 'PR2',
-    'TU0', 'TU1', 'TU2', 'TU3'
-]
-if selected_year in ["2024", "2023"]:
-    independent_vars.remove("TU3")
+independent_vars = ipa_items(selected_year)
 
 # ==============================
 # FILTER DATA
@@ -84,138 +120,152 @@ if target_option not in df.columns:
     st.error(f"Kolom '{target_option}' tidak ditemukan di dataset.")
     st.stop()
 
-df = df.dropna(subset=[target_option] + independent_vars)
-if df.empty:
-    st.warning("Tidak ada data yang memenuhi filter saat ini.")
-    st.stop()
-
 # ==============================
-# IMPORTANCE–PERFORMANCE ANALYSIS
+# IMPORTANCE METHOD
 # ==============================
-performance_mean = df[independent_vars].mean()  # Performance tetap mean item
-importance_mean = performance_mean  # Just to keep naming consistent
-
-# Standardisasi dan regresi
-scaler = StandardScaler()
-X = scaler.fit_transform(df[independent_vars])
-y = scaler.fit_transform(df[[target_option]]).flatten()
-
-model = LinearRegression()
-model.fit(X, y)
-
-# Importance = standardized beta coefficient
-importance_values = model.coef_
-
-# Construct result dataframe
-correlation_df = pd.DataFrame({
-    'Factor': independent_vars,
-    'Importance': [round(beta, 3) for beta in importance_values],
-    'Performance': [round(beta, 3) for beta in performance_mean.values]
-})
-
-# Midpoints
-importance_min, importance_max = correlation_df['Importance'].min(), correlation_df['Importance'].max()
-performance_min, performance_max = correlation_df['Performance'].min(), correlation_df['Performance'].max()
-importance_midpoint = (importance_max + importance_min) / 2
-performance_midpoint = (performance_max + performance_min) / 2
+importance_method = st.radio(
+    "Metode *Importance*:",
+    options=list(IMPORTANCE_METHODS.keys()),
+    format_func=lambda x: IMPORTANCE_METHODS[x],
+    horizontal=True,
+    help="Ridge dan Relative Weights lebih stabil jika item saling berkorelasi tinggi."
+)
+ridge_alpha = IPA_RIDGE_ALPHA
+if importance_method == 'ridge':
+    ridge_alpha = st.slider("Ridge alpha:", min_value=0.01, max_value=5.0, value=IPA_RIDGE_ALPHA, step=0.01)
+
+missing_mode = st.radio(
+    "Penanganan jawaban kosong:",
+    options=list(MISSING_MODES.keys()),
+    format_func=lambda x: MISSING_MODES[x],
+    horizontal=True,
+    help="Pairwise memakai semua responden yang menjawab tiap pasangan item; Listwise membuang responden dengan jawaban kosong."
+)
 
 # ==============================
-# KATEGORI QUADRANT
+# IMPORTANCE–PERFORMANCE ANALYSIS
 # ==============================
-def classify_factor_dynamic(importance, performance, imp_mid, perf_mid):
-    if importance > imp_mid and performance > perf_mid:
-        return 'Leverage'
-    elif importance > imp_mid and performance <= perf_mid:
-        return 'Improve'
-    elif importance <= imp_mid and performance > perf_mid:
-        return 'Nice to have'
-    else:
-        return 'Low priority'
+# Importance dihitung dari matriks korelasi (di-cache per tahun, target dan filter)
+with timed('aggregate'):
+    correlation_df, n_complete = shared_result(
+        'ipa.importance', view, compute_importance, df, selected_year, target_option, independent_vars,
+        method=importance_method, alpha=ridge_alpha, missing=missing_mode, persist=True
+    )
+if n_complete == 0:
+    st.warning("Tidak ada data yang memenuhi filter saat ini.")
+    st.stop()
+st.write(
+    f"Responden dengan jawaban {target_option}: {n_complete}; "
+    f"N efektif per item: {correlation_df['N'].min()}–{correlation_df['N'].max()}"
+)
 
-correlation_df['Category'] = [
-    classify_factor_dynamic(row['Importance'], row['Performance'], importance_midpoint, performance_midpoint)
-    for _, row in correlation_df.iterrows()
-]
+# Midpoints & kategori kuadran
+with timed('aggregate'):
+    correlation_df, importance_midpoint, performance_midpoint = ipa_quadrants(correlation_df)
 
 # ==============================
 # SCATTER PLOT
 # ==============================
 st.subheader(f"GRAFIK IPA {selected_year} (Target: {target_option})")
 
-fig, ax = plt.subplots(figsize=(10, 6))
-color_map = {
-    'Leverage': '#2ca02c',
-    'Improve': '#d62728',
-    'Nice to have': '#1f77b4',
-    'Low priority': '#ff7f0e'
-}
-
-for category, data in correlation_df.groupby('Category'):
-    ax.scatter(data['Performance'], data['Importance'],
-               label=category, color=color_map.get(category, 'gray'),
-               s=100, alpha=0.8)
-
-# Label faktor
-for i, row in correlation_df.iterrows():
-    ax.text(row['Performance'] + 0.01, row['Importance'], row['Factor'], fontsize=9, ha='left', va='bottom')
-
-# Garis tengah
-ax.axhline(y=importance_midpoint, color='green', linestyle='--', label="Importance Midpoint")
-ax.axvline(x=performance_midpoint, color='red', linestyle='--', label="Performance Midpoint")
-
-# Label dan style
-ax.set_xlabel('Performance (Mean of Items)', fontsize=12, labelpad=10)
-ax.set_ylabel(f'Importance (Standardized Beta vs {target_option})', fontsize=12, labelpad=10)
-ax.set_title(f'Importance–Performance Analysis (Target: {target_option})', fontsize=16, pad=20)
-ax.grid(True, linestyle='--', alpha=0.5)
-ax.xaxis.set_major_formatter(FormatStrFormatter('%.2f'))
-ax.yaxis.set_major_formatter(FormatStrFormatter('%.2f'))
-
-plt.tight_layout()
-st.pyplot(fig)
+with timed('render'):
+    fig = cached_figure(
+        ipa_scatter_figure, correlation_df[['Factor', 'Performance', 'Importance', 'Category']],
+        importance_midpoint, performance_midpoint, IMPORTANCE_METHODS[importance_method], target_option
+    )
+    st.plotly_chart(fig, use_container_width=True)
 
 # ==============================
 # TABEL HASIL IPA
 # ==============================
-label_mapping = {
-    'KD1': 'Kejelasan ekspektasi kerja (KD1)',
-    'KD2': 'Dukungan kebutuhan kerja (KD2)',
-    'KD3': 'Komitmen kesejahteraan (KD3)',
-    'KD0': 'Pemenuhan kebutuhan dasar (KD0)',
-    'KE1': 'Keinginan bertahan (KE1)',
-    'KE2': 'Motivasi menjaga perusahaan (KE2)',
-    'KE3': 'Rasa bangga (KE3)',
-    'KE0': 'Keterlekatan emosional (KE0)',
-    'KI1': 'Kesempatan menunjukkan kemampuan (KI1)',
-    'KI2': 'Pengakuan hasil kerja (KI2)',
-    'KI3': 'Otonomi dalam bekerja (KI3)',
-    'KI4': 'Rasa dihargai (KI4)',
-    'KI5': 'Dukungan untuk berkembang (KI5)',
-    'KI0': 'Fasilitasi kontribusi individu (KI0)',
-    'PR1': 'Bimbingan untuk bertumbuh (PR1)',
-    'PR2': 'Kesempatan pengembangan karir (PR2)',
-    'PR0': 'Tempat bertumbuh ideal (PR0)',
-    'KR1': 'Rasa keadilan (KR1)',
-    'KR2': 'Penghargaan atas pendapat (KR2)',
-    'KR3': 'Rasa berharga pekerjaannya (KR3)',
-    'KR4': 'Komitmen rekan kerja (KR4)',
-    'KR5': 'Hubungan pertemanan (KR5)',
-    'KR0': 'Kolaborasi yang baik (KR0)',
-    'TU1': 'Keselarasan tujuan (TU1)',
-    'TU2': 'Keterikatan dengan tujuan perusahaan (TU2)',
-    'TU3': 'Penerapan nilai perusahaan (TU3)',
-    'TU0': 'Menemukan tujuan hidup (TU0)',
-}
-
-correlation_df['Factor'] = correlation_df['Factor'].replace(label_mapping)
-
-midpoint_row = pd.DataFrame({
-    'Factor': ['Midpoint'],
-    'Importance': [round(importance_midpoint, 3)],
-    'Performance': [round(performance_midpoint, 3)],
-    'Category': ['-']
-})
-correlation_df = pd.concat([correlation_df, midpoint_row], ignore_index=True)
+with timed('aggregate'):
+    correlation_df = ipa_result_table(correlation_df, importance_midpoint, performance_midpoint)
 
 st.markdown(f"##### Tabel hasil IPA {selected_year} (Target: {target_option})")
 st.dataframe(correlation_df, use_container_width=True)
+
+# ==============================
+# STABILITAS KUADRAN (BOOTSTRAP)
+# ==============================
+st.markdown(f"##### Stabilitas kuadran {selected_year} (Bootstrap)")
+run_bootstrap = st.checkbox(
+    "Hitung probabilitas kuadran dengan bootstrap",
+    value=False,
+    help="Regresi diulang pada sampel bootstrap untuk melihat seberapa stabil kategori tiap item."
+)
+
+if run_bootstrap:
+    n_boot = st.select_slider("Jumlah replikasi bootstrap (B):", options=[100, 200, 500, 1000], value=200)
+    with timed('aggregate'), st.spinner("Menghitung bootstrap..."):
+        bootstrap_df = shared_result(
+            'ipa.bootstrap', view, bootstrap_quadrants, df, selected_year, target_option, independent_vars,
+            method=importance_method, alpha=ridge_alpha, missing=missing_mode, n_boot=n_boot, run=run_job, persist=True
+        )
+    st.dataframe(with_item_labels(bootstrap_df), use_container_width=True, hide_index=True)
+
+# ==============================
+# IPA PER KELOMPOK (BATCH)
+# ==============================
+st.markdown(f"##### IPA per kelompok {selected_year} (Target: {target_option})")
+run_group_ipa = st.checkbox("Hitung IPA untuk setiap kelompok sekaligus", value=False)
+
+if run_group_ipa:
+    group_col = st.selectbox(
+        "Kelompokkan berdasarkan:",
+        options=columns_list,
+        index=columns_list.index('subunit'),
+        format_func=lambda x: x.capitalize()
+    )
+    with timed('aggregate'):
+        group_df, skipped_groups = shared_result(
+            'ipa.groups', view, compute_group_importance, df, selected_year, target_option, independent_vars,
+            group_col=group_col, method=importance_method, alpha=ridge_alpha, missing=missing_mode, persist=True
+        )
+
+    if skipped_groups:
+        st.write(
+            f"Disclaimer: {len(skipped_groups)} kelompok tidak dihitung karena jumlah responden "
+            f"kurang dari {len(independent_vars) + 1}."
+        )
+
+    if group_df.empty:
+        st.info("Tidak ada kelompok dengan data yang cukup.")
+    else:
+        # Item mana yang masuk 'Improve' di banyak kelompok
+        st.dataframe(improve_summary(group_df), use_container_width=True, hide_index=True)
+
+        # Small multiples only for the chosen groups (default: the largest); the table lists all
+        group_sizes = group_df.groupby('Group')['N'].max().sort_values(ascending=False)
+        charted_groups = st.multiselect(
+            "Kelompok yang ditampilkan di grafik:",
+            options=group_sizes.index.tolist(),
+            default=group_sizes.index[:GROUP_CHART_LIMIT].tolist(),
+            help=f"Secara default {GROUP_CHART_LIMIT} kelompok dengan responden terbanyak; tabel di bawah memuat semua kelompok."
+        )
+
+        if charted_groups:
+            with timed('render'):
+                chart_df = group_df[group_df['Group'].isin(charted_groups)]
+                n_rows = (len(charted_groups) + 2) // 3
+                fig_groups = px.scatter(
+                    chart_df,
+                    x='Performance',
+                    y='Importance',
+                    color='Category',
+                    text='Factor',
+                    facet_col='Group',
+                    facet_col_wrap=3,
+                    # Plotly menolak spacing > 1/(rows-1)
+                    facet_row_spacing=min(0.07, 0.5 / max(n_rows - 1, 1)),
+                    category_orders={'Group': charted_groups},
+                    color_discrete_map=IPA_COLORS,
+                    hover_data=['N'],
+                    height=max(350, 300 * n_rows)
+                )
+                fig_groups.update_traces(textposition='top right', textfont_size=8)
+                fig_groups.for_each_annotation(lambda a: a.update(text=a.text.split('=', 1)[-1]))
+                fig_groups.update_xaxes(matches=None, showticklabels=True)
+                fig_groups.update_yaxes(matches=None, showticklabels=True)
+                st.plotly_chart(fig_groups, use_container_width=True)
+
+        st.dataframe(with_item_labels(group_df), use_container_width=True, hide_index=True)
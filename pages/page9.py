@@ -0,0 +1,195 @@
+import os
+import resource
+import time
+import streamlit as st
+import pandas as pd
+from navigation import make_sidebar, is_admin
+from fetch_data import SHEETS, sheet_store
+from data_processing import (
+    finalize_data, participation_table, prepared_stats, data_version, refresh_data, refreshing, daily_store_stats
+)
+from charts import figure_cache_stats
+from result_cache import analytics_executor, frame_bytes, result_cache_stats
+from profiling import timed
+from warmup import start_warm_up
+
+st.set_page_config(page_title='Operations', page_icon='🛠️')
+make_sidebar()
+
+# ==============================
+# HELPERS
+# ==============================
+def age(ts):
+    """'42 s' / '13 min' / '5.2 h' since ts (None when never built)."""
+    if ts is None:
+        return None
+    seconds = time.time() - ts
+    if seconds < 120:
+        return f"{seconds:.0f} s"
+    if seconds < 7200:
+        return f"{seconds / 60:.0f} min"
+    return f"{seconds / 3600:.1f} h"
+
+def row(name, rows=None, nbytes=None, built_at=None, seconds=None, hits=None, misses=None, entries=None):
+    return {
+        'Dataset': name,
+        'Rows': rows,
+        'Entries': entries,
+        'Size (MB)': round(nbytes / 2**20, 2) if nbytes is not None else None,
+        'Age': age(built_at),
+        'Last refresh (s)': round(seconds, 2) if seconds is not None else None,
+        'Hits': hits,
+        'Misses': misses,
+    }
+
+def process_memory_mb():
+    """Current and peak resident memory of this process (current is Linux-only)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    try:
+        with open('/proc/self/statm') as f:
+            current = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except OSError:
+        current = None
+    return current, peak
+
+# ==============================
+# MAIN SECTION
+# ==============================
+if not is_admin():
+    st.error("This page is only available to administrators.")
+    st.stop()
+
+st.header('Operations', divider='rainbow')
+
+with timed('load'):
+    frames = finalize_data()
+
+# ==============================
+# CACHED DATASETS
+# ==============================
+with timed('aggregate'):
+    rows = []
+    for info in sheet_store().info():
+        frame = info['frame']
+        rows.append(row(
+            f"Sheet: {info['name']}",
+            rows=len(frame) if frame is not None else None,
+            nbytes=frame_bytes(frame) if frame is not None else None,
+            built_at=info['fetched_at'], seconds=info['refresh_seconds'],
+            hits=info['hits'], misses=info['misses'],
+        ))
+
+    # The four prepared frames share one cache entry per data version
+    stats = prepared_stats()
+    frame_stats = stats['frames']
+    for title, frame in zip(SHEETS, frames):
+        rows.append(row(
+            f"Prepared: {title}", rows=len(frame), nbytes=frame_bytes(frame),
+            built_at=frame_stats.built_at, seconds=frame_stats.build_seconds, **frame_stats.counts(),
+        ))
+
+    participation = stats['participation']
+    table = participation_table() if participation.built_at is not None else None
+    rows.append(row(
+        "Participation table",
+        rows=len(table) if table is not None else None,
+        nbytes=frame_bytes(table) if table is not None else None,
+        built_at=participation.built_at, seconds=participation.build_seconds, **participation.counts(),
+    ))
+
+    daily = daily_store_stats()
+    rows.append(row("Daily response curves", rows=daily['rows'], nbytes=daily['bytes'], entries=daily['entries']))
+
+    figures = figure_cache_stats()
+    rows.append(row("Figure cache", entries=figures['entries'], hits=figures['hits'], misses=figures['misses']))
+
+    results = analytics_executor().stats()
+    rows.append(row("Analytics results", entries=results['entries'], hits=results['hits'], misses=results['misses']))
+
+    shared = result_cache_stats()
+    rows.append(row(
+        "Shared page results", nbytes=shared['bytes'], entries=shared['entries'],
+        hits=shared['hits'], misses=shared['misses'],
+    ))
+    if shared['disk'] is not None:
+        disk = shared['disk']
+        rows.append(row(
+            "Shared page results (disk)", nbytes=disk['bytes'], entries=disk['entries'],
+            hits=disk['hits'], misses=disk['misses'],
+        ))
+
+st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+st.caption(
+    f"Data version {data_version()}. Hits and misses count requests since the process started; "
+    "the IPA tables are counted with the shared page results below."
+)
+
+st.markdown("##### Shared page results")
+st.caption(
+    f"{shared['bytes'] / 2**20:.1f} of {shared['max_bytes'] / 2**20:.0f} MB (ES_RESULT_CACHE_MB), "
+    f"{shared['evictions']} evicted, hit rate {shared['hit_rate']:.0%}. "
+    + (f"On disk: {shared['disk']['bytes'] / 2**20:.1f} of {shared['disk']['max_bytes'] / 2**20:.0f} MB "
+       f"(ES_RESULT_CACHE_DISK_MB), {shared['disk']['evictions']} evicted since start."
+       if shared['disk'] is not None else "Not kept on disk (ES_RESULT_CACHE_DIR is not set).")
+)
+if shared['computations']:
+    st.dataframe(
+        pd.DataFrame([
+            {'Computation': name, 'Hits': c['hits'], 'Misses': c['misses'], 'Hit rate (%)': round(c['hit_rate'] * 100, 1)}
+            for name, c in shared['computations'].items()
+        ]),
+        hide_index=True, use_container_width=True,
+    )
+
+warm_up = start_warm_up()
+st.markdown("##### Warm-up")
+st.caption(
+    f"{warm_up.state.capitalize()}: {warm_up.warmed} of {warm_up.scopes} credential scopes warmed"
+    + (f" in {warm_up.seconds:.1f} s" if warm_up.seconds is not None else "")
+    + (f", started {age(warm_up.started_at)} ago" if warm_up.started_at is not None else "")
+    + ". Set ES_WARM_UP=0 to turn it off."
+)
+if warm_up.error:
+    st.error(f"Warm-up failed: {warm_up.error}")
+if warm_up.failed:
+    st.dataframe(
+        pd.DataFrame(warm_up.failed, columns=['View', 'Units', 'Error']), hide_index=True, use_container_width=True
+    )
+
+current, peak = process_memory_mb()
+col1, col2 = st.columns(2)
+col1.metric("Process memory", f"{current:,.0f} MB" if current is not None else "–")
+col2.metric("Peak memory", f"{peak:,.0f} MB")
+
+# ==============================
+# REFRESH
+# ==============================
+st.subheader('Refresh sheets')
+
+store = sheet_store()
+if os.environ.get('ES_SHARED_DATA'):
+    st.info(
+        f"The frames are published by serve_workers.py in {os.environ['ES_SHARED_DATA']}; "
+        "restart it (without --reuse) to publish the sheets again."
+    )
+else:
+    st.caption(
+        "The sheet is fetched and the prepared frames are rebuilt in the background; "
+        "sessions keep the current data until the new version is ready."
+    )
+    busy = refreshing()
+    cols = st.columns(len(SHEETS) + 1)
+    requested = None
+    for col, title in zip(cols, SHEETS):
+        if col.button(title, key=f"refresh_{title}", disabled=busy, use_container_width=True):
+            requested = [title]
+    if cols[-1].button("All sheets", key="refresh_all", disabled=busy, use_container_width=True):
+        requested = list(SHEETS)
+
+    if requested and refresh_data(requested):
+        busy = True
+    if busy:
+        st.info(f"Refreshing {', '.join(store.refreshing)}…")
+        st.button("Update status")
+    if store.error:
+        st.error(f"Last refresh failed: {store.error}")
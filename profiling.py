@@ -0,0 +1,346 @@
+import cProfile
+import glob
+import hashlib
+import json
+import os
+import threading
+import time
+import tracemalloc
+import weakref
+from contextlib import ContextDecorator
+from time import perf_counter
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from telemetry import record, telemetry_enabled
+
+# ==============================
+# RERUN TIMINGS
+# ==============================
+# Pages wrap their steps in timed('load' / 'scope' / 'filter' / 'aggregate' /
+# 'render'). With ES_PROFILE=1, or the admin "Show rerun timings" toggle in the
+# sidebar, make_sidebar starts a RerunTimings for the rerun and every section
+# adds its wall time to it; a collapsible table at the top of the page shows
+# the breakdown. With ES_TELEMETRY_DB the timings are kept without the table
+# and written to the telemetry store when the rerun ends. Otherwise no timings
+# object exists and timed() does a single thread-local lookup.
+#
+# Streamlit runs each session's script in its own thread, so the current
+# rerun is kept in a threading.local.
+
+PROFILE_ENV = 'ES_PROFILE'
+
+_current = threading.local()
+
+
+class RerunTimings:
+    """Wall time per stage of one page rerun."""
+
+    def __init__(self, page, placeholder=None):
+        self.page = page
+        self.placeholder = placeholder
+        self.started_at = time.time()
+        self.started = perf_counter()
+        self.stages = {}
+        self._open = []
+
+    def enter(self, stage):
+        self._open.append((stage, perf_counter()))
+
+    def exit(self):
+        stage, start = self._open.pop()
+        seconds, calls = self.stages.get(stage, (0.0, 0))
+        self.stages[stage] = (seconds + perf_counter() - start, calls + 1)
+        if not self._open:
+            self.show()
+
+    def elapsed(self):
+        return perf_counter() - self.started
+
+    def table(self):
+        """Stage, calls, milliseconds and share of the rerun so far, in first-use order."""
+        total = self.elapsed()
+        return [
+            {'Stage': stage, 'Calls': calls, 'ms': round(seconds * 1000, 1),
+             '% of rerun': round(seconds / total * 100, 1) if total else 0.0}
+            for stage, (seconds, calls) in self.stages.items()
+        ]
+
+    def show(self):
+        # Redrawn after every top-level section, so it stays current if the page st.stop()s
+        if self.placeholder is None:
+            return
+        with self.placeholder.container():
+            with st.expander("⏱️ Rerun timings", expanded=False):
+                st.caption(f"{self.page}: {self.elapsed() * 1000:.0f} ms since the page started")
+                st.dataframe(self.table(), hide_index=True, use_container_width=True)
+
+
+def profiling_enabled():
+    """ES_PROFILE is set (and not '0')."""
+    return os.environ.get(PROFILE_ENV, '') not in ('', '0')
+
+
+def start_rerun(page, enabled=False):
+    """Begin a page rerun (called by make_sidebar); returns the RerunTimings or None.
+
+    The timings table is shown when enabled (the admin toggle) or ES_PROFILE
+    is set; ES_TELEMETRY_DB keeps timings without showing them. With
+    ES_PROFILE_DIR set the rerun is also profiled (see RerunProfile).
+    """
+    # A rerun requested while the script was running reuses its thread
+    finish_rerun()
+    tags = _current.tags = {}
+    _current.scoped = set()
+    show = enabled or profiling_enabled()
+    telemetry = telemetry_enabled()
+    timings = RerunTimings(page, st.empty() if show else None) if show or telemetry else None
+    _current.timings = timings
+
+    directory = os.environ.get(PROFILE_DIR_ENV)
+    if directory or telemetry:
+        ctx = get_script_run_ctx()
+        session = session_hash(ctx.session_id) if ctx else None
+        profile = None
+        if directory:
+            keep = int(os.environ.get(PROFILE_KEEP_ENV, PROFILE_KEEP))
+            profile = RerunProfile(page, directory, keep, session)
+        # Streamlit has no end-of-script hook: the guard lives only in this
+        # thread's locals, so its finalizer runs when the script thread exits
+        _current.rerun_guard = guard = _ThreadGuard()
+        _current.rerun_done = weakref.finalize(guard, _end_rerun, page, session, timings, tags, profile)
+    return timings
+
+
+def finish_rerun():
+    """Record and dump the rerun running in this thread now, if it is being recorded."""
+    done = getattr(_current, 'rerun_done', None)
+    if done is not None:
+        _current.rerun_done = None
+        done()
+
+
+def _end_rerun(page, session, timings, tags, profile):
+    # Telemetry first, so the wall time does not include writing the profile
+    if timings is not None and telemetry_enabled():
+        record(
+            'rerun', page, timings.elapsed() * 1000, started=timings.started_at, session=session,
+            rows=tags.get('scope_rows'), cache_hits=tags.get('cache_hits', 0),
+            cache_misses=tags.get('cache_misses', 0),
+            stages={stage: round(seconds * 1000, 3) for stage, (seconds, _) in timings.stages.items()},
+            detail={'scope_units': tags.get('scope_units'), 'filters': len(tags.get('filters') or {})},
+        )
+    if profile is not None:
+        profile.finish(tags)
+
+
+class _ThreadGuard:
+    pass
+
+
+def tag(**fields):
+    """Describe the running rerun (scope size, filters, ...) for its profile and telemetry."""
+    tags = getattr(_current, 'tags', None)
+    if tags is not None:
+        tags.update(fields)
+
+
+def tally(**counts):
+    """Add to numeric tags of the running rerun (rows in scope, cache hits, ...)."""
+    tags = getattr(_current, 'tags', None)
+    if tags is not None:
+        for key, n in counts.items():
+            tags[key] = tags.get(key, 0) + n
+
+
+def count_scope(frame, rows):
+    """Add the user's rows of a shared frame to scope_rows, once per frame and rerun."""
+    scoped = getattr(_current, 'scoped', None)
+    if scoped is not None and id(frame) not in scoped:
+        scoped.add(id(frame))
+        tally(scope_rows=rows)
+
+
+def current_timings():
+    """RerunTimings of the rerun running in this thread, or None when timing is off."""
+    return getattr(_current, 'timings', None)
+
+
+class timed(ContextDecorator):
+    """Add the wall time of a block (or of each call of a decorated function) to `stage`.
+
+        with timed('aggregate'):
+            table = nps_comparison(df, column)
+
+    Sections with the same stage name add up; nested sections are timed too.
+    Does nothing unless timing is enabled for the current rerun.
+    """
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        timings = getattr(_current, 'timings', None)
+        if timings is not None:
+            timings.enter(self.stage)
+        return self
+
+    def __exit__(self, *exc):
+        timings = getattr(_current, 'timings', None)
+        if timings is not None:
+            timings.exit()
+        return False
+
+
+# ==============================
+# RERUN PROFILES
+# ==============================
+# With ES_PROFILE_DIR=/some/dir every page rerun runs under cProfile and
+# tracemalloc from make_sidebar to the end of the script, so the profile
+# includes finalize_data and, on a cold cache, the fetch functions. The
+# profile is closed when the script thread exits, or by the next start_rerun
+# when a rerun reuses the thread (see start_rerun).
+#
+# Each rerun writes <stamp>-<pid>-<page>.prof (pstats; open with snakeviz or
+# `python -m pstats`) and a .json next to it. The .json holds the page, the
+# session hash, the wall time, the tags (scope_units, filters), the traced
+# memory and the ten lines holding the most memory at the end. Only the
+# newest ES_PROFILE_KEEP reruns (default 200) are kept. tracemalloc is
+# process-wide, so the memory figures include concurrent sessions. Work done
+# in the analytics process pool does not appear in the profile.
+
+PROFILE_DIR_ENV = 'ES_PROFILE_DIR'
+PROFILE_KEEP_ENV = 'ES_PROFILE_KEEP'
+PROFILE_KEEP = 200
+
+# Bookkeeping of tracemalloc and the import system, not the page
+_SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '*/linecache.py'),
+)
+
+_trace_lock = threading.Lock()
+_tracers = 0
+_own_tracing = False
+
+
+def _trace_acquire():
+    global _tracers, _own_tracing
+    with _trace_lock:
+        if _tracers == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _own_tracing = True
+        _tracers += 1
+        tracemalloc.reset_peak()
+
+
+def _trace_release():
+    global _tracers, _own_tracing
+    with _trace_lock:
+        _tracers -= 1
+        if _tracers == 0 and _own_tracing:
+            tracemalloc.stop()
+            _own_tracing = False
+
+
+class RerunProfile:
+    """cProfile + tracemalloc for one rerun, dumped to a rotating directory."""
+
+    def __init__(self, page, directory, keep=PROFILE_KEEP, session=None):
+        self.page = page
+        self.directory = directory
+        self.keep = keep
+        self.session = session
+        self.profiler = cProfile.Profile()
+        _trace_acquire()
+        self.memory_start = tracemalloc.get_traced_memory()[0]
+        self.started_at = time.time()
+        self.started = perf_counter()
+        self.profiler.enable()
+
+    def finish(self, tags):
+        self.profiler.disable()
+        wall = perf_counter() - self.started
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+        top = snapshot.statistics('lineno')[:10]
+        _trace_release()
+
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(self.started_at))
+        base = os.path.join(
+            self.directory, f"{stamp}.{int(self.started_at * 1000) % 1000:03d}-{os.getpid()}-{self.page}"
+        )
+        self.profiler.dump_stats(base + '.prof')
+        meta = {
+            'page': self.page,
+            'session': self.session,
+            'started': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started_at)),
+            'wall_ms': round(wall * 1000, 1),
+            'tags': tags,
+            'traced_mb': {
+                'start': round(self.memory_start / 2**20, 1),
+                'end': round(current / 2**20, 1),
+                'peak': round(peak / 2**20, 1),
+            },
+            'top_retained': [
+                {'where': f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                 'kb': round(stat.size / 1024, 1), 'blocks': stat.count}
+                for stat in top
+            ],
+        }
+        with open(base + '.json', 'w') as f:
+            json.dump(meta, f, indent=1, default=str)
+        rotate_profiles(self.directory, self.keep)
+
+
+def session_hash(session_id):
+    """Short stable hash of a session id (ids are not written out as is)."""
+    return hashlib.blake2b(str(session_id).encode(), digest_size=4).hexdigest()
+
+
+def rotate_profiles(directory, keep):
+    """Delete all but the newest `keep` rerun dumps (.json and .prof pairs) in directory."""
+    dumps = sorted(glob.glob(os.path.join(directory, '*.json')))
+    for meta in dumps[:max(len(dumps) - keep, 0)]:
+        for path in (meta, meta[:-len('.json')] + '.prof'):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+# ==============================
+# CACHE STATS
+# ==============================
+class CacheStats:
+    """Hit/miss counts and the last build of one process-wide cached dataset.
+
+    A miss is a request that had to build the value; a rebuild is a
+    background refresh that replaced it without a request waiting.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.misses = 0
+        self.built_at = None
+        self.build_seconds = None
+
+    def request(self):
+        with self.lock:
+            self.requests += 1
+
+    def miss(self, seconds):
+        with self.lock:
+            self.misses += 1
+            self.built_at, self.build_seconds = time.time(), seconds
+
+    def rebuilt(self, seconds):
+        with self.lock:
+            self.built_at, self.build_seconds = time.time(), seconds
+
+    def counts(self):
+        with self.lock:
+            return {'hits': self.requests - self.misses, 'misses': self.misses}
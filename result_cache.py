@@ -0,0 +1,421 @@
+import functools
+import glob
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import streamlit as st
+from analytics.executor import AnalyticsExecutor
+from profiling import tally
+
+# ==============================
+# SHARED RESULT CACHE
+# ==============================
+# Users with the same subunits who open the same view ask for the same
+# aggregate tables. shared_result keeps page results in one process-wide LRU
+# keyed by (data version, the view's FilterSpec key, computation id, the
+# other arguments), so a repeated view is a dict lookup instead of a groupby.
+#
+# The frame arguments (DataFrames, row masks, dicts of them) are not hashed
+# by content, only by their columns and length: their rows must follow from
+# the data version and the FilterSpec. Anything else
+# that changes them (selected year, a page toggle) goes into depends_on. The
+# data version is read from df.attrs['data_version'] of the frame arguments,
+# so a session still holding the frames of an older version never stores its
+# results under the new one; without it the result is computed, not cached.
+#
+# ES_RESULT_CACHE_MB sets the memory budget (default 256); the least recently
+# used results are dropped to stay under it. Results are shared between
+# sessions: do not modify them, copy first.
+#
+# With ES_RESULT_CACHE_DIR set, results requested with persist=True (model
+# fits, correlation matrices, demographic tables) are also pickled to that
+# directory, so they survive a restart (see PERSISTENT RESULTS below).
+
+RESULT_CACHE_MB = 256
+RESULT_CACHE_DISK_MB = 1024
+
+
+def result_bytes(obj):
+    """Approximate memory of a result: frames, arrays and the containers holding them."""
+    if isinstance(obj, pd.DataFrame):
+        return frame_bytes(obj)
+    if isinstance(obj, pd.Series):
+        return frame_bytes(obj.to_frame())
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(result_bytes(k) + result_bytes(v) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set)):
+        return sys.getsizeof(obj) + sum(result_bytes(v) for v in obj)
+    return sys.getsizeof(obj)
+
+
+def frame_bytes(df):
+    """Bytes of df including the strings in object columns (like memory_usage(deep=True))."""
+    total = df.index.memory_usage(deep=True)
+    for _, col in df.items():
+        try:
+            total += col.memory_usage(index=False, deep=True)
+        except ValueError:
+            # pandas cannot read the read-only object arrays of the frozen frames
+            values = col.to_numpy()
+            total += values.nbytes + sum(map(sys.getsizeof, values))
+    return int(total)
+
+
+class ResultCache:
+    """LRU of results bounded by their total size, with hit/miss counts per computation."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.results = OrderedDict()  # key -> (result, bytes)
+        self.bytes = 0
+        self.evictions = 0
+        self.counts = {}  # computation -> [hits, misses]
+
+    def get(self, key, computation):
+        with self.lock:
+            counts = self.counts.setdefault(computation, [0, 0])
+            entry = self.results.get(key)
+            if entry is None:
+                counts[1] += 1
+                return None
+            counts[0] += 1
+            self.results.move_to_end(key)
+            return entry
+
+    def put(self, key, result):
+        size = result_bytes(result)
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            old = self.results.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self.results[key] = (result, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, dropped) = self.results.popitem(last=False)
+                self.bytes -= dropped
+                self.evictions += 1
+
+    def stats(self):
+        """Totals and per-computation hits, misses and hit rate."""
+        with self.lock:
+            hits = sum(h for h, _ in self.counts.values())
+            misses = sum(m for _, m in self.counts.values())
+            return {
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+                'entries': len(self.results),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'evictions': self.evictions,
+                'computations': {
+                    name: {'hits': h, 'misses': m, 'hit_rate': h / (h + m) if h + m else 0.0}
+                    for name, (h, m) in sorted(self.counts.items())
+                },
+            }
+
+
+@st.cache_resource(show_spinner=False)
+def result_cache():
+    budget = float(os.environ.get('ES_RESULT_CACHE_MB', RESULT_CACHE_MB))
+    return ResultCache(int(budget * 2**20))
+
+
+# ==============================
+# PERSISTENT RESULTS
+# ==============================
+# The data version counts refreshes within one process and starts at 0
+# again after a restart, so disk entries are addressed by content instead:
+# the fingerprint of the prepared frames (df.attrs['data_fingerprint'], only
+# computed when ES_RESULT_CACHE_DIR is set) and the fingerprint of the app's
+# code, so a deploy with changed code does not read results of the old one.
+#
+# Each result is one pickle, <dir>/<key[:2]>/<key>.pkl, written to a temporary
+# file and renamed, so processes sharing the directory (serve_workers) never
+# read half a file. Nothing is loaded at start: a memory miss looks for the
+# file. ES_RESULT_CACHE_DISK_MB (default 1024) bounds the directory; the
+# files used least recently (by mtime, touched on every read) are deleted.
+
+
+class DiskCache:
+    """Size-bounded directory of pickled results, evicting the least recently used."""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.files = None  # path -> [bytes, mtime], scanned on first use
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f'{key}.pkl')
+
+    def _scan(self):
+        if self.files is None:
+            self.files = {}
+            for path in glob.glob(os.path.join(self.directory, '*', '*.pkl')):
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                self.files[path] = [stat.st_size, stat.st_mtime]
+            self.bytes = sum(size for size, _ in self.files.values())
+
+    def get(self, key):
+        """(result,) if key is on disk, else None."""
+        path = self._path(key)
+        found = False
+        try:
+            with open(path, 'rb') as f:
+                result = pickle.load(f)
+            found = True
+        except FileNotFoundError:
+            pass
+        except Exception:
+            # Truncated or written by an incompatible pandas: drop it and recompute
+            self._remove(path)
+        with self.lock:
+            self._scan()
+            if not found:
+                # Forget files deleted above or by another process
+                old = self.files.pop(path, None)
+                if old is not None:
+                    self.bytes -= old[0]
+                self.misses += 1
+                return None
+            self.hits += 1
+            try:
+                os.utime(path)
+                stat = os.stat(path)
+            except OSError:
+                pass  # evicted by another process meanwhile, or a read-only directory
+            else:
+                old = self.files.get(path)
+                self.bytes += stat.st_size - (old[0] if old else 0)
+                self.files[path] = [stat.st_size, stat.st_mtime]
+        return (result,)
+
+    def put(self, key, result):
+        data = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        tmp = None
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError:
+            # Disk full or not writable: the result is still served from memory
+            if tmp is not None:
+                self._remove(tmp)
+            return
+        with self.lock:
+            self._scan()
+            old = self.files.get(path)
+            if old is not None:
+                self.bytes -= old[0]
+            self.files[path] = [len(data), os.path.getmtime(path)]
+            self.bytes += len(data)
+            while self.bytes > self.max_bytes and self.files:
+                oldest = min(self.files, key=lambda p: self.files[p][1])
+                self.bytes -= self.files.pop(oldest)[0]
+                self.evictions += 1
+                self._remove(oldest)
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def stats(self):
+        with self.lock:
+            self._scan()
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self.files),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'evictions': self.evictions,
+            }
+
+
+def persistent_results_enabled():
+    return bool(os.environ.get('ES_RESULT_CACHE_DIR'))
+
+
+@st.cache_resource(show_spinner=False)
+def disk_cache():
+    """The DiskCache of ES_RESULT_CACHE_DIR, or None when it is not set."""
+    if not persistent_results_enabled():
+        return None
+    budget = float(os.environ.get('ES_RESULT_CACHE_DISK_MB', RESULT_CACHE_DISK_MB))
+    return DiskCache(os.environ['ES_RESULT_CACHE_DIR'], int(budget * 2**20))
+
+
+def frames_fingerprint(frames):
+    """Content hash of the prepared frames (values, index, columns and dtypes)."""
+    h = hashlib.blake2b(digest_size=16)
+    for df in frames:
+        h.update(repr([(col, str(dtype)) for col, dtype in df.dtypes.items()]).encode())
+        h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+@functools.lru_cache(maxsize=1)
+def code_version():
+    """Hash of the app's Python sources and the pandas/NumPy versions (pickles depend on them)."""
+    root = os.path.dirname(os.path.abspath(__file__))
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f'{pd.__version__} {np.__version__}'.encode())
+    for pattern in ('*.py', 'analytics/*.py', 'pages/*.py'):
+        for path in sorted(glob.glob(os.path.join(root, pattern))):
+            h.update(os.path.relpath(path, root).encode())
+            with open(path, 'rb') as f:
+                h.update(f.read())
+    return h.hexdigest()
+
+
+# ==============================
+# SHARED RESULTS
+# ==============================
+def _is_frame_data(arg):
+    if isinstance(arg, (pd.DataFrame, pd.Series, np.ndarray)):
+        return True
+    return isinstance(arg, dict) and bool(arg) and all(_is_frame_data(v) for v in arg.values())
+
+
+def _frames_attr(args, name):
+    """df.attrs[name] shared by the frame arguments, or None if missing or mixed.
+
+    Empty frames built by the page (e.g. a year hidden for confidentiality) carry no attrs and are skipped.
+    """
+    values = set()
+    for arg in args:
+        items = arg.values() if isinstance(arg, dict) else [arg]
+        for value in items:
+            if isinstance(value, pd.DataFrame) and not (value.empty and name not in value.attrs):
+                values.add(value.attrs.get(name))
+    return values.pop() if len(values) == 1 else None
+
+
+def _frame_shape(arg):
+    """Columns and length of a frame argument (its contents follow from the version and spec)."""
+    if isinstance(arg, dict):
+        return {k: _frame_shape(v) for k, v in arg.items()}
+    if isinstance(arg, pd.DataFrame):
+        return 'frame', tuple(arg.columns), len(arg)
+    if isinstance(arg, pd.Series):
+        return 'series', arg.name, len(arg)
+    return 'array', arg.shape, arg.dtype.str
+
+
+def result_key(version, spec, computation, args, kwargs, depends_on):
+    """Hash of everything a shared result depends on (frame arguments by columns and length only)."""
+    plain = [_frame_shape(a) if _is_frame_data(a) else a for a in args]
+    plain_kwargs = sorted((k, _frame_shape(v) if _is_frame_data(v) else v) for k, v in kwargs.items())
+    h = hashlib.blake2b(digest_size=16)
+    h.update(pickle.dumps((version, spec.key(), computation, plain, plain_kwargs, tuple(depends_on))))
+    return h.hexdigest()
+
+
+_computing = threading.local()  # depth of shared_result computations on this thread
+
+
+def shared_result(computation, spec, fn, *args, depends_on=(), persist=False, **kwargs):
+    """fn(*args, **kwargs), shared between sessions viewing the same scope and filters.
+
+        nps_df, results, removed = shared_result('nps.by_year', spec, nps_by_year, filtered_data)
+
+    computation names the page computation (the same name must always mean
+    the same fn on the same kind of input); spec is the FilterSpec of the
+    rows the frame arguments hold, so users with the same subunits and
+    filters share the result. persist=True also keeps the result on disk
+    when ES_RESULT_CACHE_DIR is set. run_job calls made by fn skip the
+    analytics executor's own result LRU: this cache is the only copy.
+    """
+    frame_args = args + tuple(kwargs.values())
+    version = _frames_attr(frame_args, 'data_version')
+    if version is None:
+        return fn(*args, **kwargs)
+    cache = result_cache()
+    key = result_key(version, spec, computation, args, kwargs, depends_on)
+    entry = cache.get(key, computation)
+    if entry is not None:
+        tally(cache_hits=1)
+        return entry[0]
+
+    disk, disk_key = disk_cache() if persist else None, None
+    fingerprint = _frames_attr(frame_args, 'data_fingerprint') if disk is not None else None
+    if fingerprint is not None:
+        disk_key = result_key((fingerprint, code_version()), spec, computation, args, kwargs, depends_on)
+        stored = disk.get(disk_key)
+        if stored is not None:
+            tally(cache_hits=1)
+            cache.put(key, stored[0])
+            return stored[0]
+
+    tally(cache_misses=1)
+    _computing.depth = getattr(_computing, 'depth', 0) + 1
+    try:
+        result = fn(*args, **kwargs)
+    finally:
+        _computing.depth -= 1
+    cache.put(key, result)
+    if disk_key is not None:
+        disk.put(disk_key, result)
+    return result
+
+
+def result_cache_stats():
+    """Hit/miss counters, size and budget of the shared result cache (and its disk tier, or None)."""
+    stats = result_cache().stats()
+    disk = disk_cache()
+    stats['disk'] = disk.stats() if disk is not None else None
+    return stats
+
+
+# ==============================
+# ANALYTICS JOBS
+# ==============================
+@st.cache_resource(show_spinner=False)
+def analytics_executor():
+    """Process-wide AnalyticsExecutor; ES_ANALYTICS_WORKERS sets its pool size (0: inline)."""
+    workers = int(os.environ.get('ES_ANALYTICS_WORKERS', min(4, os.cpu_count() or 1)))
+    return AnalyticsExecutor(workers)
+
+
+def run_job(fn, *args):
+    """fn(*args) on the analytics pool; blocks this rerun until the result is ready.
+
+    fn must be a module-level function (it is pickled to the worker process).
+    Inside a shared_result computation the result is not kept by the executor.
+    """
+    placeholder = []
+
+    def touch():
+        # Each delta gives Streamlit a chance to stop this run for a newer one
+        if not placeholder:
+            placeholder.append(st.empty())
+        placeholder[0].empty()
+
+    keep_result = not getattr(_computing, 'depth', 0)
+    return analytics_executor().run(fn, args, on_wait=touch, keep_result=keep_result)
@@ -0,0 +1,71 @@
+"""Run several Streamlit worker processes on one shared copy of the survey data.
+
+    python serve_workers.py --workers 4 --base-port 8601 --shared-dir /dev/shm/es-result
+
+The survey frames are built (Google Sheets -> build_data) and published to a
+new subdirectory of --shared-dir, then each worker is started with
+ES_SHARED_DATA pointing at it, so finalize_data() memory-maps the arrays
+instead of reloading the sheets.
+Put a reverse proxy with sticky sessions in front of the ports (Streamlit
+session state lives inside one worker); see deploy/nginx.conf.
+
+Every start publishes the sheets again, so restarting this script reloads
+them; older publications are deleted. Use --reuse to attach to the newest
+publication made by the same code instead of reading the sheets.
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--base-port', type=int, default=8601)
+    parser.add_argument('--shared-dir', default='/dev/shm/es-result')
+    parser.add_argument(
+        '--reuse', action='store_true', help='serve the newest publication of this code version without reading the sheets'
+    )
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    base = os.path.abspath(args.shared_dir)
+
+    # Publish before the workers start, so none of them waits on Google Sheets
+    from data_processing import build_data
+    from result_cache import code_version
+    from shared_data import attach_or_publish, latest_publication, new_publication, remove_publications
+    version = code_version()
+    shared_dir = latest_publication(base, version) if args.reuse else None
+    if shared_dir is None:
+        shared_dir = new_publication(base, version)
+    attach_or_publish(shared_dir, build_data, version)
+    remove_publications(base, keep=shared_dir)
+
+    env = dict(os.environ, ES_SHARED_DATA=shared_dir)
+    workers = [
+        subprocess.Popen(
+            [sys.executable, '-m', 'streamlit', 'run', 'streamlit_app.py',
+             '--server.port', str(args.base_port + i), '--server.headless', 'true'],
+            env=env
+        )
+        for i in range(args.workers)
+    ]
+    print(f"{args.workers} worker(s) on ports {args.base_port}-{args.base_port + args.workers - 1}, data in {shared_dir}")
+
+    def stop(signum, frame):
+        for worker in workers:
+            worker.terminate()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for worker in workers:
+        worker.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+import fcntl
+import os
+import pickle
+import shutil
+import time
+import numpy as np
+import pandas as pd
+
+# ==============================
+# SHARED DATA (multi-process serving)
+# ==============================
+# The prepared frames from build_data() are published once to a directory of
+# .npy files; every Streamlit worker process attaches to it with
+# np.load(mmap_mode='r'), so numeric/bool/datetime columns live once in the
+# OS page cache instead of once per process, and only the first worker talks
+# to Google Sheets. Put the directory on /dev/shm to keep it in RAM.
+#
+# Text columns cannot be memory-mapped; they are stored as int32 codes plus
+# a pickled list of distinct values and decoded when a worker attaches.
+#
+# Each publication gets its own subdirectory named after the code version
+# and the build time (new_publication), and is never overwritten: workers
+# still running keep their mapped files. The manifest records the code
+# version, and attach refuses a publication made by other code, whose
+# columns may not be the ones the pages read.
+
+MANIFEST = 'manifest.pkl'
+
+
+def new_publication(base, code_version):
+    """Directory under base for a publication built now by code_version."""
+    return os.path.join(base, f"{code_version[:12]}-{time.strftime('%Y%m%d-%H%M%S')}")
+
+
+def latest_publication(base, code_version):
+    """Newest complete publication under base made by code_version, or None."""
+    if not os.path.isdir(base):
+        return None
+    names = sorted(
+        name for name in os.listdir(base)
+        if name.startswith(f"{code_version[:12]}-") and os.path.exists(os.path.join(base, name, MANIFEST))
+    )
+    return os.path.join(base, names[-1]) if names else None
+
+
+def remove_publications(base, keep):
+    """Delete everything under base except the publication keep."""
+    for name in os.listdir(base):
+        path = os.path.join(base, name)
+        if path != keep:
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.remove(path)
+
+
+def _save(path, values):
+    np.save(path, np.ascontiguousarray(values), allow_pickle=False)
+
+
+def publish(frames, directory, code_version=None):
+    """Write frames (a tuple of DataFrames) to directory; the manifest is written last."""
+    os.makedirs(directory, exist_ok=True)
+    manifest = {'code_version': code_version, 'published_at': time.time(), 'frames': []}
+    for i, df in enumerate(frames):
+        columns = []
+        _save(os.path.join(directory, f'{i}_index.npy'), df.index.to_numpy())
+        for j, col in enumerate(df.columns):
+            path = os.path.join(directory, f'{i}_{j}.npy')
+            dtype = df[col].dtype
+            if isinstance(dtype, pd.CategoricalDtype):
+                _save(path, df[col].cat.codes.to_numpy())
+                columns.append((col, 'category', (list(dtype.categories), dtype.ordered)))
+            elif isinstance(dtype, np.dtype) and dtype != object:
+                _save(path, df[col].to_numpy())
+                columns.append((col, 'array', None))
+            else:
+                codes, uniques = pd.factorize(df[col], use_na_sentinel=True)
+                _save(path, codes.astype(np.int32))
+                columns.append((col, 'codes', list(uniques)))
+        manifest['frames'].append(columns)
+
+    tmp = os.path.join(directory, MANIFEST + '.tmp')
+    with open(tmp, 'wb') as f:
+        pickle.dump(manifest, f)
+    os.replace(tmp, os.path.join(directory, MANIFEST))
+
+
+def attach(directory, code_version=None):
+    """Frames published in directory, with memory-mapped read-only numeric columns.
+
+    With code_version given, a publication made by other code raises
+    RuntimeError instead of being served.
+    """
+    with open(os.path.join(directory, MANIFEST), 'rb') as f:
+        manifest = pickle.load(f)
+    published_by = manifest.get('code_version') if isinstance(manifest, dict) else None
+    if code_version is not None and published_by != code_version:
+        raise RuntimeError(
+            f"{directory} was published by another version of the code; "
+            "restart serve_workers.py to publish the sheets again"
+        )
+
+    frames = []
+    for i, columns in enumerate(manifest['frames']):
+        index = np.load(os.path.join(directory, f'{i}_index.npy'))
+        data = {}
+        for j, (col, kind, meta) in enumerate(columns):
+            values = np.load(os.path.join(directory, f'{i}_{j}.npy'), mmap_mode='r').view(np.ndarray)
+            if kind == 'category':
+                categories, ordered = meta
+                data[col] = pd.Categorical.from_codes(values, categories=categories, ordered=ordered)
+            elif kind == 'codes':
+                # Code -1 (missing) picks the trailing NaN
+                lookup = np.array(meta + [np.nan], dtype=object)
+                decoded = lookup[values]
+                decoded.flags.writeable = False
+                data[col] = decoded
+            else:
+                data[col] = values
+        frames.append(pd.DataFrame(data, index=pd.Index(index), copy=False))
+    return tuple(frames)
+
+
+def attach_or_publish(directory, build, code_version=None):
+    """Attach to directory, publishing build() there first if no worker has yet.
+
+    A lock file makes concurrent workers wait for the first one instead of
+    all loading from Google Sheets at once.
+    """
+    if os.path.exists(os.path.join(directory, MANIFEST)):
+        return attach(directory, code_version)
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, '.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            if not os.path.exists(os.path.join(directory, MANIFEST)):
+                publish(build(), directory, code_version)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+    return attach(directory, code_version)
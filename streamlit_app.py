@@ -2,18 +2,26 @@ import streamlit as st
 from time import sleep
 from navigation import make_sidebar
 import streamlit_authenticator as stauth
-from data_processing import finalize_data
-import gspread
+from fetch_data import fetch_data_creds
+from lazy_import import lazy_import
 from datetime import datetime, timedelta
-from oauth2client.service_account import ServiceAccountCredentials
+from telemetry import measure
+from warmup import start_warm_up
+
+# Only needed after login, for the access log
+gspread = lazy_import('gspread')
+service_account = lazy_import('oauth2client.service_account')
 
 st.set_page_config(
     page_title='Survey Result',
     page_icon=':blue_heart:', 
 )
 
-# Fetch the credentials from the data source
-df_survey25, df_survey24, df_survey23, df_creds = finalize_data()
+# Fetch the credentials from the data source (the survey sheets load when a page needs them)
+df_creds = fetch_data_creds()
+
+# Once per process: build the frames and default-view results in the background
+start_warm_up()
 
 # Process `df_creds` to extract credentials in the required format
 def extract_credentials(df_creds):
@@ -75,7 +83,7 @@ if st.session_state.get('authentication_status'):
         
         # Setup the Google Sheets client
         scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-        creds = ServiceAccountCredentials.from_json_keyfile_dict(st.secrets["sheets"], scope)
+        creds = service_account.ServiceAccountCredentials.from_json_keyfile_dict(st.secrets["sheets"], scope)
         client = gspread.authorize(creds)
         
         try:
@@ -87,7 +95,8 @@ if st.session_state.get('authentication_status'):
         except Exception as e:
             st.write(f"An error occurred: {e}")
     # Get the user's email from Streamlit's experimental_user function
-    log_user_access(user_email)
+    with measure('access_log', 'Access Log'):
+        log_user_access(user_email)
 
 elif st.session_state.get('authentication_status') is False:
     st.error("Incorrect username or password.")
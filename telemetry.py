@@ -0,0 +1,274 @@
+"""Latency telemetry: one SQLite row per page rerun, sheet fetch, data refresh and access-log append.
+
+    ES_TELEMETRY_DB=/var/lib/es-result/telemetry.sqlite3 streamlit run streamlit_app.py
+    python telemetry.py report --db /var/lib/es-result/telemetry.sqlite3 --since 24
+
+Records are put on a bounded in-memory queue and written in batches by a
+daemon thread, so a rerun never waits on the disk; when the queue is full
+(the disk is stuck) records are dropped and counted instead. Several worker
+processes (serve_workers.py) can share one database file.
+
+Without ES_TELEMETRY_DB nothing is recorded and no thread is started.
+"""
+import argparse
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from time import perf_counter
+
+TELEMETRY_ENV = 'ES_TELEMETRY_DB'
+QUEUE_SIZE = 10000
+BATCH_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    ts REAL NOT NULL,           -- unix time the event started
+    kind TEXT NOT NULL,         -- rerun / fetch / refresh / access_log
+    name TEXT,                  -- page, sheet or function
+    session TEXT,               -- short hash of the Streamlit session id
+    duration_ms REAL,
+    rows INTEGER,               -- rows in scope (rerun) or rows fetched / built
+    cache_hits INTEGER,
+    cache_misses INTEGER,
+    stages TEXT,                -- JSON {stage: ms} for reruns
+    detail TEXT                 -- JSON, e.g. scope size and number of filters
+);
+CREATE INDEX IF NOT EXISTS events_kind_ts ON events (kind, ts);
+"""
+COLUMNS = ('ts', 'kind', 'name', 'session', 'duration_ms', 'rows', 'cache_hits', 'cache_misses', 'stages', 'detail')
+
+
+# ==============================
+# WRITER
+# ==============================
+class TelemetryWriter:
+    """Bounded queue drained into SQLite by a daemon thread."""
+
+    def __init__(self, path, queue_size=QUEUE_SIZE):
+        self.path = path
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.written = 0
+        self.error = None
+        self.thread = threading.Thread(target=self._run, name='telemetry-writer', daemon=True)
+        self.thread.start()
+
+    def record(self, row):
+        """Queue a row (dict keyed by COLUMNS); never blocks."""
+        try:
+            self.queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        try:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+        except (OSError, sqlite3.Error) as e:
+            # Telemetry must never take the dashboard down: stop recording
+            self.error = repr(e)
+            self._drain_forever()
+            return
+
+        insert = f"INSERT INTO events ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            rows = [tuple(row.get(c) for c in COLUMNS) for row in batch if row is not None]
+            try:
+                conn.executemany(insert, rows)
+                conn.commit()
+                self.written += len(rows)
+            except sqlite3.Error as e:
+                self.error = repr(e)
+                self.dropped += len(rows)
+            if stop:
+                conn.close()
+                return
+
+    def _drain_forever(self):
+        while True:
+            row = self.queue.get()
+            if row is None:
+                return
+            self.dropped += 1
+
+    def close(self, timeout=2.0):
+        """Write what is queued (up to timeout seconds) and stop the thread."""
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self.thread.join(timeout)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def telemetry_writer():
+    """The process-wide writer, or None when ES_TELEMETRY_DB is not set."""
+    global _writer
+    path = os.environ.get(TELEMETRY_ENV)
+    if not path:
+        return None
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = TelemetryWriter(path)
+                atexit.register(_writer.close)
+    return _writer
+
+
+def telemetry_enabled():
+    return bool(os.environ.get(TELEMETRY_ENV))
+
+
+# ==============================
+# RECORDING
+# ==============================
+def record(kind, name, duration_ms, started=None, session=None, rows=None,
+           cache_hits=None, cache_misses=None, stages=None, detail=None):
+    """Queue one event; a no-op without ES_TELEMETRY_DB."""
+    writer = telemetry_writer()
+    if writer is None:
+        return
+    writer.record({
+        'ts': started if started is not None else time.time(),
+        'kind': kind,
+        'name': name,
+        'session': session,
+        'duration_ms': round(duration_ms, 3),
+        'rows': rows,
+        'cache_hits': cache_hits,
+        'cache_misses': cache_misses,
+        'stages': json.dumps(stages) if stages is not None else None,
+        'detail': json.dumps(detail, default=str) if detail is not None else None,
+    })
+
+
+@contextmanager
+def measure(kind, name):
+    """Record the wall time of a block as one `kind` event (also when it raises)."""
+    started, start = time.time(), perf_counter()
+    try:
+        yield
+    finally:
+        record(kind, name, (perf_counter() - start) * 1000, started=started)
+
+
+def measured(kind, name):
+    """Decorator form of measure(); rows = len(result) when the result has a length."""
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            started, start = time.time(), perf_counter()
+            result = fn(*args, **kwargs)
+            try:
+                rows = sum(len(r) for r in result) if isinstance(result, tuple) else len(result)
+            except TypeError:
+                rows = None
+            record(kind, name, (perf_counter() - start) * 1000, started=started, rows=rows)
+            return result
+        return wrapper
+    return decorate
+
+
+# ==============================
+# REPORT
+# ==============================
+def load_events(path, kind=None, since_hours=None):
+    import pandas as pd
+    query, params = "SELECT * FROM events WHERE 1=1", []
+    if kind:
+        query += " AND kind = ?"
+        params.append(kind)
+    if since_hours:
+        query += " AND ts >= ?"
+        params.append(time.time() - since_hours * 3600)
+    with sqlite3.connect(path) as conn:
+        return pd.read_sql_query(query, conn, params=params)
+
+
+def percentile_table(events, by='name', column='duration_ms'):
+    """N, p50, p95, p99 and max of column per value of by, slowest p95 first."""
+    import pandas as pd
+    if events.empty:
+        return pd.DataFrame(columns=[by, 'N', 'p50', 'p95', 'p99', 'max'])
+    grouped = events.groupby(by)[column]
+    table = pd.DataFrame({
+        'N': grouped.size(),
+        'p50': grouped.quantile(0.50),
+        'p95': grouped.quantile(0.95),
+        'p99': grouped.quantile(0.99),
+        'max': grouped.max(),
+    }).round(1)
+    return table.sort_values('p95', ascending=False).reset_index()
+
+
+def stage_table(reruns):
+    """Per-stage p50/p95 (ms) of each page's reruns."""
+    import pandas as pd
+    stages = reruns.dropna(subset=['stages'])
+    if stages.empty:
+        return pd.DataFrame()
+    long = pd.DataFrame([
+        {'name': name, 'stage': stage, 'ms': ms}
+        for name, payload in zip(stages['name'], stages['stages'])
+        for stage, ms in json.loads(payload).items()
+    ])
+    if long.empty:
+        return long
+    grouped = long.groupby(['name', 'stage'])['ms']
+    table = pd.DataFrame({'p50': grouped.quantile(0.50), 'p95': grouped.quantile(0.95)}).round(1)
+    return table.unstack('stage')
+
+
+def report(path, since_hours=None, stages=False, out=sys.stdout):
+    events = load_events(path, since_hours=since_hours)
+    window = f"last {since_hours:g} h" if since_hours else "all time"
+    print(f"{path}: {len(events)} events ({window})", file=out)
+    for kind in ('rerun', 'fetch', 'refresh', 'access_log'):
+        subset = events[events['kind'] == kind]
+        if subset.empty:
+            continue
+        print(f"\n{kind} duration (ms)", file=out)
+        print(percentile_table(subset).to_string(index=False), file=out)
+        if kind == 'rerun' and subset['rows'].notna().any():
+            print("\nrows in scope per rerun", file=out)
+            print(percentile_table(subset.dropna(subset=['rows']), column='rows').to_string(index=False), file=out)
+        if kind == 'rerun' and stages:
+            print("\nrerun stages (ms)", file=out)
+            print(stage_table(subset).to_string(), file=out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='command', required=True)
+    rep = sub.add_parser('report', help='p50/p95/p99 per page, sheet and refresh')
+    rep.add_argument('--db', default=os.environ.get(TELEMETRY_ENV), help=f'database (default: ${TELEMETRY_ENV})')
+    rep.add_argument('--since', type=float, help='only the last SINCE hours')
+    rep.add_argument('--stages', action='store_true', help='also per-stage p50/p95 of reruns')
+    args = parser.parse_args()
+    if not args.db or not os.path.exists(args.db):
+        parser.error(f"no telemetry database at {args.db!r}")
+    report(args.db, since_hours=args.since, stages=args.stages)
+
+
+if __name__ == '__main__':
+    main()
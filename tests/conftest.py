@@ -0,0 +1,28 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The tests drive the benchmark harnesses (synthetic sheets, AppTest reruns, reference computations)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+# Analytics jobs run inline: no process pool inside the test run
+os.environ.setdefault('ES_ANALYTICS_WORKERS', '0')
+
+ROWS = 3000
+
+
+@pytest.fixture(scope='session')
+def raw_sheets():
+    """Synthetic (es25, es24, es23, creds) as the fetch_data functions return them."""
+    from synthetic import survey_frames
+    return survey_frames(ROWS)
+
+
+@pytest.fixture(scope='session')
+def snapshots(raw_sheets, tmp_path_factory):
+    """Directory of es25/es24/es23/creds .pkl snapshots of raw_sheets."""
+    directory = tmp_path_factory.mktemp('snapshots')
+    for name, df in zip(('es25', 'es24', 'es23', 'creds'), raw_sheets):
+        df.to_pickle(directory / f'{name}.pkl')
+    return str(directory)
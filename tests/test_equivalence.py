@@ -0,0 +1,23 @@
+"""The analytics engines against the pages' original computations (benchmarks/equivalence.py)."""
+import pytest
+
+import equivalence
+
+
+@pytest.fixture(scope='module')
+def prepared(raw_sheets):
+    return equivalence.prepared_frames(raw_sheets)
+
+
+@pytest.mark.parametrize('user', [None, 'unit1'])
+@pytest.mark.parametrize('case', list(equivalence.CASES))
+def test_engine_matches_reference(case, user, prepared):
+    frames, creds = prepared
+    units = None if user is None else creds.loc[creds['username'] == user, 'unit'].values[0].split(', ')
+    data = equivalence.scoped(frames, units)
+    reference, engine, keys = equivalence.CASES[case]
+    worst, problem = equivalence.difference(
+        equivalence.canonical(reference(data), keys), equivalence.canonical(engine(data), keys)
+    )
+    assert problem is None
+    assert worst <= equivalence.TOLERANCE[case]
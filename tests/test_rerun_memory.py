@@ -0,0 +1,18 @@
+"""Memory still allocated after repeated reruns must not grow (e.g. figures that are never closed)."""
+import os
+
+import pytest
+
+from rerun_memory import ROOT, measure, patch_sources
+
+RERUNS = 5
+MAX_GROWTH_MB = 2.0
+
+
+@pytest.mark.parametrize('page', ['pages/page5.py', 'pages/page8.py'])
+def test_retained_memory_is_flat(page, snapshots, monkeypatch):
+    monkeypatch.chdir(ROOT)
+    patch_sources(snapshots)
+    retained = [current for _, _, current, _ in measure(os.path.join(ROOT, page), 'hr', RERUNS)]
+    # Rerun 0 fills the caches; from rerun 1 on a rerun should leave nothing behind
+    assert retained[-1] - retained[1] <= MAX_GROWTH_MB, retained
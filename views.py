@@ -0,0 +1,159 @@
+import pandas as pd
+from analytics.gallup import GALLUP_ITEMS, with_engagement
+from analytics.ipa import ipa_items
+from analytics.satisfaction import DIMENSION_PREFIXES, SATISFACTION_COLUMNS, SATISFACTION_ITEMS, SATISFACTION_LABELS
+from analytics.scope import FilterSpec
+from data_processing import scope_mask, scoped_frame
+
+# ==============================
+# PAGE VIEWS
+# ==============================
+# How pages 2, 3, 4, 7 and 8 turn the prepared frames into the frames they
+# pass to shared_result, and their default widget values. The pages call
+# these with the widgets' values, the cache warm-up (warmup.py) with the
+# defaults. Shared results are keyed by the columns and length of their frame
+# arguments, so a warmed result is only found if the warm-up prepares the
+# frames exactly like the page: change a page's preparation here, not inline.
+
+YEARS = (2023, 2024, 2025)
+
+
+# ==============================
+# MOOD METER (pages/page2.py)
+# ==============================
+MOOD_FILTER_COLUMNS = [
+    'unit', 'subunit', 'directorate', 'division', 'site', 'department', 'section',
+    'layer', 'status', 'generation', 'gender',
+    'tenure_category', 'region'
+]
+MOOD_YEAR_OPTIONS = ["2023", "2024", "2025"]
+MOOD_DEFAULT_YEAR = "2025"
+
+
+def mood_masks(year_frames, user_units, selected_filters):
+    """Row masks of the filtered scope per year, without rows whose N in any year is 1.
+
+    Returns (masks, number of rows removed for confidentiality).
+    """
+    masks = {year: scope_mask(df, user_units, selected_filters) for year, df in year_frames.items()}
+    rows_removed = 0
+    for year, df in year_frames.items():
+        for n_year in YEARS:
+            n_col = f"{n_year} N"
+            if n_col in df.columns:
+                removed = masks[year] & (df[n_col] == 1).to_numpy()
+                rows_removed += int(removed.sum())
+                masks[year] &= ~removed
+    return masks, rows_removed
+
+
+def hide_single_respondent_years(year_frames, masks):
+    """Clear the masks of years with a single respondent (confidentiality); returns those years."""
+    n_per_year = {year: df.loc[masks[year], 'nik'].nunique() for year, df in year_frames.items()}
+    years = [y for y, n in n_per_year.items() if n == 1]
+    for y in years:
+        masks[y][:] = False
+    return years
+
+
+def mood_column_frame(year_frames, masks, column, year):
+    """EMO and column of the masked rows of year, for the mood-by-column chart."""
+    return year_frames[int(year)].loc[masks[int(year)], [column, 'EMO']].dropna(how='any')
+
+
+# ==============================
+# SATISFACTION (pages/page3.py)
+# ==============================
+SATISFACTION_FILTER_COLUMNS = [
+    'unit', 'subunit', 'directorate', 'site', 'division',  'department', 'section',
+    'layer', 'work_contract', 'generation', 'gender', 'tenure_category', 'region'
+]
+SATISFACTION_SCOPE_COLUMNS = SATISFACTION_FILTER_COLUMNS + SATISFACTION_ITEMS + SATISFACTION_COLUMNS
+SATISFACTION_CHART_YEAR = 2025
+
+
+def satisfaction_scope(frames, user_units):
+    """The user's rows of each year: filter columns, items and dimension averages only."""
+    return {year: scoped_frame(frames[year], user_units, SATISFACTION_SCOPE_COLUMNS) for year in YEARS}
+
+
+def satisfaction_columns(item_level):
+    """(columns, labels, score-chart prefixes) for the item or the dimension level."""
+    if item_level:
+        items = {k: k for k in SATISFACTION_ITEMS}
+        return SATISFACTION_ITEMS, items, items
+    return SATISFACTION_COLUMNS, SATISFACTION_LABELS, DIMENSION_PREFIXES
+
+
+# ==============================
+# NPS (pages/page4.py)
+# ==============================
+NPS_FILTER_COLUMNS = [
+    'unit', 'subunit', 'directorate', 'division', 'site', 'department', 'section',
+    'layer', 'work_contract', 'generation', 'gender',
+    'tenure_category', 'region', 'year'
+]
+NPS_SCOPE_COLUMNS = NPS_FILTER_COLUMNS + ['nik', 'NPS']
+NPS_YEAR_OPTIONS = ["2023", "2024", "2025"]
+NPS_DEFAULT_YEAR = "2025"
+
+
+def nps_scope(frames, user_units):
+    """The user's rows of all years in one frame, with an int year column."""
+    return pd.concat(
+        [scoped_frame(frames[year], user_units, NPS_SCOPE_COLUMNS, year=year) for year in YEARS], ignore_index=True
+    )
+
+
+# ==============================
+# GALLUP (pages/page7.py)
+# ==============================
+GALLUP_FILTER_COLUMNS = [
+    'unit', 'subunit', 'directorate', 'site', 'division', 'department',
+    'section', 'layer', 'work_contract', 'generation', 'gender',
+    'tenure_category', 'region'
+]
+GALLUP_SCOPE_COLUMNS = GALLUP_FILTER_COLUMNS + GALLUP_ITEMS
+GALLUP_DEFAULT_YEAR = 2025
+GALLUP_DEFAULT_BREAKDOWN = 'subunit'
+
+
+def gallup_scope(frames, user_units):
+    """The user's rows of each year: filter columns and Gallup items only."""
+    return {year: scoped_frame(frames[year], user_units, GALLUP_SCOPE_COLUMNS) for year in YEARS}
+
+
+def gallup_selection(scoped, selected_filters, year):
+    """(filtered year, the user's whole year, Gallup items found), both frames with engagement categories.
+
+    The frames are None when the year has no Gallup items.
+    """
+    existing_cols = [c for c in GALLUP_ITEMS if c in scoped[year].columns]
+    if not existing_cols:
+        return None, None, existing_cols
+    df_selected = with_engagement(FilterSpec(filters=selected_filters).apply(scoped[year]), existing_cols)
+    return df_selected, with_engagement(scoped[year], existing_cols), existing_cols
+
+
+def gallup_previous_year(scoped, year):
+    """The user's previous survey year (empty before 2024), for the year-over-year delta."""
+    return scoped[year - 1] if year - 1 in scoped else pd.DataFrame()
+
+
+# ==============================
+# IPA (pages/page8.py)
+# ==============================
+IPA_FILTER_COLUMNS = [
+    'unit', 'subunit', 'directorate', 'division', 'department', 'section',
+    'layer', 'status', 'generation', 'gender', 'marital', 'education',
+    'tenure_category', 'children', 'region', 'participation_23'
+]
+IPA_TARGETS = ['SAT', 'NPS']
+IPA_YEAR_OPTIONS = ["2025", "2024", "2023"]
+IPA_DEFAULT_YEAR = "2025"
+IPA_RIDGE_ALPHA = 1.0  # slider default; the other methods ignore it
+
+
+def ipa_scope(df, user_units, year):
+    """The user's submitted respondents of year: filter columns, the year's items and the targets."""
+    return scoped_frame(df, user_units, IPA_FILTER_COLUMNS + ipa_items(year) + IPA_TARGETS, submitted_only=True)
@@ -0,0 +1,207 @@
+import os
+import threading
+import time
+import traceback
+from time import perf_counter
+import numpy as np
+import streamlit as st
+from analytics.scope import FilterSpec
+from analytics.mood import mood_by_year, mood_by_column
+from analytics.satisfaction import satisfaction_years, year_comparison, demography_comparison, score_distribution
+from analytics.nps import nps_by_year, nps_comparison, nps_breakdown
+from analytics.gallup import INDONESIA_BENCHMARK, engagement_distribution, overall_comparison, engaged_comparison
+from analytics.ipa import IMPORTANCE_METHODS, MISSING_MODES, compute_importance, ipa_items
+from data_processing import daily_responses, finalize_data, participation_table
+from result_cache import result_cache, shared_result
+from telemetry import record
+from views import (
+    GALLUP_DEFAULT_BREAKDOWN, GALLUP_DEFAULT_YEAR, IPA_DEFAULT_YEAR, IPA_RIDGE_ALPHA,
+    IPA_TARGETS, MOOD_DEFAULT_YEAR, MOOD_FILTER_COLUMNS, NPS_DEFAULT_YEAR, NPS_FILTER_COLUMNS,
+    SATISFACTION_CHART_YEAR, SATISFACTION_FILTER_COLUMNS, gallup_previous_year, gallup_scope, gallup_selection,
+    hide_single_respondent_years, ipa_scope, mood_column_frame, mood_masks, nps_scope, satisfaction_columns,
+    satisfaction_scope
+)
+
+# ==============================
+# CACHE WARM-UP
+# ==============================
+# After a deploy the first login pays for the sheet fetch and finalize_data,
+# and each user's first visit to each page for its aggregates. start_warm_up
+# (called by the login page and the operations page) starts one background thread
+# per process that builds the prepared frames, the participation table and
+# the daily response curves, then the default view of pages 2, 3, 4, 7 and 8
+# for every distinct unit list in 'Dashboard Credentials'. The results go to
+# the shared result cache under the keys the pages ask for, so a first visit
+# with the default widgets is a cache hit. The login page does not wait for it.
+#
+# The view functions below prepare the frames with the same views.py helpers
+# and default widget values as the pages. Scopes shared by the most users are
+# warmed first, and warming stops once the result cache is half full, leaving
+# room for live views. A view that fails is skipped. ES_WARM_UP=0 turns the
+# warm-up off.
+
+WARM_UP_ENV = 'ES_WARM_UP'
+WARM_UP_SHARE = 0.5  # of the result cache budget
+
+
+def warm_up_enabled():
+    return os.environ.get(WARM_UP_ENV, '1') != '0'
+
+
+def credential_scopes(df_creds):
+    """Distinct unit lists of the credentials sheet as (units, users), most users first."""
+    users = {}
+    for unit in df_creds['unit'].dropna():
+        units = tuple(sorted(set(str(unit).split(', '))))
+        users[units] = users.get(units, 0) + 1
+    return sorted(users.items(), key=lambda item: (-item[1], item[0]))
+
+
+# ==============================
+# DEFAULT VIEWS (one per page)
+# ==============================
+# No filters; every other widget at its default (views.py), the first option
+# when the page gives none.
+def _mood_view(frames, units):
+    # pages/page2.py
+    view = FilterSpec(units, {})
+    masks, _ = mood_masks(frames, units, {})
+    shared_result('mood.by_year', view, mood_by_year, frames, masks)
+
+    hide_single_respondent_years(frames, masks)
+    column = MOOD_FILTER_COLUMNS[0]
+    filtered_df = mood_column_frame(frames, masks, column, MOOD_DEFAULT_YEAR)
+    if not filtered_df.empty:
+        shared_result('mood.by_column', view, mood_by_column, filtered_df, column, depends_on=(MOOD_DEFAULT_YEAR,))
+
+
+def _satisfaction_view(frames, units):
+    # pages/page3.py: dimension level, SAT as asked, first dimension
+    view = FilterSpec(units, {})
+    view_options = (False, False)
+    columns, labels, prefixes = satisfaction_columns(False)
+    years, _ = satisfaction_years(satisfaction_scope(frames, units), FilterSpec(filters={}), columns)
+    shared_result(
+        'satisfaction.year_comparison', view, year_comparison, years, columns, labels,
+        item_level=False, drop_sat=False, depends_on=view_options
+    )
+    shared_result(
+        'satisfaction.demography_comparison', view, demography_comparison,
+        years, list(labels)[0], SATISFACTION_FILTER_COLUMNS[0], include_topbox=False,
+        depends_on=view_options, persist=True
+    )
+    shared_result(
+        'satisfaction.score_distribution', view, score_distribution, years[SATISFACTION_CHART_YEAR], prefixes,
+        depends_on=view_options + (SATISFACTION_CHART_YEAR,)
+    )
+
+
+def _nps_view(frames, units):
+    # pages/page4.py
+    view = FilterSpec(units, {})
+    column = NPS_FILTER_COLUMNS[0]
+    filtered_data = FilterSpec(filters={}).apply(nps_scope(frames, units))
+    if filtered_data.empty:
+        return
+    nps_df, _, _ = shared_result('nps.by_year', view, nps_by_year, filtered_data)
+    if nps_df.empty:
+        return
+    shared_result('nps.comparison', view, nps_comparison, filtered_data, column, persist=True)
+    filtered_data = filtered_data[filtered_data['year'] == int(NPS_DEFAULT_YEAR)]
+    if column in filtered_data.columns:
+        shared_result('nps.breakdown', view, nps_breakdown, filtered_data, column, depends_on=(NPS_DEFAULT_YEAR,))
+
+
+def _gallup_view(frames, units):
+    # pages/page7.py: unit table, then the default breakdown
+    view = FilterSpec(units, {})
+    year = GALLUP_DEFAULT_YEAR
+    scoped = gallup_scope(frames, units)
+    df_selected, df_all_raw, existing_cols = gallup_selection(scoped, {}, year)
+    if not existing_cols or df_selected.shape[0] <= 1:
+        return
+    prev_year_df = gallup_previous_year(scoped, year)
+    ind_benchmark = INDONESIA_BENCHMARK.get(year, np.nan)
+    shared_result('gallup.overall', view, overall_comparison, df_all_raw, df_selected, year)
+    for group_col in ('unit', GALLUP_DEFAULT_BREAKDOWN):
+        if group_col in df_selected.columns:
+            shared_result(
+                'gallup.engaged_comparison', view, engaged_comparison,
+                df_selected, prev_year_df, group_col, existing_cols, ind_benchmark, depends_on=(year,), persist=True
+            )
+    if GALLUP_DEFAULT_BREAKDOWN in df_selected.columns:
+        shared_result(
+            'gallup.distribution', view, engagement_distribution, df_selected, GALLUP_DEFAULT_BREAKDOWN,
+            depends_on=(year,)
+        )
+
+
+def _ipa_view(frames, units):
+    # pages/page8.py
+    view = FilterSpec(units, {})
+    year = IPA_DEFAULT_YEAR
+    df = ipa_scope(frames[int(year)], units, year)
+    df = df[FilterSpec(filters={}).mask(df)]
+    shared_result(
+        'ipa.importance', view, compute_importance, df, year, IPA_TARGETS[0], ipa_items(year),
+        method=next(iter(IMPORTANCE_METHODS)), alpha=IPA_RIDGE_ALPHA, missing=next(iter(MISSING_MODES)), persist=True
+    )
+
+
+VIEWS = (_nps_view, _mood_view, _satisfaction_view, _gallup_view, _ipa_view)
+
+
+# ==============================
+# WARM-UP THREAD
+# ==============================
+class WarmUp:
+    """Progress of the process's warm-up, for the operations page."""
+
+    def __init__(self):
+        self.state = 'waiting'
+        self.started_at = None
+        self.seconds = None
+        self.scopes = 0
+        self.warmed = 0
+        self.failed = []  # (view, units, error)
+        self.error = None
+
+    def run(self):
+        self.state, self.started_at = 'running', time.time()
+        start = perf_counter()
+        try:
+            df_survey25, df_survey24, df_survey23, df_creds = finalize_data()
+            participation_table()
+            daily_responses(df_survey25, "2025")
+            frames = {2023: df_survey23, 2024: df_survey24, 2025: df_survey25}
+
+            scopes = credential_scopes(df_creds)
+            self.scopes = len(scopes)
+            cache = result_cache()
+            for units, _ in scopes:
+                if cache.bytes > cache.max_bytes * WARM_UP_SHARE:
+                    self.state = 'stopped (result cache half full)'
+                    break
+                for view in VIEWS:
+                    try:
+                        view(frames, list(units))
+                    except Exception as e:
+                        self.failed.append((view.__name__.strip('_'), ', '.join(units), repr(e)))
+                self.warmed += 1
+            else:
+                self.state = 'done'
+        except Exception:
+            self.state, self.error = 'failed', traceback.format_exc(limit=3)
+        self.seconds = perf_counter() - start
+        record('refresh', 'warm_up', self.seconds * 1000, started=self.started_at, rows=self.warmed)
+
+
+@st.cache_resource(show_spinner=False)
+def start_warm_up():
+    """Start the warm-up thread once per process; returns its WarmUp."""
+    warm_up = WarmUp()
+    if warm_up_enabled():
+        threading.Thread(target=warm_up.run, name='cache-warm-up', daemon=True).start()
+    else:
+        warm_up.state = 'off'
+    return warm_up